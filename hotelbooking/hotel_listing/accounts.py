@@ -0,0 +1,83 @@
+"""
+Accounts for guests who booked without one.
+
+Checkout never hashes a password. An anonymous booking writes only its
+``Guest`` rows, and a primary guest who asked for an account is queued with
+``account_invite="Pending"``. The ``send_account_invites`` worker mails each
+of them a signed link to ``/activate/<token>/``, where they pick a username
+and password; that request is the only one that pays for the hash.
+
+A token names the guest and the email it was sent to, expires after
+``ACCOUNT_INVITE_MAX_AGE`` seconds and stops working once the guest has a
+user, so each link creates at most one account.
+"""
+from django.conf import settings
+from django.core import mail, signing
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .models import Guest
+
+PENDING = "Pending"
+SENT = "Sent"
+SALT = "hotel_listing.accounts.invite"
+
+
+def make_token(guest):
+    return signing.dumps([guest.pk, guest.email], salt=SALT, compress=True)
+
+
+def guest_for_token(token):
+    """The account-less guest ``token`` was issued to, or ``None`` if it is bad, expired or used."""
+    try:
+        pk, email = signing.loads(token, salt=SALT, max_age=settings.ACCOUNT_INVITE_MAX_AGE)
+    except signing.BadSignature:  # includes SignatureExpired
+        return None
+    return Guest.objects.filter(pk=pk, email=email, user__isnull=True).first()
+
+
+def invite_message(guest, connection=None):
+    context = {
+        "guest": guest,
+        "url": settings.SITE_URL.rstrip("/") + reverse("activate_account", args=[make_token(guest)]),
+        "days": settings.ACCOUNT_INVITE_MAX_AGE // (24 * 60 * 60),
+    }
+    return mail.EmailMessage(
+        subject="Create your account",
+        body=render_to_string("emails/account_invite.txt", context),
+        to=[guest.email],
+        connection=connection,
+    )
+
+
+def send_pending(batch_size=100):
+    """Mail every queued invite, a batch per SMTP connection; returns how many were sent."""
+    sent = 0
+    while True:
+        guests = list(Guest.objects.filter(account_invite=PENDING).order_by("id")[:batch_size])
+        if not guests:
+            return sent
+        # A failed send raises before the batch is marked, so it is retried next time.
+        with mail.get_connection() as connection:
+            connection.send_messages([invite_message(guest) for guest in guests])
+        Guest.objects.filter(pk__in=[guest.pk for guest in guests], account_invite=PENDING).update(account_invite=SENT)
+        sent += len(guests)
+
+
+def activate(guest, form):
+    """
+    Create the user from a valid ``UserCreationForm`` and link it to ``guest``.
+
+    Returns ``None`` if the guest got an account in the meantime, e.g. from
+    a second click on the same link.
+    """
+    user = form.save(commit=False)  # hashes the password, outside the transaction
+    user.email, user.first_name, user.last_name = guest.email or "", guest.first_name, guest.last_name
+    with transaction.atomic():
+        if not Guest.objects.select_for_update().filter(pk=guest.pk, user__isnull=True).exists():
+            return None
+        user.save()
+        Guest.objects.filter(pk=guest.pk).update(user=user, account_invite="")
+    guest.user, guest.account_invite = user, ""
+    return user
@@ -1,7 +1,15 @@
+import csv
+import io
+
 from django.contrib import admin
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
 from django import forms
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
+from . import booking_import, changelists, images, reservations
 from .models import (
     Room, Guest, Booking, BookingGuest,
     Meal, MealPreference, Payment
@@ -15,6 +23,47 @@ class ClickableRowAdmin(admin.ModelAdmin):
         css = {"all": ("hotel_listing/admin_row_click.css",)}
 
 
+# 🔹 Base class for tables that grow to millions of rows
+class LargeTableAdmin(ClickableRowAdmin):
+    """
+    Changelist tuned for big tables: set ``list_select_related`` to every FK
+    that ``list_display`` (or a ``__str__`` it calls) reads, so a page is one
+    joined query. Counts are estimated or capped, and pages are keyset
+    cursors over ``ordering`` plus the primary key. With
+    ``prefix_search_fields`` the search box (and autocomplete widgets
+    pointing here) matches word prefixes through indexes on
+    ``LOWER(field)`` instead of scanning with ``icontains``.
+    """
+    prefix_search_fields = None
+    paginator = changelists.LargeTablePaginator
+    show_full_result_count = False
+    change_list_template = "admin/large_table_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return changelists.KeysetChangeList
+
+    def get_keyset_ordering(self, request):
+        """``ordering`` plus the primary key as tie-breaker, or ``None`` if it can't be keyset-paged."""
+        ordering = list(self.get_ordering(request) or ["-pk"])
+        if any(not isinstance(field, str) or "__" in field.lstrip("-") for field in ordering):
+            return None
+        direction = "-" if ordering[0].startswith("-") else ""
+        if any(field.startswith("-") != bool(direction) for field in ordering):
+            return None
+        if not {"pk", "id"} & {field.lstrip("-") for field in ordering}:
+            ordering.append(f"{direction}pk")
+        return tuple(ordering)
+
+    def changelist_view(self, request, extra_context=None):
+        changelists.pop_cursor(request)
+        return super().changelist_view(request, extra_context)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not self.prefix_search_fields or not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(changelists.prefix_filter(self.prefix_search_fields, search_term)), False
+
+
 # 🔸 Room Admin
 @admin.register(Room)
 class RoomAdmin(ClickableRowAdmin):
@@ -42,17 +91,19 @@ class RoomAdmin(ClickableRowAdmin):
 
     def image_preview(self, obj):
         if obj.image:
-            return f'<img src="{obj.image.url}" style="max-height: 200px; max-width: 200px;" />'
+            thumb = images.smallest(obj)
+            url = obj.image.storage.url(thumb["webp"]) if thumb else obj.image.url
+            return format_html('<img src="{}" style="max-height: 200px; max-width: 200px;" />', url)
         return "No image available"
-    image_preview.allow_tags = True
     image_preview.short_description = "Image Preview"
 
 
 # 🔸 Guest Admin
 @admin.register(Guest)
-class GuestAdmin(ClickableRowAdmin):
+class GuestAdmin(LargeTableAdmin):
     list_display = ("first_name", "last_name", "email", "phone")
     search_fields = ("first_name", "last_name", "email", "phone")
+    prefix_search_fields = search_fields
     ordering = ("last_name", "first_name")
 
 
@@ -60,6 +111,7 @@ class GuestAdmin(ClickableRowAdmin):
 class BookingGuestInline(admin.TabularInline):
     model = BookingGuest
     extra = 1
+    autocomplete_fields = ['guest']
 
 
 class MealPreferenceInline(admin.TabularInline):
@@ -93,47 +145,107 @@ class BookingForm(forms.ModelForm):
 
         if room:
             # Capacity check
-            if num_adults > room.capacity_adults or num_children > room.capacity_children:
+            num_rooms = cleaned_data.get("num_rooms") or 1
+            max_adults, max_children = room.capacity_adults * num_rooms, room.capacity_children * num_rooms
+            if num_adults > max_adults or num_children > max_children:
                 raise ValidationError(
-                    _(f"Room capacity exceeded. Max: {room.capacity_adults} adults, {room.capacity_children} children.")
+                    _(f"Room capacity exceeded. Max: {max_adults} adults, {max_children} children.")
                 )
 
-            # Overlapping booking check
-            overlapping = Booking.objects.filter(
-                room=room,
-                start_date__lt=end_date,
-                end_date__gt=start_date
-            ).exclude(pk=self.instance.pk)
-
-            if overlapping.exists():
-                raise ValidationError(
-                    _("This room is already booked for the selected date range.")
-                )
+            # Overlapping booking check. The admin runs form validation and the
+            # save in one transaction, so the room lock taken here is held until
+            # BookingAdmin.save_model has written the booking.
+            status = cleaned_data.get("booking_status")
+            if start_date and end_date and status in reservations.ACTIVE_STATUSES:
+                try:
+                    reservations.check_available(room.pk, start_date, end_date, exclude_booking_id=self.instance.pk)
+                except reservations.RoomUnavailable:
+                    raise ValidationError(
+                        _("This room is already booked for the selected date range.")
+                    )
 
         return cleaned_data
 
 
+# 🔸 Booking CSV import
+IMPORT_REJECTS_SHOWN = 200
+
+
+class BookingImportForm(forms.Form):
+    file = forms.FileField(label="CSV file")
+
+
 # 🔸 Booking Admin
 @admin.register(Booking)
-class BookingAdmin(ClickableRowAdmin):
+class BookingAdmin(LargeTableAdmin):
     form = BookingForm
+    autocomplete_fields = ("primary_guest", "room")
+    change_list_template = "admin/hotel_listing/booking/change_list.html"
     list_display = (
         "id", "primary_guest", "room", "start_date", "end_date",
-        "num_adults", "num_children", "total_price", "booking_status", "created_at"
+        "num_adults", "num_children", "num_rooms", "total_price", "amount_paid", "payment_state",
+        "booking_status", "created_at"
     )
-    list_filter = ("booking_status", "start_date", "end_date", "created_at")
+    list_filter = ("booking_status", "payment_state", "start_date", "end_date", "created_at")
     search_fields = (
         "id", "primary_guest__first_name",
         "primary_guest__last_name", "room__room_number"
     )
     ordering = ("-created_at",)
+    list_select_related = ("room", "primary_guest")
+    readonly_fields = ("amount_paid", "payment_state")
     inlines = [BookingGuestInline, MealPreferenceInline, PaymentInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        """Booking number, room number prefix or primary guest prefix; each one an index lookup."""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        guests = Guest.objects.filter(changelists.prefix_filter(GuestAdmin.prefix_search_fields, term))
+        condition = Q(primary_guest__in=guests.values("pk"))
+        if " " not in term:
+            condition |= Q(room__in=Room.objects.filter(room_number__istartswith=term).values("pk"))
+            if term.isdigit():
+                condition |= Q(pk=int(term))
+        # Autocomplete renders each result with __str__, which reads both FKs.
+        return queryset.filter(condition).select_related("room", "primary_guest"), False
+
+    def save_model(self, request, obj, form, change):
+        reservations.book(obj)
+
+    def get_urls(self):
+        return [
+            path("import/", self.admin_site.admin_view(self.import_view), name="hotel_listing_booking_import"),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a CSV of bookings; validated and written by ``booking_import`` in bulk."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        context = dict(self.admin_site.each_context(request), opts=self.model._meta,
+                       title="Import bookings", columns=booking_import.COLUMNS)
+        form = BookingImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            rejects = io.StringIO()
+            lines = io.TextIOWrapper(form.cleaned_data["file"].file, encoding="utf-8-sig", newline="")
+            try:
+                context["result"] = booking_import.import_bookings(lines, rejects=rejects)
+            except (UnicodeDecodeError, ValueError) as e:
+                form.add_error("file", str(e))
+            else:
+                rows = list(csv.reader(io.StringIO(rejects.getvalue())))
+                context["rejects"] = rows[:IMPORT_REJECTS_SHOWN + 1] if len(rows) > 1 else []
+                context["rejects_truncated"] = len(rows) > IMPORT_REJECTS_SHOWN + 1
+        context["form"] = form
+        return TemplateResponse(request, "admin/hotel_listing/booking/import.html", context)
+
 
 # 🔸 Booking Guest Admin
 @admin.register(BookingGuest)
-class BookingGuestAdmin(ClickableRowAdmin):
+class BookingGuestAdmin(LargeTableAdmin):
     list_display = ("booking", "guest", "is_child")
+    autocomplete_fields = ("booking", "guest")
+    list_select_related = ("guest", "booking__room", "booking__primary_guest")
     list_filter = ("is_child",)
     search_fields = ("booking__id", "guest__first_name", "guest__last_name")
 
@@ -148,8 +260,10 @@ class MealAdmin(ClickableRowAdmin):
 
 # 🔸 Meal Preference Admin
 @admin.register(MealPreference)
-class MealPreferenceAdmin(ClickableRowAdmin):
+class MealPreferenceAdmin(LargeTableAdmin):
     list_display = ("booking", "get_meal_name", "selected")
+    autocomplete_fields = ("booking", "meal")
+    list_select_related = ("meal", "booking__room", "booking__primary_guest")
     list_filter = ("selected", "meal")
     search_fields = ("booking__id", "booking__primary_guest__first_name", "meal__name")
 
@@ -160,7 +274,7 @@ class MealPreferenceAdmin(ClickableRowAdmin):
 
 # 🔸 Payment Admin
 @admin.register(Payment)
-class PaymentAdmin(ClickableRowAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = (
         "id", "booking", "amount", "payment_method",
         "payment_status", "payment_date", "transaction_id"
@@ -171,6 +285,8 @@ class PaymentAdmin(ClickableRowAdmin):
         "booking__primary_guest__first_name", "booking__primary_guest__last_name"
     )
     ordering = ("-payment_date",)
+    autocomplete_fields = ("booking",)
+    list_select_related = ("booking__room", "booking__primary_guest")
 
 
 # 🔸 Admin site customization
@@ -0,0 +1,93 @@
+"""
+Read-only JSON API for the mobile app, versioned in the URL (``/api/v1/``).
+
+``GET /api/v1/rooms/`` runs the home page's search (``room_search``) with
+the same parameters and returns one page of rooms::
+
+    {"rooms": [{"id": 7, "number": "101", "type": "Double", "bed": "Double",
+                "adults": 2, "children": 1, "price": "5000.00",
+                "stay_total": "11800.00", "image": "/media/rooms/variants/...webp"}],
+     "nights": 2, "next": "WyI1MDAwLjAwIiw3XQ", "previous": null}
+
+``order`` is ``price`` (the default), ``-price`` or ``room_number``.
+Pages are keyset pages (``pagination.KeysetPaginator``) of ``limit`` rooms:
+pass ``next`` back as ``after`` or ``previous`` as ``before``. A cursor stays
+valid however many rooms are booked in the meantime. ``stay_total`` and
+``nights`` are only present for searches with dates.
+
+The ETag comes from ``occupancy.aversion`` of the stay, read from the
+database like the availability calendar's, so a repeated request with
+``If-None-Match`` gets ``304 Not Modified`` without running the search, and
+any process's room or booking writes change it.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+
+from . import images, occupancy, room_search
+
+VERSION = 1
+ORDERINGS = {
+    "price": ("price_per_night", "id"),
+    "-price": ("-price_per_night", "-id"),
+    "room_number": ("room_number", "id"),
+}
+DEFAULT_ORDER = "price"
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+def ordering(params):
+    order = params.get("order") or DEFAULT_ORDER
+    if order not in ORDERINGS:
+        raise InvalidRequest(f"order must be one of: {', '.join(ORDERINGS)}")
+    return ORDERINGS[order]
+
+
+def page_size(params):
+    limit = params.get("limit")
+    if not limit:
+        return settings.API_PAGE_SIZE
+    if not limit.isdigit() or not 1 <= int(limit) <= settings.API_MAX_PAGE_SIZE:
+        raise InvalidRequest(f"limit must be between 1 and {settings.API_MAX_PAGE_SIZE}")
+    return int(limit)
+
+
+async def aetag(params, criteria):
+    state = await occupancy.aversion(criteria["checkin"], criteria["checkout"])
+    query = sorted((key, params.getlist(key)) for key in params)
+    return '"%s"' % hashlib.sha1(repr((VERSION, query, state)).encode()).hexdigest()
+
+
+def room_json(room):
+    data = {
+        "id": room.id,
+        "number": room.room_number,
+        "type": room.room_type,
+        "bed": room.bed_type,
+        "adults": room.capacity_adults,
+        "children": room.capacity_children,
+        "price": str(room.price_per_night),
+    }
+    if hasattr(room, "stay_total"):
+        # SQLite hands back computed decimals unscaled.
+        data["stay_total"] = str(room.stay_total.quantize(Decimal("0.01")))
+    # The smallest variant that fills a phone-width card, else the upload itself.
+    variant = images.smallest(room, settings.API_IMAGE_WIDTH)
+    if variant is not None:
+        data["image"] = room.image.storage.url(variant["webp"])
+    else:
+        data["image"] = room.image.url if room.image else None
+    return data
+
+
+def page_json(page, criteria):
+    data = {"rooms": [room_json(room) for room in page]}
+    if room_search.has_stay(criteria):
+        data["nights"] = (criteria["checkout"] - criteria["checkin"]).days
+    data["next"] = page.next_cursor
+    data["previous"] = page.previous_cursor
+    return data
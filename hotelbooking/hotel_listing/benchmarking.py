@@ -0,0 +1,182 @@
+"""
+Shared plumbing for the ``bench_*`` and ``check_*`` management commands.
+"""
+import asyncio
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlencode
+from pathlib import Path
+
+from django.db import connection, connections
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+
+@contextmanager
+def throwaway_database():
+    """
+    Run the block against a freshly migrated test database.
+
+    SQLite test databases go to a temporary file rather than memory so that
+    worker threads each get a real connection to the same data.
+    """
+    setup_test_environment()
+    tmpdir = tempfile.mkdtemp(prefix="hotelbooking-bench-")
+    if connection.vendor == "sqlite":
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(tmpdir, "bench.sqlite3")
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    # Keep generated files (receipts, ...) away from the real ones.
+    overrides = override_settings(RECEIPT_CACHE_DIR=Path(tmpdir) / "receipts")
+    overrides.enable()
+    try:
+        yield
+    finally:
+        overrides.disable()
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples`` (0 for an empty list)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(latencies, queries=()):
+    """Latency percentiles in milliseconds plus mean queries per call."""
+    summary = {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    if queries:
+        summary["queries_per_request"] = round(sum(queries) / len(queries), 2)
+    return summary
+
+
+def _max_rss_kb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == "darwin" else peak  # macOS reports bytes, Linux kilobytes
+
+
+def in_child_process(func):
+    """
+    Call ``func()`` in a forked child; returns ``(result, peak_rss_mb, rss_growth_mb)``.
+
+    ``result`` must be JSON-serializable. ``peak_rss_mb`` is the child's
+    resident-set high-water mark (``ru_maxrss``), which starts at the
+    parent's RSS at the fork; ``rss_growth_mb`` is how much ``func`` raised
+    it. Database writes persist, in-memory state (caches, ...) is discarded
+    with the child. Without ``fork`` (Windows) ``func`` runs here and both
+    figures are ``None``.
+    """
+    if not hasattr(os, "fork"):
+        return func(), None, None
+    connections.close_all()  # the child opens its own
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            before = _max_rss_kb()
+            result = func()
+            payload = {"result": result, "before": before, "peak": _max_rss_kb()}
+        except BaseException as e:
+            payload, status = {"error": f"{type(e).__name__}: {e}"}, 1
+        try:
+            with os.fdopen(write_fd, "w") as pipe:
+                json.dump(payload, pipe)
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        payload = json.load(pipe)
+    os.waitpid(pid, 0)
+    if "error" in payload:
+        raise RuntimeError(f"Benchmark child process failed: {payload['error']}")
+    return payload["result"], round(payload["peak"] / 1024, 1), round((payload["peak"] - payload["before"]) / 1024, 1)
+
+
+def run_concurrently(job, args_list, threads, count_queries=True):
+    """
+    Call ``job(*args)`` for every entry of ``args_list`` on a thread pool.
+
+    Returns ``(results, latencies, query_counts, wall_seconds)``. Each worker
+    thread opens its own DB connection.
+    """
+    def timed(args):
+        started = time.perf_counter()
+        if count_queries:
+            with CaptureQueriesContext(connection) as ctx:
+                result = job(*args)
+            count = len(ctx.captured_queries)
+        else:
+            result, count = job(*args), 0
+        return result, time.perf_counter() - started, count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(timed, args_list))
+    wall = time.perf_counter() - started
+
+    results = [result for result, _, _ in outcomes]
+    latencies = [latency for _, latency, _ in outcomes]
+    queries = [count for _, _, count in outcomes]
+    return results, latencies, queries, wall
+
+
+async def asgi_request(application, method, path, params=None, data=None, headers=()):
+    """
+    Send one HTTP request straight to an ASGI ``application``, as a server would.
+
+    Unlike ``AsyncClient``, this goes through ``ASGIHandler`` itself, so sync
+    views and middleware get their per-request threads as in production.
+    Returns ``(status, {header: value}, body)``.
+    """
+    body = urlencode(data or {}, doseq=True).encode()
+    raw_headers = [(b"host", b"testserver")] + [(name.lower().encode(), value.encode()) for name, value in headers]
+    if data is not None:
+        raw_headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": urlencode(params or {}, doseq=True).encode(), "root_path": "",
+        "headers": raw_headers, "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+    }
+    pending = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {"status": None, "headers": {}, "body": []}
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Future()  # the client never disconnects; cancelled when the handler is done
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {name.decode().lower(): value.decode() for name, value in message["headers"]}
+        else:
+            response["body"].append(message.get("body", b""))
+
+    await application(scope, receive, send)
+    return response["status"], response["headers"], b"".join(response["body"])
@@ -0,0 +1,313 @@
+"""
+Bulk booking import from CSV (``manage.py import_bookings`` and the admin upload).
+
+The file is streamed once, in chunks of ``batch_size`` valid rows. Every
+row is checked on its own (dates, capacity, status, price); when a chunk
+fills, overlaps are found per room with a sort-and-sweep over its rows
+together with the room's existing active bookings, loaded by one range
+query per chunk of rooms rather than one query per row, and the survivors
+are written straight away with ``bulk_create``, occupancy rows included,
+since bulk inserts bypass the ``Booking`` signals. Only the chunk being
+filled is held in memory. Earlier chunks are in the database by then, so a
+row clashing with one of them is rejected as overlapping that booking.
+
+Rows that fail are written to ``rejects`` as CSV with their line number and
+the reason, and never stop the import.
+"""
+import csv
+import time
+from collections import defaultdict, namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from . import occupancy, pricing, reservations, search_cache
+from .models import Booking, Guest, Room, RoomNight
+
+COLUMNS = (
+    "room_number", "start_date", "end_date", "num_adults", "num_children", "num_rooms",
+    "total_price", "booking_status", "guest_first_name", "guest_last_name", "guest_email", "guest_phone",
+)
+REQUIRED_COLUMNS = ("room_number", "start_date", "end_date", "num_adults")
+STATUSES = {status for status, _ in Booking.STATUS_CHOICES}
+ROOM_CHUNK = 500
+
+# A validated row; ``line`` is its line number in the file.
+Row = namedtuple("Row", [
+    "line", "room_id", "start_date", "end_date", "num_adults", "num_children", "num_rooms",
+    "total_price", "booking_status", "guest",
+])
+
+
+class ImportResult:
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return round(self.read / self.seconds) if self.seconds else 0
+
+    def __str__(self):
+        return (
+            f"{self.read} rows read, {self.imported} imported, {self.rejected} rejected "
+            f"in {self.seconds:.1f}s ({self.rows_per_second} rows/s)"
+        )
+
+
+class Rejected(ValueError):
+    pass
+
+
+def _integer(row, column, minimum, default=None):
+    value = (row.get(column) or "").strip()
+    if not value:
+        if default is None:
+            raise Rejected(f"{column} is required")
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise Rejected(f"{column} must be a whole number")
+    if number < minimum:
+        raise Rejected(f"{column} must be at least {minimum}")
+    return number
+
+
+def parse_row(line, row, rooms):
+    """Validate one CSV row on its own; ``rooms`` maps room_number to a ``Room``."""
+    room = rooms.get((row.get("room_number") or "").strip())
+    if room is None:
+        raise Rejected("unknown room_number")
+
+    start_date = parse_date((row.get("start_date") or "").strip() or "-")
+    end_date = parse_date((row.get("end_date") or "").strip() or "-")
+    if start_date is None or end_date is None:
+        raise Rejected("start_date and end_date must be YYYY-MM-DD")
+    if end_date <= start_date:
+        raise Rejected("end_date must be after start_date")
+
+    num_adults = _integer(row, "num_adults", 1)
+    num_children = _integer(row, "num_children", 0, default=0)
+    num_rooms = _integer(row, "num_rooms", 1, default=1)
+    if num_adults > room.capacity_adults * num_rooms or num_children > room.capacity_children * num_rooms:
+        raise Rejected(
+            f"room capacity exceeded (max {room.capacity_adults * num_rooms} adults, "
+            f"{room.capacity_children * num_rooms} children)"
+        )
+
+    status = (row.get("booking_status") or "").strip() or "Pending"
+    if status not in STATUSES:
+        raise Rejected(f"booking_status must be one of {', '.join(sorted(STATUSES))}")
+
+    price = (row.get("total_price") or "").strip()
+    if price:
+        try:
+            total_price = Decimal(price)
+        except InvalidOperation:
+            raise Rejected("total_price must be a number")
+        if total_price <= 0:
+            raise Rejected("total_price must be positive")
+    else:
+        total_price = pricing.quote(room.price_per_night, start_date, end_date, rooms=num_rooms).total
+
+    guest = tuple((row.get(f"guest_{field}") or "").strip() for field in ("first_name", "last_name", "email", "phone"))
+    if any(guest) and not (guest[0] and guest[1]):
+        raise Rejected("guest_first_name and guest_last_name are required when a guest is given")
+
+    return Row(line, room.pk, start_date, end_date, num_adults, num_children, num_rooms,
+               total_price, status, guest if any(guest) else None)
+
+
+def existing_stays(room_ids, start, end):
+    """Active bookings per room overlapping [start, end), sorted by start date."""
+    stays = defaultdict(list)
+    room_ids = sorted(room_ids)
+    for offset in range(0, len(room_ids), ROOM_CHUNK):
+        bookings = (
+            Booking.objects.filter(
+                room_id__in=room_ids[offset:offset + ROOM_CHUNK],
+                booking_status__in=occupancy.ACTIVE_STATUSES,
+                start_date__lt=end, end_date__gt=start,
+            )
+            .order_by("room_id", "start_date")
+            .values_list("room_id", "start_date", "end_date", "id")
+        )
+        for room_id, start_date, end_date, booking_id in bookings:
+            stays[room_id].append((start_date, end_date, booking_id))
+    return stays
+
+
+def sweep(rows, existing):
+    """
+    Split active rows of one room into (accepted, [(row, reason), ...]).
+
+    ``rows`` and ``existing`` are sorted by start date. Existing bookings
+    never overlap each other (the occupancy index enforces it), so one
+    forward pointer finds the clash for each row. Rows clashing with each
+    other keep the earliest-starting one.
+    """
+    accepted, rejected = [], []
+    i = 0
+    last = None
+    for row in rows:
+        while i < len(existing) and existing[i][1] <= row.start_date:
+            i += 1
+        if i < len(existing) and existing[i][0] < row.end_date:
+            rejected.append((row, f"overlaps existing booking {existing[i][2]}"))
+        elif last is not None and row.start_date < last.end_date:
+            rejected.append((row, f"overlaps line {last.line} of this file"))
+        else:
+            accepted.append(row)
+            last = row
+    return accepted, rejected
+
+
+def import_bookings(lines, rejects=None, batch_size=2000, dry_run=False):
+    """
+    Import bookings from an iterable of CSV text lines (a text file works).
+
+    ``rejects`` is an optional text file that receives the rejected rows.
+    With ``dry_run`` the import runs in a transaction that is rolled back,
+    so nothing is kept.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    reject_writer = None
+    if rejects is not None:
+        reject_writer = csv.writer(rejects)
+        reject_writer.writerow(("line", "reason") + COLUMNS)
+
+    def reject(line, row, reason):
+        result.rejected += 1
+        if reject_writer is not None:
+            reject_writer.writerow([line, reason] + [row.get(column, "") for column in COLUMNS])
+
+    reader = csv.DictReader(lines)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    rooms = {room.room_number: room for room in Room.objects.only(
+        "id", "room_number", "capacity_adults", "capacity_children", "price_per_night",
+    )}
+
+    def flush(chunk, raw):
+        by_room = defaultdict(list)
+        to_write = []
+        for row in chunk:
+            if row.booking_status in occupancy.ACTIVE_STATUSES:
+                by_room[row.room_id].append(row)
+            else:
+                to_write.append(row)
+        if by_room:
+            active = [row for rows in by_room.values() for row in rows]
+            existing = existing_stays(by_room, min(r.start_date for r in active), max(r.end_date for r in active))
+            for room_id, rows in by_room.items():
+                rows.sort(key=lambda row: (row.start_date, row.line))
+                accepted, clashes = sweep(rows, existing.get(room_id, []))
+                to_write.extend(accepted)
+                for row, reason in clashes:
+                    reject(row.line, raw[row.line], reason)
+        to_write.sort(key=lambda row: row.line)
+        lost = _write_chunk(to_write) if to_write else []
+        for row, reason in lost:
+            reject(row.line, raw[row.line], reason)
+        result.imported += len(to_write) - len(lost)
+
+    def run():
+        chunk, raw = [], {}
+        for row in reader:
+            result.read += 1
+            try:
+                parsed = parse_row(reader.line_num, row, rooms)
+            except Rejected as e:
+                reject(reader.line_num, row, str(e))
+                continue
+            chunk.append(parsed)
+            raw[parsed.line] = row
+            if len(chunk) >= batch_size:
+                flush(chunk, raw)
+                chunk, raw = [], {}
+        if chunk:
+            flush(chunk, raw)
+
+    if dry_run:
+        # Written and rolled back, so later chunks are still checked against earlier ones.
+        with transaction.atomic():
+            run()
+            transaction.set_rollback(True)
+    else:
+        run()
+        if result.imported:
+            search_cache.invalidate_rooms()
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _guests_for(chunk):
+    """Primary guest per row: existing guests are matched by email, the rest created in bulk."""
+    emails = {row.guest[2] for row in chunk if row.guest and row.guest[2]}
+    known = {}
+    for guest_id, email in Guest.objects.filter(email__in=emails).order_by("id").values_list("id", "email"):
+        known.setdefault(email, guest_id)
+
+    new, owners = {}, {}
+    for row in chunk:
+        if row.guest is None or row.guest[2] in known:
+            continue
+        first_name, last_name, email, phone = row.guest
+        key = email or ("line", row.line)
+        if key not in new:
+            new[key] = Guest(first_name=first_name, last_name=last_name, email=email or None, phone=phone or None)
+        owners[row.line] = key
+    created = dict(zip(new, Guest.objects.bulk_create(list(new.values()))))
+
+    guests = {}
+    for row in chunk:
+        if row.guest is None:
+            guests[row.line] = None
+        elif row.guest[2] in known:
+            guests[row.line] = known[row.guest[2]]
+        else:
+            guests[row.line] = created[owners[row.line]].pk
+    return guests
+
+
+def _booking(row, guest_id):
+    return Booking(
+        primary_guest_id=guest_id, room_id=row.room_id, start_date=row.start_date, end_date=row.end_date,
+        num_adults=row.num_adults, num_children=row.num_children, num_rooms=row.num_rooms,
+        total_price=row.total_price, booking_status=row.booking_status,
+    )
+
+
+def _write_chunk(chunk):
+    """Write one chunk; returns the rows that lost a race with a concurrent booking."""
+    try:
+        with transaction.atomic():
+            guests = _guests_for(chunk)
+            bookings = Booking.objects.bulk_create([_booking(row, guests[row.line]) for row in chunk])
+            RoomNight.objects.bulk_create(
+                [night for booking in bookings for night in occupancy.room_nights_for(booking)],
+                batch_size=5000,
+            )
+        return []
+    except IntegrityError:
+        pass
+
+    # Someone booked one of these rooms after the sweep; fall back to the
+    # reservation engine row by row so only the clashing rows are dropped.
+    lost = []
+    with transaction.atomic():
+        guests = _guests_for(chunk)
+        for row in chunk:
+            try:
+                reservations.book(_booking(row, guests[row.line]))
+            except reservations.RoomUnavailable:
+                lost.append((row, "overlaps a booking made during the import"))
+    return lost
@@ -0,0 +1,136 @@
+"""
+Admin changelist support for tables with millions of rows.
+
+* ``LargeTablePaginator`` never runs a full ``COUNT(*)``: an unfiltered
+  changelist shows the planner's row estimate, a filtered one counts at most
+  ``ADMIN_COUNT_CAP`` rows and shows "N+" beyond that.
+* ``KeysetChangeList`` pages by cursor (``?after=`` / ``?before=``) over
+  the admin's default ordering, so every page is an index seek instead of
+  an ever-growing OFFSET. Sorting by a column header falls back to the
+  stock numbered pages.
+* ``prefix_filter`` turns a search box term into case-insensitive prefix
+  ranges that the ``LOWER(column)`` indexes can serve, where the admin's
+  default ``icontains`` search has to scan the whole table.
+"""
+from django.conf import settings
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+from django.utils.functional import cached_property
+
+from .pagination import KeysetPaginator
+
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+
+
+def estimated_row_count(model, using="default"):
+    """The database's own estimate of the table's row count, or ``None`` if it has none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql, params = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table]
+    elif connection.vendor == "sqlite":
+        # Refreshed by ANALYZE; the first number of each stat is the row count.
+        sql, params = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:  # e.g. no sqlite_stat1 before the first ANALYZE
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+def prefix_filter(fields, search_term):
+    """
+    A ``Q`` matching rows where every word of ``search_term`` starts one of ``fields``, ignoring case.
+
+    Each word becomes ``LOWER(field) >= 'ann' AND LOWER(field) < 'ano'``
+    rather than ``LIKE 'ann%'``: a plain range is what both SQLite and
+    PostgreSQL can answer from an ordinary index on ``LOWER(field)``.
+    """
+    condition = Q()
+    for word in search_term.lower().split():
+        upper = word[:-1] + chr(ord(word[-1]) + 1)
+        any_field = Q()
+        for field in fields:
+            any_field |= Q(GreaterThanOrEqual(Lower(field), word), LessThan(Lower(field), upper))
+        condition &= any_field
+    return condition
+
+
+class LargeTablePaginator(Paginator):
+    estimated = False
+    capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_COUNT_CAP:
+                self.estimated = True
+                return estimate
+        cap = settings.ADMIN_COUNT_CAP
+        count = queryset.order_by()[:cap + 1].count()
+        if count > cap:
+            self.capped = True
+            return cap
+        return count
+
+
+def pop_cursor(request):
+    """Move the keyset cursor out of ``request.GET``, where the changelist would take it for a filter."""
+    if AFTER_VAR in request.GET or BEFORE_VAR in request.GET:
+        params = request.GET.copy()
+        request.keyset_cursor = (params.pop(AFTER_VAR, [None])[-1], params.pop(BEFORE_VAR, [None])[-1])
+        request.GET = params
+    else:
+        request.keyset_cursor = (None, None)
+
+
+class KeysetChangeList(ChangeList):
+    keyset_page = None
+
+    def get_results(self, request):
+        ordering = self.model_admin.get_keyset_ordering(request)
+        if ordering is None or ORDER_VAR in self.params or self.show_all:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        after, before = getattr(request, "keyset_cursor", (None, None))
+        page = KeysetPaginator(self.queryset, ordering, self.list_per_page).page(after=after, before=before)
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_other_pages()
+        self.paginator = paginator
+        self.keyset_page = page
+
+    def _cursor_url(self, **cursor):
+        return self.get_query_string(cursor, [PAGE_VAR, AFTER_VAR, BEFORE_VAR])
+
+    @property
+    def first_page_url(self):
+        return self._cursor_url()
+
+    @property
+    def next_page_url(self):
+        return self._cursor_url(**{AFTER_VAR: self.keyset_page.next_cursor})
+
+    @property
+    def previous_page_url(self):
+        return self._cursor_url(**{BEFORE_VAR: self.keyset_page.previous_cursor})
@@ -0,0 +1,30 @@
+"""
+System checks for settings the app relies on in production.
+"""
+from django.conf import settings
+from django.core import checks
+
+from . import search_cache
+
+# Cache aliases every process has to see, and what goes wrong when it can't.
+SHARED_CACHES = {
+    "SEARCH_CACHE_ALIAS": "search results, room cards and their hit/miss counters aren't shared "
+                          "between workers and management commands",
+    "SESSION_CACHE_ALIAS": "a worker keeps serving sessions that another one has ended or changed",
+}
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_caches_are_shared(app_configs, **kwargs):
+    """The search cache holds invalidation tokens, the sessions cache live sessions (see search_cache.py, settings.py)."""
+    errors = []
+    for setting, consequence in SHARED_CACHES.items():
+        alias = getattr(settings, setting)
+        if search_cache.is_shared(alias):
+            continue
+        errors.append(checks.Error(
+            f"CACHES[{alias!r}] is process-local, so {consequence}.",
+            hint=f"Point {setting} at a shared backend such as RedisCache or FileBasedCache.",
+            id="hotel_listing.E001",
+        ))
+    return errors
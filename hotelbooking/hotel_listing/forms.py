@@ -53,3 +53,14 @@ class CustomPasswordChangeForm(PasswordChangeForm):
                 'placeholder': 'Confirm new password',
             }
         )
+
+
+from django.contrib.auth.forms import UserCreationForm
+
+class AccountActivationForm(UserCreationForm):
+    """Username and password for a guest-checkout booker; see accounts.activate."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'w-full border rounded p-2 focus:ring-2 focus:ring-[#2a6f97]'
@@ -0,0 +1,145 @@
+"""
+Resized variants of ``Room.image`` for responsive ``srcset`` markup.
+
+Every upload is decoded once and saved at each width in ``WIDTHS`` (never
+upscaled) as both WebP and JPEG, next to the original:
+``rooms/variants/<original stem>-<width>w.<ext>``. What was written is
+recorded on ``Room.image_variants``::
+
+    {"source": "rooms/suite.png",
+     "variants": [{"width": 320, "height": 213,
+                   "webp": "rooms/variants/suite-320w.webp",
+                   "jpeg": "rooms/variants/suite-320w.jpg"}, ...]}
+
+so templates build ``srcset`` from the row alone, without touching
+storage. ``source`` tells whether the variants still belong to the current
+image; ``signals.py`` refreshes them when it changes and the
+``build_room_images`` command backfills existing rooms.
+"""
+import io
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import room_cards, search_cache
+from .models import Room
+
+# Card images are 12rem tall and up to a third of the page wide; 1280 covers
+# a 2x screen on the room page.
+WIDTHS = (320, 640, 1280)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def variant_name(source, width, fmt):
+    path = PurePosixPath(source)
+    return str(path.parent / "variants" / f"{path.stem}-{width}w.{EXTENSIONS[fmt]}")
+
+
+def is_current(room):
+    return bool(room.image) and (room.image_variants or {}).get("source") == room.image.name
+
+
+def render(data):
+    """Encode every variant of the image bytes ``data``: ``[(width, height, {fmt: bytes})]``."""
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode != "RGB":
+            # Flatten transparency onto white; JPEG has no alpha channel.
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+            image = background
+
+    # Never upscale: an image narrower than the largest width keeps its own
+    # width as the widest variant.
+    widths = [width for width in WIDTHS if width < image.width]
+    if len(widths) < len(WIDTHS):
+        widths.append(image.width)
+
+    rendered = []
+    for width in widths:
+        resized = image
+        if width < image.width:
+            resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        encoded = {}
+        for fmt, (pil_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            encoded[fmt] = buffer.getvalue()
+        rendered.append((resized.width, resized.height, encoded))
+    return rendered
+
+
+def read_source(room):
+    with room.image.open("rb") as f:
+        return f.read()
+
+
+def render_stored(name):
+    """``render()`` the stored upload ``name``; a picklable entry point for worker processes."""
+    with Room._meta.get_field("image").storage.open(name, "rb") as f:
+        return render(f.read())
+
+
+def store(room, rendered):
+    """Write rendered variants to the image's storage; returns the ``image_variants`` value."""
+    storage = room.image.storage
+    variants = []
+    for width, height, encoded in rendered:
+        variant = {"width": width, "height": height}
+        for fmt, data in encoded.items():
+            name = variant_name(room.image.name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            variant[fmt] = storage.save(name, ContentFile(data))
+        variants.append(variant)
+    return {"source": room.image.name, "variants": variants}
+
+
+def names(image_variants):
+    return {variant[fmt] for variant in (image_variants or {}).get("variants", ()) for fmt in FORMATS if variant.get(fmt)}
+
+
+def refresh(room, rendered=None):
+    """
+    Bring ``room.image_variants`` in line with ``room.image``, saving only that column.
+
+    ``rendered`` is ``render()``'s output when the caller has already done
+    the CPU-heavy part, e.g. on a worker thread.
+    """
+    old = room.image_variants or {}
+    storage = room.image.storage
+    if room.image:
+        new = store(room, rendered if rendered is not None else render(read_source(room)))
+    else:
+        new = {}
+    # Files of the previous image that weren't just overwritten in place.
+    for name in names(old) - names(new):
+        storage.delete(name)
+    room.image_variants, room.updated_at = new, timezone.now()
+    Room.objects.filter(pk=room.pk).update(image_variants=new, updated_at=room.updated_at)
+    # An update() sends no post_save, so the caches need telling, as
+    # signals.py would; updated_at moves the API's ETag.
+    search_cache.invalidate_rooms()
+    room_cards.invalidate(room.pk)
+
+
+def srcset(room, fmt):
+    variants = (room.image_variants or {}).get("variants", ()) if is_current(room) else ()
+    return ", ".join(f"{room.image.storage.url(variant[fmt])} {variant['width']}w" for variant in variants)
+
+
+def smallest(room, min_width=0):
+    """The smallest current variant at least ``min_width`` wide (else the widest), or ``None``."""
+    if not is_current(room):
+        return None
+    variants = room.image_variants.get("variants") or ()
+    for variant in variants:
+        if variant["width"] >= min_width:
+            return variant
+    return variants[-1] if variants else None
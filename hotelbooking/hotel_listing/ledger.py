@@ -0,0 +1,73 @@
+"""
+Payment totals persisted on ``Booking``: ``amount_paid`` and ``payment_state``.
+
+``amount_paid`` is the sum of the booking's payments (whatever their status,
+as the pages have always counted them) and ``payment_state`` is Paid,
+Partial or Unpaid against ``total_price``. Pages, admin filters and the
+front desk's unpaid list read these columns instead of aggregating
+``payments`` per request.
+
+Every ``Payment`` save or delete, and every ``Booking`` update (the price
+may have changed), re-derives the columns of the bookings it touches in one
+``UPDATE`` whose sums are subqueries (see signals.py), so concurrent
+payments can't lose each other's amounts. Callers that write payments do
+it inside ``transaction.atomic()``, as the admin and ``add_payment`` do, so
+the payment and its booking's columns commit together.
+
+Bulk writes bypass the signals: ``rebuild`` re-derives every booking, and
+``find_drift`` (``manage.py reconcile_payments``) lists the bookings whose
+columns disagree with their payments so ``refresh`` can repair them.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, CharField, F, Value, When
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
+
+from .models import Booking, payments_total
+
+PAID, PARTIAL, UNPAID = "Paid", "Partial", "Unpaid"
+
+
+def _state(paid):
+    return Case(
+        When(GreaterThanOrEqual(paid, F("total_price")), then=Value(PAID)),
+        When(GreaterThan(paid, Value(Decimal("0.00"))), then=Value(PARTIAL)),
+        default=Value(UNPAID),
+        output_field=CharField(),
+    )
+
+
+def refresh(*booking_ids):
+    """Re-derive ``amount_paid`` and ``payment_state`` of these bookings from their payments."""
+    ids = {booking_id for booking_id in booking_ids if booking_id is not None}
+    if not ids:
+        return 0
+    paid = payments_total()
+    return Booking.objects.filter(pk__in=ids).update(amount_paid=paid, payment_state=_state(paid))
+
+
+def rebuild(batch_size=2000):
+    """Re-derive every booking; returns how many were updated."""
+    updated, last_id = 0, 0
+    while True:
+        ids = list(
+            Booking.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return updated
+        updated += refresh(*ids)
+        last_id = ids[-1]
+
+
+def find_drift(batch_size=2000):
+    """``(booking_id, amount_paid, payment_state, actual_paid, actual_state)`` for every drifted booking."""
+    drifted, last_id = [], 0
+    while True:
+        rows = list(
+            Booking.objects.with_payment_totals().filter(pk__gt=last_id).order_by("pk")
+            .values_list("pk", "amount_paid", "payment_state", "total_paid", "payment_status")[:batch_size]
+        )
+        if not rows:
+            return drifted
+        drifted.extend(row for row in rows if (row[1], row[2]) != (row[3], row[4]))
+        last_id = rows[-1][0]
@@ -0,0 +1,110 @@
+"""
+Password checks for the login view, off the event loop and bounded.
+
+PBKDF2 is slow on purpose: hundreds of milliseconds of CPU per attempt.
+``hashlib`` releases the GIL while it runs, so checks go to a small thread
+pool of ``LOGIN_HASH_WORKERS`` threads and the ASGI event loop keeps serving
+other requests meanwhile. At most ``LOGIN_HASH_QUEUE`` checks are admitted
+at once, running or waiting; 0 means no waiting, just the pool's threads.
+Past that, ``authenticate`` raises ``Busy``
+straight away and the view answers 429. A burst of logins can therefore
+use only those threads' worth of CPU, and waits at most one queue's worth
+of work, instead of piling up behind the search pages.
+
+On Linux the pool's threads are also reniced by ``LOGIN_HASH_NICE``, so
+when the cores are busy the scheduler serves page requests before hashes.
+
+``authenticate`` does what ``ModelBackend`` does, the only backend this
+site uses. That includes hashing for unknown usernames, so response times
+don't reveal which accounts exist.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, user_login_failed
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+BACKEND = "django.contrib.auth.backends.ModelBackend"
+
+
+class Busy(Exception):
+    """The hashing pool is full; the caller should retry later."""
+
+
+def _lower_priority():
+    if hasattr(os, "setpriority") and settings.LOGIN_HASH_NICE:
+        try:
+            # Linux applies a "process" priority to a single thread when given its TID.
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.LOGIN_HASH_NICE)
+        except OSError:
+            pass
+
+
+_pool = None
+_slots = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.LOGIN_HASH_WORKERS, thread_name_prefix="login-hash", initializer=_lower_priority,
+            )
+            _slots = threading.BoundedSemaphore(settings.LOGIN_HASH_QUEUE or settings.LOGIN_HASH_WORKERS)
+        return _pool, _slots
+
+
+@receiver(setting_changed)
+def reset_pool(setting, **kwargs):
+    global _pool, _slots
+    if setting in ("LOGIN_HASH_WORKERS", "LOGIN_HASH_QUEUE", "LOGIN_HASH_NICE"):
+        with _lock:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = _slots = None
+
+
+async def run(func, *args):
+    """Run ``func(*args)`` on the hashing pool, or raise ``Busy`` if it has no free slot."""
+    pool, slots = get_pool()
+    if not slots.acquire(blocking=False):
+        raise Busy
+    future = pool.submit(func, *args)
+    # Freed when the hash finishes, even if the client has gone away.
+    future.add_done_callback(lambda _: slots.release())
+    return await asyncio.wrap_future(future)
+
+
+async def authenticate(request, username, password):
+    """The active user with these credentials, or ``None``; raises ``Busy``."""
+    UserModel = get_user_model()
+    user = None
+    if username:
+        user = await UserModel._default_manager.filter(**{UserModel.USERNAME_FIELD: username}).afirst()
+    if user is None:
+        await run(make_password, password)
+        correct = must_update = False
+    else:
+        correct, must_update = await run(verify_password, password, user.password)
+
+    if not correct or not user.is_active:
+        await user_login_failed.asend(sender=__name__, credentials={"username": username}, request=request)
+        return None
+    if must_update:
+        # Stored with an older hasher or fewer iterations than today's
+        # default. When the pool is full the upgrade waits for a later login.
+        try:
+            user.password = await run(make_password, password)
+        except Busy:
+            pass
+        else:
+            await user.asave(update_fields=["password"])
+    user.backend = BACKEND
+    return user
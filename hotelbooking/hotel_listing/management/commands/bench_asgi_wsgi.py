@@ -0,0 +1,210 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from hotel_listing import benchmarking, search_cache, synthetic
+from hotel_listing.models import Booking, Guest, Room
+
+try:
+    import uvicorn
+except ImportError:  # optional; only this benchmark's ASGI half needs it
+    uvicorn = None
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref's server with a fixed pool of worker threads, like gunicorn's gthread worker."""
+
+    request_queue_size = 1024
+
+    def __init__(self, address, threads):
+        super().__init__(address, QuietHandler)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+@contextmanager
+def serve_wsgi(threads):
+    httpd = PooledWSGIServer(("127.0.0.1", 0), threads)
+    httpd.set_app(get_wsgi_application())
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        yield httpd.server_port
+    finally:
+        httpd.shutdown()
+        httpd.pool.shutdown(wait=True)
+        httpd.server_close()
+        connections.close_all()
+
+
+@contextmanager
+def serve_asgi():
+    server = uvicorn.Server(uvicorn.Config(
+        get_asgi_application(), host="127.0.0.1", port=0, log_level="warning", access_log=False, lifespan="off",
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield server.servers[0].sockets[0].getsockname()[1]
+    finally:
+        server.should_exit = True
+        thread.join()
+        connections.close_all()
+
+
+async def fetch(port, path, cookie=None):
+    """GET ``path`` over a fresh HTTP/1.1 connection; returns the status code."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = f"GET {path} HTTP/1.1\r\nHost: testserver\r\nConnection: close\r\n"
+    if cookie:
+        head += f"Cookie: {cookie}\r\n"
+    writer.write((head + "\r\n").encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1]) if response else 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the site from a local WSGI server (wsgiref with a fixed thread "
+        "pool) and a local ASGI server (uvicorn, if installed), drive both "
+        "with the same concurrent mix of home searches, room pages, "
+        "dashboards and booking details, and report throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64], help="Concurrent clients per run.")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Length of each run.")
+        parser.add_argument("--wsgi-threads", type=int, default=8, help="Worker threads of the WSGI server.")
+        parser.add_argument("--servers", nargs="+", choices=("wsgi", "asgi"), default=["wsgi", "asgi"])
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--guests", type=int, default=1000)
+        parser.add_argument("--bookings", type=int, default=10000)
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if "asgi" in options["servers"] and uvicorn is None:
+            raise CommandError("The ASGI run needs uvicorn (pip install uvicorn), or pass --servers wsgi.")
+        results = {}
+        with benchmarking.throwaway_database():
+            synthetic.seed(rooms=options["rooms"], guests=options["guests"], bookings=options["bookings"])
+            # Both servers run sync code on short-lived or pooled threads;
+            # keep them on equal terms with a connection per request.
+            connections.settings["default"]["CONN_MAX_AGE"] = 0
+            requests = self.request_mix()
+            connections.close_all()
+
+            # Every request is slow once the server is saturated; don't log them all.
+            with override_settings(METRICS_SLOW_REQUEST_SECONDS=float("inf")):
+                for server in options["servers"]:
+                    for concurrency in options["concurrency"]:
+                        search_cache.get_cache().clear()
+                        serving = serve_wsgi(options["wsgi_threads"]) if server == "wsgi" else serve_asgi()
+                        with serving as port:
+                            results[f"{server}_c{concurrency}"] = asyncio.run(
+                                self.drive(port, requests, concurrency, options["seconds"])
+                            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(f"{name}:")
+            for key, value in result.items():
+                self.stdout.write(f"{key:>24}: {value}")
+
+    def request_mix(self):
+        """(kind, path, cookie) requests in the proportions of a browsing session."""
+        rng = random.Random(0)
+        home, requests = reverse("home"), []
+        guests = list(Guest.objects.filter(bookings__isnull=False).distinct().order_by("id")[:50])
+        signed_in = []
+        for guest in guests:
+            user = User.objects.create_user(username=f"bench{guest.id}", password=None)
+            Guest.objects.filter(pk=guest.pk).update(user=user)
+            client = Client()
+            client.force_login(user)
+            booking_ids = list(Booking.objects.filter(primary_guest=guest).values_list("id", flat=True)[:5])
+            signed_in.append((f"sessionid={client.cookies['sessionid'].value}", booking_ids))
+        room_ids = list(Room.objects.values_list("id", flat=True))
+
+        for _ in range(2000):
+            checkin = date(2025, 1, 1) + timedelta(days=rng.randrange(300))
+            stay = {"checkin": checkin.isoformat(), "checkout": (checkin + timedelta(days=rng.randint(1, 7))).isoformat(), "adults": "1"}
+            cookie, booking_ids = rng.choice(signed_in)
+            kind = rng.choices(("home", "book_room", "dashboard", "booking_details"), weights=(4, 2, 2, 2))[0]
+            if kind == "home":
+                requests.append((kind, f"{home}?{urlencode(stay)}", None))
+            elif kind == "book_room":
+                requests.append((kind, f"{reverse('book_room', args=[rng.choice(room_ids)])}?{urlencode(stay)}", None))
+            elif kind == "dashboard":
+                requests.append((kind, reverse("dashboard"), cookie))
+            else:
+                requests.append((kind, reverse("booking_details", args=[rng.choice(booking_ids)]), cookie))
+        return requests
+
+    async def drive(self, port, requests, concurrency, seconds):
+        stop = time.perf_counter() + seconds
+        outcomes = []
+
+        async def client(n):
+            i = n
+            while time.perf_counter() < stop:
+                kind, path, cookie = requests[i % len(requests)]
+                i += concurrency
+                started = time.perf_counter()
+                try:
+                    status = await fetch(port, path, cookie)
+                except OSError:
+                    status = 0
+                outcomes.append((kind, status, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[client(n) for n in range(concurrency)])
+        wall = time.perf_counter() - started
+
+        ok = [seconds for _, status, seconds in outcomes if status == 200]
+        result = {
+            "requests_ok": len(ok),
+            "errors": len(outcomes) - len(ok),
+            "requests_per_second": round(len(ok) / wall, 1),
+            "p50_ms": round(benchmarking.percentile(ok, 50) * 1000, 1),
+            "p99_ms": round(benchmarking.percentile(ok, 99) * 1000, 1),
+        }
+        for kind in ("home", "book_room", "dashboard", "booking_details"):
+            latencies = [seconds for k, status, seconds in outcomes if k == kind and status == 200]
+            result[f"{kind}_p50_ms"] = round(benchmarking.percentile(latencies, 50) * 1000, 1)
+        return result
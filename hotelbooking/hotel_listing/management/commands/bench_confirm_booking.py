@@ -0,0 +1,77 @@
+import json
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from hotel_listing import benchmarking, synthetic
+from hotel_listing.models import Booking, Guest, Meal, Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Submit confirm_booking concurrently against a throwaway database and "
+        "report queries per request and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--adults", type=int, default=4)
+        parser.add_argument("--children", type=int, default=2)
+        parser.add_argument("--rooms", type=int, default=50, help="Distinct rooms to spread submissions over.")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        with benchmarking.throwaway_database():
+            summary = self.run(options)
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+        else:
+            for key, value in summary.items():
+                self.stdout.write(f"{key:>22}: {value}")
+
+    def run(self, options):
+        synthetic.seed(rooms=options["rooms"], guests=0, bookings=0)
+        Room.objects.update(capacity_adults=options["adults"], capacity_children=options["children"])
+        rooms = list(Room.objects.values_list("id", flat=True))
+        meal_ids = [str(pk) for pk in Meal.objects.values_list("id", flat=True)]
+
+        jobs = []
+        for n in range(options["requests"]):
+            user = User.objects.create_user(username=f"bench{n}", password=None)
+            Guest.objects.create(user=user, first_name="Bench", last_name=str(n), email=f"bench{n}@example.com")
+            client = Client()
+            client.force_login(user)
+            # Each submission gets its own room-week so none of them conflict.
+            checkin = date(2030, 1, 1) + timedelta(days=7 * (n // len(rooms)))
+            jobs.append((client, rooms[n % len(rooms)], checkin))
+
+        def submit(client, room_id, checkin):
+            query = (
+                f"?checkin={checkin}&checkout={checkin + timedelta(days=3)}"
+                f"&adults={options['adults']}&children={options['children']}&rooms=1"
+            )
+            data = {"is_primary_guest_in_booking": "on", "meals": meal_ids}
+            for i in range(1, options["adults"]):
+                data.update({f"adult_{i}_first": "Adult", f"adult_{i}_last": str(i), f"adult_{i}_email": f"a{i}@example.com"})
+            for i in range(1, options["children"] + 1):
+                data.update({f"child_{i}_first": "Child", f"child_{i}_last": str(i)})
+            response = client.post(reverse("confirm_booking", args=[room_id]) + query, data)
+            return response.status_code
+
+        statuses, latencies, queries, wall = benchmarking.run_concurrently(
+            submit, jobs, threads=options["threads"],
+        )
+        summary = benchmarking.summarize(latencies, queries)
+        summary.update({
+            "threads": options["threads"],
+            "guests_per_booking": options["adults"] + options["children"],
+            "succeeded": statuses.count(302),
+            "failed": len(statuses) - statuses.count(302),
+            "bookings_created": Booking.objects.count(),
+            "throughput_rps": round(len(jobs) / wall, 1),
+        })
+        return summary
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from hotel_listing import benchmarking, search_cache, synthetic
+
+PASSWORD = "storm-pass-1"
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve home searches through the ASGI application, alone and then "
+        "during a storm of concurrent logins with real password hashes, and "
+        "report search latency and login outcomes for each phase. The storm "
+        "runs once with settings.LOGIN_HASH_* and once with a pool as large "
+        "as the storm, which is how thread-per-request logins behave."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--searchers", type=int, default=8, help="Concurrent search clients.")
+        parser.add_argument("--logins", type=int, default=32, help="Concurrent login clients during the storm.")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Length of each phase.")
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--bookings", type=int, default=5000)
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        results = {}
+        with benchmarking.throwaway_database():
+            synthetic.seed(rooms=options["rooms"], guests=options["bookings"] // 5, bookings=options["bookings"])
+            # One real hash shared by every account: seeding stays cheap, each check costs the full PBKDF2.
+            encoded = make_password(PASSWORD)
+            User.objects.bulk_create([User(username=f"storm{n}", password=encoded) for n in range(options["logins"])])
+            # Under ASGI every request runs sync code on a fresh thread, so
+            # persistent connections would only pile up.
+            connections.settings["default"]["CONN_MAX_AGE"] = 0
+            connections.close_all()
+
+            application = get_asgi_application()
+            phases = (
+                ("idle", 0, {}),
+                ("storm_bounded", options["logins"], {}),
+                ("storm_unbounded", options["logins"], {"LOGIN_HASH_WORKERS": options["logins"], "LOGIN_HASH_QUEUE": options["logins"]}),
+            )
+            for name, logins, overrides in phases:
+                search_cache.get_cache().clear()
+                with override_settings(**overrides):
+                    results[name] = asyncio.run(self.phase(application, options, logins))
+                    results[name]["hash_workers"] = settings.LOGIN_HASH_WORKERS
+                    results[name]["hash_queue"] = settings.LOGIN_HASH_QUEUE
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(f"{name}:")
+            for key, value in result.items():
+                self.stdout.write(f"{key:>24}: {value}")
+
+    async def phase(self, application, options, logins):
+        login_url = reverse("login")
+        status, headers, _ = await benchmarking.asgi_request(application, "GET", login_url)
+        csrf = SimpleCookie(headers.get("set-cookie", ""))[settings.CSRF_COOKIE_NAME].value
+        login_headers = [("cookie", f"{settings.CSRF_COOKIE_NAME}={csrf}"), ("x-csrftoken", csrf)]
+
+        rng = random.Random(0)
+        home = reverse("home")
+        stop = time.perf_counter() + options["seconds"]
+        searches, attempts = [], []
+
+        async def searcher():
+            while time.perf_counter() < stop:
+                checkin = date(2025, 1, 1) + timedelta(days=rng.randrange(300))
+                params = {"checkin": checkin.isoformat(), "checkout": (checkin + timedelta(days=rng.randint(1, 7))).isoformat()}
+                started = time.perf_counter()
+                status, _, _ = await benchmarking.asgi_request(application, "GET", home, params)
+                searches.append((status, time.perf_counter() - started))
+
+        async def login(n):
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                status, headers, _ = await benchmarking.asgi_request(
+                    application, "POST", login_url, data={"username": f"storm{n}", "password": PASSWORD}, headers=login_headers,
+                )
+                attempts.append((status, time.perf_counter() - started))
+                if status == 429:
+                    await asyncio.sleep(float(headers["retry-after"]))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[searcher() for _ in range(options["searchers"])], *[login(n) for n in range(logins)])
+        wall = time.perf_counter() - started
+
+        search_latencies = [seconds for status, seconds in searches if status == 200]
+        signed_in = [seconds for status, seconds in attempts if status == 302]
+        return {
+            "searches_ok": len(search_latencies),
+            "search_errors": len(searches) - len(search_latencies),
+            "searches_per_second": round(len(search_latencies) / wall, 1),
+            "search_p50_ms": round(benchmarking.percentile(search_latencies, 50) * 1000, 1),
+            "search_p99_ms": round(benchmarking.percentile(search_latencies, 99) * 1000, 1),
+            "logins_ok": len(signed_in),
+            "logins_rejected_429": sum(1 for status, _ in attempts if status == 429),
+            "logins_other": sum(1 for status, _ in attempts if status not in (302, 429)),
+            "login_p50_ms": round(benchmarking.percentile(signed_in, 50) * 1000, 1),
+            "login_p99_ms": round(benchmarking.percentile(signed_in, 99) * 1000, 1),
+        }
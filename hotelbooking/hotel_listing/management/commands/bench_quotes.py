@@ -0,0 +1,69 @@
+import json
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_listing import benchmarking, pricing, synthetic
+from hotel_listing.models import Meal, Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Quote every room for several date ranges with quote(), quote_many() and "
+        "the SQL annotation, against a throwaway database, and report timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=10000)
+        parser.add_argument("--ranges", type=int, default=5, help="Date ranges quoted per room.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy; the best one is reported.")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        with benchmarking.throwaway_database():
+            summary = self.run(options)
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+        else:
+            for key, value in summary.items():
+                self.stdout.write(f"{key:>22}: {value}")
+
+    def run(self, options):
+        synthetic.seed(rooms=options["rooms"], guests=0, bookings=0)
+        rooms = list(Room.objects.only("id", "price_per_night"))
+        meal_prices = list(Meal.objects.values_list("price", flat=True))
+        ranges = [
+            (date(2030, 1, 1) + timedelta(days=7 * n), date(2030, 1, 1) + timedelta(days=7 * n + 1 + n % 6))
+            for n in range(options["ranges"])
+        ]
+        stays = [(room, checkin, checkout, meal_prices, 2) for checkin, checkout in ranges for room in rooms]
+
+        def per_stay():
+            return [pricing.quote(room.price_per_night, checkin, checkout, meals, n) for room, checkin, checkout, meals, n in stays]
+
+        def batched():
+            return pricing.quote_many(stays)
+
+        def in_sql():
+            totals = []
+            for checkin, checkout in ranges:
+                queryset = pricing.annotate_stay_total(Room.objects.all(), checkin, checkout, meal_prices, rooms=2)
+                totals.extend(queryset.values_list("stay_total", flat=True))
+            return totals
+
+        if [q.total for q in per_stay()] != [q.total for q in batched()]:
+            raise CommandError("quote_many() disagrees with quote().")
+
+        summary = {"rooms": len(rooms), "ranges": len(ranges), "quotes": len(stays)}
+        for name, strategy in (("quote", per_stay), ("quote_many", batched), ("sql_annotation", in_sql)):
+            best = min(self.time(strategy) for _ in range(options["repeat"]))
+            summary[f"{name}_ms"] = round(best * 1000, 1)
+            summary[f"{name}_per_s"] = round(len(stays) / best)
+        return summary
+
+    @staticmethod
+    def time(strategy):
+        started = time.perf_counter()
+        strategy()
+        return time.perf_counter() - started
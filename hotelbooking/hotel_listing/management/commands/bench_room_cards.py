@@ -0,0 +1,60 @@
+import json
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import reverse
+
+from hotel_listing import benchmarking, pricing, room_cards, synthetic
+from hotel_listing.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the home page's result list for a search matching every "
+        "room, with the card cache cold (each card rendered, as before it "
+        "existed) and warm, and report render time percentiles for both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=30, help="Renders per phase.")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        results = {}
+        with benchmarking.throwaway_database():
+            synthetic.seed(rooms=options["rooms"], guests=10, bookings=0)
+            checkin, checkout = date(2030, 1, 10), date(2030, 1, 13)
+            rooms = list(pricing.annotate_stay_total(Room.objects.order_by("id"), checkin, checkout))
+            params = {"checkin": checkin.isoformat(), "checkout": checkout.isoformat(), "adults": "1"}
+            request = RequestFactory().get(reverse("home"), params)
+            request.user = None
+            context = {"rooms": rooms, "nights": 3, "stay_rooms": 1, "book_query": "checkin=2030-01-10&checkout=2030-01-13&adults=1"}
+
+            for phase in ("cold", "warm"):
+                timings = []
+                room_cards.get_cache().clear()
+                if phase == "warm":
+                    room_cards.attach(rooms)
+                for _ in range(options["repeat"]):
+                    if phase == "cold":
+                        room_cards.get_cache().clear()
+                    started = time.perf_counter()
+                    room_cards.attach(rooms)
+                    html = render_to_string("home.html", context, request)
+                    timings.append(time.perf_counter() - started)
+                results[phase] = {
+                    "rooms": len(rooms),
+                    "bytes": len(html),
+                    "p50_ms": round(benchmarking.percentile(timings, 50) * 1000, 1),
+                    "p99_ms": round(benchmarking.percentile(timings, 99) * 1000, 1),
+                }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(f"{name:>6}: " + ", ".join(f"{key}={value}" for key, value in result.items()))
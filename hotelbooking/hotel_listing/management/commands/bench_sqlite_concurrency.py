@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from hotel_listing import benchmarking, search_cache, synthetic
+from hotel_listing.models import Booking, Guest, Meal, Room
+
+# Django's stock SQLite settings: rollback journal, 5 s busy timeout from
+# the sqlite3 module, deferred transactions, a new connection per request.
+STOCK = {"CONN_MAX_AGE": 0, "OPTIONS": {}}
+LOCK_MESSAGES = (b"database is locked", b"database table is locked")
+
+
+def _outcome(send, expected_status):
+    """'ok', 'locked' or 'error' for one request; the booking views report DB errors in the page."""
+    try:
+        response = send()
+    except OperationalError as e:
+        return "locked" if "locked" in str(e) else "error"
+    finally:
+        # What the WSGI handler does at the end of every request; honours CONN_MAX_AGE.
+        close_old_connections()
+    # add_payment only reports the error through the messages framework.
+    notes = " ".join(str(message) for message in (response.context or {}).get("messages", ())).encode()
+    if any(message in response.content or message in notes for message in LOCK_MESSAGES):
+        return "locked"
+    return "ok" if response.status_code == expected_status else "error"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent writer threads (confirm_booking and add_payment posts) "
+        "and reader threads (dashboard and availability calendar) against a "
+        "throwaway SQLite database, once with Django's stock SQLite settings "
+        "and once with the profile in settings.DATABASES, and report "
+        "throughput, latency and 'database is locked' failures for each."
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.local = threading.local()
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=400, help="Write requests per profile.")
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--guests", type=int, default=2000)
+        parser.add_argument("--bookings", type=int, default=20000)
+        parser.add_argument("--profiles", nargs="+", choices=("stock", "tuned"), default=["stock", "tuned"])
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark compares SQLite settings; the default database is not SQLite.")
+        tuned = {key: settings.DATABASES["default"].get(key) for key in STOCK}
+        with benchmarking.throwaway_database():
+            synthetic.seed(rooms=options["rooms"], guests=options["guests"], bookings=options["bookings"])
+            results = {}
+            for n, name in enumerate(options["profiles"]):
+                self.apply(STOCK if name == "stock" else tuned)
+                results[name] = self.run(options, first_day=date(2040, 1, 1) + timedelta(days=3650 * n))
+            self.apply(tuned)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(f"{name}:")
+            for key, value in result.items():
+                self.stdout.write(f"{key:>24}: {value}")
+
+    def apply(self, profile):
+        """Switch every new connection to ``profile``; the journal mode is stored in the file, so reset it too."""
+        connections.close_all()
+        settings_dict = connections.settings["default"]
+        settings_dict.update({"CONN_MAX_AGE": profile["CONN_MAX_AGE"], "OPTIONS": dict(profile["OPTIONS"] or {})})
+        if not profile["OPTIONS"]:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=DELETE")
+            connection.close()
+
+    def client(self, session_key):
+        """This thread's test client, signed in as ``session_key``; ``Client`` isn't thread-safe."""
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = Client()
+        client.cookies = SimpleCookie()
+        client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        return client
+
+    def fixtures(self, options, first_day):
+        """Writes as (session key, url, data) and one session key per reader."""
+        rooms = list(Room.objects.order_by("id").values_list("id", flat=True))
+        meal_ids = [str(pk) for pk in Meal.objects.values_list("id", flat=True)][:1]
+        stamp = first_day.toordinal()
+        users = []
+        for n in range(options["writers"] + options["readers"]):
+            user = User.objects.create_user(username=f"bench{stamp}_{n}", password=None)
+            guest = Guest.objects.create(user=user, first_name="Bench", last_name=str(n))
+            client = Client()
+            client.force_login(user)
+            users.append((client.cookies[settings.SESSION_COOKIE_NAME].value, guest))
+
+        writes = []
+        for n in range(options["writes"]):
+            session_key, guest = users[n % options["writers"]]
+            if n % 2:
+                # Pay a booking made for this run, so every payment is a fresh insert.
+                booking = Booking.objects.create(
+                    primary_guest=guest, room_id=rooms[n % len(rooms)], total_price=100,
+                    start_date=first_day - timedelta(days=7 + n), end_date=first_day - timedelta(days=6 + n),
+                    num_adults=1, num_children=0, booking_status="Pending",
+                )
+                url = reverse("add_payment", args=[booking.id])
+                data = {"amount": "100.00", "method": "Cash", "transaction_code": f"BENCH{booking.id}"}
+            else:
+                # One room-week per booking, far from the seeded stays, so none clash.
+                checkin = first_day + timedelta(days=7 * (n // len(rooms)))
+                url = reverse("confirm_booking", args=[rooms[n % len(rooms)]]) + (
+                    f"?checkin={checkin}&checkout={checkin + timedelta(days=2)}&adults=1&children=0&rooms=1"
+                )
+                data = {"is_primary_guest_in_booking": "on", "meals": meal_ids}
+            writes.append((session_key, url, data))
+        readers = [session_key for session_key, _ in users[options["writers"]:]]
+        return writes, readers
+
+    def run(self, options, first_day):
+        writes, readers = self.fixtures(options, first_day)
+        search_cache.get_cache().clear()
+        connections.close_all()
+
+        lock = threading.Lock()
+        pending = list(reversed(writes))
+        done = threading.Event()
+        write_results, read_results = [], []
+
+        def writer():
+            while True:
+                with lock:
+                    if not pending:
+                        break
+                    session_key, url, data = pending.pop()
+                client = self.client(session_key)
+                started = time.perf_counter()
+                outcome = _outcome(lambda: client.post(url, data), 302)
+                with lock:
+                    write_results.append((outcome, time.perf_counter() - started))
+            connection.close()
+
+        calendar = reverse("availability_calendar")
+        window = {"start": first_day.isoformat(), "end": (first_day + timedelta(days=31)).isoformat()}
+
+        def reader(session_key):
+            client = self.client(session_key)
+            n = 0
+            while not done.is_set():
+                started = time.perf_counter()
+                if n % 2:
+                    outcome = _outcome(lambda: client.get(calendar, window), 200)
+                else:
+                    outcome = _outcome(lambda: client.get(reverse("dashboard")), 200)
+                with lock:
+                    read_results.append((outcome, time.perf_counter() - started))
+                n += 1
+            connection.close()
+
+        threads = [threading.Thread(target=reader, args=(session_key,)) for session_key in readers]
+        writer_threads = [threading.Thread(target=writer) for _ in range(options["writers"])]
+        started = time.perf_counter()
+        for thread in threads + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        done.set()
+        for thread in threads:
+            thread.join()
+
+        return {
+            "writers": options["writers"],
+            "readers": options["readers"],
+            **self.summarize("writes", write_results, wall),
+            **self.summarize("reads", read_results, wall),
+        }
+
+    def summarize(self, kind, results, wall):
+        latencies = [seconds for _, seconds in results]
+        outcomes = [outcome for outcome, _ in results]
+        return {
+            f"{kind}_ok": outcomes.count("ok"),
+            f"{kind}_locked": outcomes.count("locked"),
+            f"{kind}_other_errors": outcomes.count("error"),
+            f"{kind}_per_second": round(outcomes.count("ok") / wall, 1) if wall else 0.0,
+            f"{kind}_p50_ms": round(benchmarking.percentile(latencies, 50) * 1000, 1),
+            f"{kind}_p99_ms": round(benchmarking.percentile(latencies, 99) * 1000, 1),
+        }
@@ -0,0 +1,262 @@
+import json
+import platform
+import sqlite3
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+from functools import partial
+from http.cookies import SimpleCookie
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef
+from django.test import Client
+from django.urls import reverse
+
+from hotel_listing import benchmarking, search_cache, synthetic
+from hotel_listing.models import Booking, Guest, Meal, Payment, Room
+
+VIEWS = ("home", "book_room", "confirm_booking", "dashboard", "booking_details", "print_receipt", "add_payment")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database with synthetic data, drive every public view "
+        "through the test client and report latency percentiles, queries per "
+        "request and peak RSS, each view in its own forked process. "
+        "--trace-memory adds each view's peak Python allocations (tracemalloc), "
+        "a separate figure. Use --output to save a JSON report and --compare "
+        "to diff against an earlier one."
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.local = threading.local()
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=5000)
+        parser.add_argument("--guests", type=int, default=200000)
+        parser.add_argument("--bookings", type=int, default=2000000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per view.")
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument("--users", type=int, default=50, help="Guests given a login to spread requests over.")
+        parser.add_argument("--views", nargs="+", choices=VIEWS, default=list(VIEWS))
+        parser.add_argument(
+            "--trace-memory", action="store_true",
+            help="Also report each view's peak traced Python allocations (tracemalloc; slows every request and adds to RSS).",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+        parser.add_argument("--compare", help="Earlier JSON report to print deltas against.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = json.loads(Path(options["compare"]).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        with benchmarking.throwaway_database():
+            report = self.run(options)
+
+        for name, summary in report["views"].items():
+            self.stdout.write(f"{name:>16}: " + ", ".join(f"{key}={value}" for key, value in summary.items()))
+        if baseline is not None:
+            self.print_deltas(baseline, report)
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def run(self, options):
+        started = time.perf_counter()
+        counts = synthetic.seed(
+            rooms=options["rooms"], guests=options["guests"], bookings=options["bookings"],
+            seed=options["seed"], stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        seeded_in = round(time.perf_counter() - started, 1)
+        self.stdout.write(f"Seeded {', '.join(f'{count} {name}' for name, count in counts.items())} in {seeded_in}s")
+
+        fixtures = self.fixtures(options)
+        report = {
+            "meta": {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": f"{connection.vendor} {sqlite3.sqlite_version if connection.vendor == 'sqlite' else ''}".strip(),
+                "seed": options["seed"],
+                "rows": counts,
+                "seed_seconds": seeded_in,
+                "requests_per_view": options["requests"],
+                "threads": options["threads"],
+            },
+            "views": {},
+        }
+        search_cache.get_cache().clear()
+        for name in options["views"]:
+            # A fresh process per view, so its RSS peak is its own and not the seed's or an earlier view's.
+            summary, peak_rss, rss_growth = benchmarking.in_child_process(partial(self.measure, name, fixtures, options))
+            summary.update({"peak_rss_mb": peak_rss, "rss_growth_mb": rss_growth})
+            report["views"][name] = summary
+        return report
+
+    def measure(self, name, fixtures, options):
+        """Run one view's requests and summarise them."""
+        job, jobs = getattr(self, f"jobs_{name}")(fixtures, options["requests"])
+        if options["trace_memory"]:
+            tracemalloc.start()
+        try:
+            statuses, latencies, queries, wall = benchmarking.run_concurrently(job, jobs, threads=options["threads"])
+            peak_alloc = tracemalloc.get_traced_memory()[1] if options["trace_memory"] else None
+        finally:
+            tracemalloc.stop()
+        summary = benchmarking.summarize(latencies, queries)
+        summary.update({
+            "errors": sum(1 for status in statuses if status >= 400),
+            "throughput_rps": round(len(jobs) / wall, 1),
+        })
+        if peak_alloc is not None:
+            summary["peak_alloc_kb"] = round(peak_alloc / 1024, 1)
+        return summary
+
+    def client(self, session_key=None):
+        """
+        This worker thread's test client, signed in as ``session_key`` (or anonymous).
+
+        ``Client`` isn't thread-safe, so each thread has its own. Cookies are
+        reset per request so nothing one guest's response set leaks into the next.
+        """
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = Client()
+        client.cookies = SimpleCookie()
+        if session_key:
+            client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        return client
+
+    def fixtures(self, options):
+        """Session keys of guests with a paid booking, plus unpaid bookings for add_payment."""
+        paid = Payment.objects.filter(booking=OuterRef("pk"), payment_status="Completed")
+        probes = list(
+            Booking.objects.filter(Exists(paid), booking_status="Confirmed", primary_guest__user__isnull=True)
+            .order_by("primary_guest_id", "id")
+            .distinct()
+            .values_list("primary_guest_id", "id", "room_id", "start_date")
+        )
+        seen, users = set(), []
+        for guest_id, booking_id, room_id, start_date in probes:
+            if guest_id in seen:
+                continue
+            seen.add(guest_id)
+            user = User.objects.create_user(username=f"bench{guest_id}", password=None)
+            Guest.objects.filter(pk=guest_id).update(user=user)
+            client = Client()
+            client.force_login(user)
+            users.append((client.cookies[settings.SESSION_COOKIE_NAME].value, booking_id, room_id, start_date))
+            if len(users) == options["users"]:
+                break
+        if not users:
+            raise CommandError("No paid bookings were generated; seed more bookings.")
+
+        unpaid = list(
+            Booking.objects.annotate(payment_count=Count("payments")).filter(payment_count=0)
+            .order_by("id").values_list("id", flat=True)[:options["requests"]]
+        )
+        return {
+            "users": users,
+            "unpaid": unpaid,
+            "rooms": list(Room.objects.order_by("id").values_list("id", flat=True)),
+            "meals": [str(pk) for pk in Meal.objects.values_list("id", flat=True)],
+        }
+
+    # Each jobs_<view> returns (job, args_list); a job performs one request,
+    # as the guest whose session key it is given, and returns its status code.
+
+    def jobs_home(self, fixtures, requests):
+        def job(params):
+            return self.client().get(reverse("home"), params).status_code
+
+        jobs = []
+        for n in range(requests):
+            # 30 distinct searches, so the result cache sees both hits and misses.
+            checkin = date(2025, 3, 1) + timedelta(days=n % 30)
+            jobs.append(({"checkin": checkin, "checkout": checkin + timedelta(days=2), "adults": "1"},))
+        return job, jobs
+
+    def jobs_book_room(self, fixtures, requests):
+        def job(session_key, room_id, params):
+            return self.client(session_key).get(reverse("book_room", args=[room_id]), params).status_code
+
+        users = fixtures["users"]
+        jobs = []
+        for n in range(requests):
+            session_key, _, room_id, start_date = users[n % len(users)]
+            jobs.append((session_key, room_id, {"checkin": start_date, "checkout": start_date + timedelta(days=2), "adults": "1"}))
+        return job, jobs
+
+    def jobs_confirm_booking(self, fixtures, requests):
+        def job(session_key, room_id, checkin):
+            query = f"?checkin={checkin}&checkout={checkin + timedelta(days=2)}&adults=1&children=0&rooms=1"
+            data = {"is_primary_guest_in_booking": "on", "meals": fixtures["meals"][:1]}
+            response = self.client(session_key).post(reverse("confirm_booking", args=[room_id]) + query, data)
+            return response.status_code
+
+        users, rooms = fixtures["users"], fixtures["rooms"]
+        jobs = []
+        for n in range(requests):
+            # Far beyond the generated stays, one room-week per request, so nothing clashes.
+            checkin = date(2040, 1, 1) + timedelta(days=7 * (n // len(rooms)))
+            jobs.append((users[n % len(users)][0], rooms[n % len(rooms)], checkin))
+        return job, jobs
+
+    def jobs_dashboard(self, fixtures, requests):
+        def job(session_key):
+            return self.client(session_key).get(reverse("dashboard")).status_code
+
+        users = fixtures["users"]
+        return job, [(users[n % len(users)][0],) for n in range(requests)]
+
+    def jobs_booking_details(self, fixtures, requests):
+        def job(session_key, booking_id):
+            return self.client(session_key).get(reverse("booking_details", args=[booking_id])).status_code
+
+        users = fixtures["users"]
+        return job, [users[n % len(users)][:2] for n in range(requests)]
+
+    def jobs_print_receipt(self, fixtures, requests):
+        def job(session_key, booking_id):
+            return self.client(session_key).get(reverse("print_receipt", args=[booking_id])).status_code
+
+        users = fixtures["users"]
+        return job, [users[n % len(users)][:2] for n in range(requests)]
+
+    def jobs_add_payment(self, fixtures, requests):
+        def job(session_key, booking_id):
+            data = {"amount": "100.00", "method": "Cash", "transaction_code": f"BENCH{booking_id}"}
+            return self.client(session_key).post(reverse("add_payment", args=[booking_id]), data).status_code
+
+        users, unpaid = fixtures["users"], fixtures["unpaid"]
+        if not unpaid:
+            raise CommandError("Every generated booking already has a payment; nothing for add_payment to do.")
+        # Each unpaid booking takes exactly one payment; later posts are redirected as duplicates.
+        return job, [(users[n % len(users)][0], unpaid[n % len(unpaid)]) for n in range(requests)]
+
+    def print_deltas(self, baseline, report):
+        self.stdout.write(f"\nChange vs {baseline.get('meta', {}).get('created', 'baseline')}:")
+        for name, summary in report["views"].items():
+            before = baseline.get("views", {}).get(name)
+            if not before:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "queries_per_request", "peak_rss_mb", "rss_growth_mb", "peak_alloc_kb"):
+                if summary.get(key) is not None and before.get(key):
+                    change = (summary[key] - before[key]) / before[key] * 100
+                    deltas.append(f"{key} {before[key]} -> {summary[key]} ({change:+.0f}%)")
+            self.stdout.write(f"{name:>16}: " + ", ".join(deltas))
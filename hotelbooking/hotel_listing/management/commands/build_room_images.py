@@ -0,0 +1,81 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from hotel_listing import images
+from hotel_listing.models import Room
+
+# Unreadable, missing or oversized uploads are reported and skipped.
+IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+
+def _setup_worker():
+    # Needed when workers are spawned rather than forked (macOS, Windows).
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the resized WebP/JPEG variants of every room image that lacks "
+        "current ones, decoding and encoding in parallel worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Encoder processes; 1 encodes in this process.")
+        parser.add_argument("--force", action="store_true", help="Regenerate variants that are already current.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        todo, cleared = [], 0
+        for room in Room.objects.order_by("id").only("id", "image", "image_variants"):
+            if not room.image:
+                if room.image_variants:
+                    images.refresh(room)  # image removed: drop its variants
+                    cleared += 1
+            elif options["force"] or not images.is_current(room):
+                todo.append(room)
+
+        built, failed = self.build_all(todo, options["workers"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Built variants for {built} room image(s) in {elapsed:.1f}s with {options['workers']} worker(s); "
+            f"{failed} failed, {cleared} stale set(s) removed."
+        ))
+
+    def build_all(self, rooms, workers):
+        built = failed = 0
+
+        def finish(room, render):
+            nonlocal built, failed
+            try:
+                rendered = render()
+            except IMAGE_ERRORS as e:
+                failed += 1
+                self.stderr.write(f"Room {room.pk} ({room.image.name}): {e}")
+                return
+            images.refresh(room, rendered)
+            built += 1
+
+        if workers <= 1:
+            for room in rooms:
+                finish(room, lambda: images.render_stored(room.image.name))
+            return built, failed
+
+        # A bounded window of renders in flight keeps memory flat.
+        window = workers * 4
+        with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+            pending = {}
+            for room in rooms:
+                pending[pool.submit(images.render_stored, room.image.name)] = room
+                if len(pending) >= window:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(pending.pop(future), future.result)
+            for future, room in pending.items():
+                finish(room, future.result)
+        return built, failed
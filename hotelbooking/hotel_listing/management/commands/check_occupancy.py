@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_listing import occupancy
+
+
+class Command(BaseCommand):
+    help = "Verify the room-night occupancy index against the bookings table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--limit", type=int, default=20, help="Max discrepancies to print per kind.")
+
+    def handle(self, *args, **options):
+        missing, extra = occupancy.check_consistency(batch_size=options["batch_size"])
+        limit = options["limit"]
+        for label, rows in (("missing", missing), ("extra", extra)):
+            for booking_id, room_id, night, status in rows[:limit]:
+                self.stdout.write(f"{label}: booking={booking_id} room={room_id} night={night} status={status}")
+
+        if missing or extra:
+            raise CommandError(
+                f"Occupancy index is inconsistent: {len(missing)} missing, {len(extra)} extra. "
+                "Run `manage.py rebuild_occupancy` to repair."
+            )
+        self.stdout.write(self.style.SUCCESS("Occupancy index is consistent."))
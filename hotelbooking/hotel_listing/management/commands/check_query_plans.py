@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from hotel_listing import benchmarking, queryplans, synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, capture EXPLAIN QUERY PLAN for every "
+        "query issued by the booking/payment views and fail on full table scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=500)
+        parser.add_argument("--guests", type=int, default=20000)
+        parser.add_argument("--bookings", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--show-plans", action="store_true", help="Print every captured plan.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("check_query_plans reads SQLite's EXPLAIN QUERY PLAN output.")
+
+        with benchmarking.throwaway_database():
+            failures = self.run_checks(options)
+
+        if failures:
+            raise CommandError(f"{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} fell back to a full table scan.")
+        self.stdout.write(self.style.SUCCESS("No full table scans on the hot paths."))
+
+    def run_checks(self, options):
+        started = time.perf_counter()
+        counts = synthetic.seed(
+            rooms=options["rooms"], guests=options["guests"],
+            bookings=options["bookings"], seed=options["seed"],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in counts.items())
+            + f" in {time.perf_counter() - started:.1f}s"
+        )
+
+        client = Client()
+        user, booking = queryplans.probe_booking()
+        client.force_login(user)
+
+        failures = []
+        for label, sql, plan in queryplans.capture_plans(client, booking):
+            scans = queryplans.full_scans(plan, sql)
+            if scans or options["show_plans"]:
+                style = self.style.ERROR if scans else self.style.SQL_KEYWORD
+                self.stdout.write(style(f"[{label}] {sql}"))
+                for line in plan:
+                    self.stdout.write(f"    {line}")
+            if scans:
+                failures.append((label, sql, scans))
+        return failures
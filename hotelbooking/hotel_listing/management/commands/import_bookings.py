@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_listing import booking_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Import bookings from a CSV file (columns: "
+        + ", ".join(booking_import.COLUMNS)
+        + "). Rejected rows are written to a reject file with the reason."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--reject-file", help="Where to write rejected rows (default: <path>.rejects.csv).")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; nothing is kept.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        reject_path = Path(options["reject_file"] or f"{path}.rejects.csv")
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as lines, \
+                    open(reject_path, "w", newline="", encoding="utf-8") as rejects:
+                result = booking_import.import_bookings(
+                    lines, rejects=rejects, batch_size=options["batch_size"], dry_run=options["dry_run"],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        prefix = "Dry run: " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{result}"))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(f"Rejected rows written to {reject_path}"))
+        else:
+            reject_path.unlink()
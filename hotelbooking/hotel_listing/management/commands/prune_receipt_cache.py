@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from hotel_listing import receipts
+
+
+class Command(BaseCommand):
+    help = "Evict cached receipt PDFs by age and total size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-bytes", type=int, help="Defaults to settings.RECEIPT_CACHE_MAX_BYTES.")
+        parser.add_argument("--max-age", type=int, help="Seconds; defaults to settings.RECEIPT_CACHE_MAX_AGE.")
+
+    def handle(self, *args, **options):
+        removed, freed = receipts.evict(max_bytes=options["max_bytes"], max_age=options["max_age"])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} receipts ({freed / 1024:.1f} KiB)."))
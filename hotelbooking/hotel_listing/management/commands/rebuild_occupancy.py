@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from hotel_listing import occupancy, search_cache
+
+
+class Command(BaseCommand):
+    help = "Regenerate the room-night occupancy index from the bookings table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        created = occupancy.rebuild(batch_size=options["batch_size"])
+        # The rebuild bypasses booking signals, so drop every cached search.
+        search_cache.invalidate_rooms()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt occupancy index: {created} room-nights."))
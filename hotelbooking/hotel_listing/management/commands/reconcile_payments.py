@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_listing import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every booking's amount_paid and payment_state with its "
+        "payments and repair the ones that drifted (e.g. after bulk writes "
+        "that bypass the Payment signals)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--limit", type=int, default=20, help="Max drifted bookings to print.")
+        parser.add_argument("--check", action="store_true", help="Only report; exit non-zero if any booking drifted.")
+
+    def handle(self, *args, **options):
+        drifted = ledger.find_drift(batch_size=options["batch_size"])
+        for booking_id, amount_paid, state, actual_paid, actual_state in drifted[:options["limit"]]:
+            self.stdout.write(
+                f"booking={booking_id} stored={amount_paid} {state} actual={actual_paid} {actual_state}"
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Payment totals are consistent."))
+        elif options["check"]:
+            raise CommandError(
+                f"{len(drifted)} bookings have drifted payment totals. "
+                "Run `manage.py reconcile_payments` to repair."
+            )
+        else:
+            ids = [row[0] for row in drifted]
+            for offset in range(0, len(ids), options["batch_size"]):
+                ledger.refresh(*ids[offset:offset + options["batch_size"]])
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(ids)} bookings."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_listing import search_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Show hit/miss counters of the home search result cache. They are "
+        "kept in the cache itself, so this needs a shared cache backend; "
+        "with a process-local one, read each worker's /metrics instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        if not search_cache.is_shared():
+            raise CommandError(
+                "The search cache is process-local, so this process can't see the server's counters. "
+                "Read hotelbooking_search_cache_lookups_total on /metrics, or use a shared cache backend."
+            )
+        for key, value in search_cache.stats().items():
+            self.stdout.write(f"{key:>10}: {value}")
+        if options["reset"]:
+            search_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from hotel_listing import accounts
+
+
+class Command(BaseCommand):
+    help = (
+        "Email the account-creation link to every guest-checkout booker who "
+        "asked for one. Run once (e.g. from cron) or with --loop as a worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Invites per SMTP connection.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new invites.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = accounts.send_pending(batch_size=options["batch_size"])
+            if sent or not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Sent {sent} account invites."))
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,243 @@
+"""
+In-process request metrics, exported in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and records, per view, the
+latency, number and duration of SQL queries, template render time and
+response size into fixed-bucket histograms. Each worker process keeps its
+own numbers; scrape every worker (or sum them in Prometheus) for totals.
+Other modules count events here too: ``search_cache`` its hits and misses,
+which, unlike its own counters, don't depend on a shared cache.
+
+The middleware runs natively under both WSGI and ASGI, so async views
+are not pushed back onto a thread by it.
+
+Requests slower than ``METRICS_SLOW_REQUEST_SECONDS`` are logged to the
+``hotel_listing.slow_requests`` logger together with the SQL they ran.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger("hotel_listing.slow_requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# (metric name, help text, buckets) for each per-view histogram.
+HISTOGRAMS = {
+    "latency": ("hotelbooking_request_duration_seconds", "Time spent handling the request.", LATENCY_BUCKETS),
+    "queries": ("hotelbooking_request_db_queries", "SQL queries issued per request.", QUERY_COUNT_BUCKETS),
+    "db_time": ("hotelbooking_request_db_duration_seconds", "Time spent in SQL queries per request.", LATENCY_BUCKETS),
+    "template_time": ("hotelbooking_request_template_duration_seconds", "Time spent rendering templates per request.", LATENCY_BUCKETS),
+    "size": ("hotelbooking_response_size_bytes", "Response body size.", SIZE_BUCKETS),
+}
+
+# (metric name, help text, label) for each labelled counter.
+COUNTERS = {
+    "search_cache": ("hotelbooking_search_cache_lookups_total", "Home search result cache lookups, by result.", "result"),
+}
+
+_current = ContextVar("hotel_listing_request_metrics", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms per (kind, view), a request counter per (view, method, status) and the ``COUNTERS``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {kind: {} for kind in HISTOGRAMS}
+        self.requests = {}
+        self.counters = {kind: {} for kind in COUNTERS}
+
+    def increment(self, kind, label):
+        with self.lock:
+            counts = self.counters[kind]
+            counts[label] = counts.get(label, 0) + 1
+
+    def record(self, view, method, status, observations):
+        with self.lock:
+            for kind, value in observations.items():
+                per_view = self.histograms[kind]
+                histogram = per_view.get(view)
+                if histogram is None:
+                    histogram = per_view[view] = Histogram(HISTOGRAMS[kind][2])
+                histogram.observe(value)
+            key = (view, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def render(self):
+        """The whole registry in the Prometheus text exposition format."""
+        lines = [
+            "# HELP hotelbooking_requests_total Requests handled, by view, method and status.",
+            "# TYPE hotelbooking_requests_total counter",
+        ]
+        with self.lock:
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'hotelbooking_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+            for kind, (name, help_text, label) in COUNTERS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for value, count in sorted(self.counters[kind].items()):
+                    lines.append(f'{name}{{{label}="{value}"}} {count}')
+            for kind, (name, help_text, buckets) in HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for view, histogram in sorted(self.histograms[kind].items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.total}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    __slots__ = ("queries", "db_time", "template_time", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: time every query of the request.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if len(self.statements) < settings.METRICS_SLOW_REQUEST_MAX_QUERIES:
+                self.statements.append((elapsed, sql))
+
+
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match._func_path
+
+
+def response_size(response):
+    if response.streaming:
+        return int(response.get("Content-Length") or 0)
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    """Outermost middleware but for static files: observes every request, including the other middleware's queries."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        # Under ASGI the request's queries run on its own sync thread
+        # (asgiref's thread-sensitive executor), so hook that thread's connection.
+        await sync_to_async(lambda: connection.execute_wrappers.append(metrics))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(metrics))()
+            _current.reset(token)
+        self.record(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, metrics, elapsed):
+        view = view_label(request)
+        registry.record(view, request.method, response.status_code, {
+            "latency": elapsed,
+            "queries": metrics.queries,
+            "db_time": metrics.db_time,
+            "template_time": metrics.template_time,
+            "size": response_size(response),
+        })
+        if elapsed >= settings.METRICS_SLOW_REQUEST_SECONDS:
+            logger.warning(
+                "Slow request: %s %s -> %s (%s) took %.3fs, %d queries in %.3fs, templates %.3fs\n%s",
+                request.method, request.get_full_path(), response.status_code, view, elapsed,
+                metrics.queries, metrics.db_time, metrics.template_time,
+                "\n".join(f"  [{duration * 1000:.1f} ms] {sql}" for duration, sql in metrics.statements),
+            )
+
+
+class TimedTemplate:
+    """Wraps a backend template so its render time is charged to the current request."""
+
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self._wrapped.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, plus render timing for ``MetricsMiddleware``."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:01
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_room_nights(apps, schema_editor):
+    Booking = apps.get_model('hotel_listing', 'Booking')
+    RoomNight = apps.get_model('hotel_listing', 'RoomNight')
+    rows = []
+    for booking in Booking.objects.exclude(booking_status='Cancelled').iterator():
+        night = booking.start_date
+        while night < booking.end_date:
+            rows.append(RoomNight(
+                room_id=booking.room_id,
+                booking_id=booking.id,
+                night=night,
+                booking_status=booking.booking_status,
+            ))
+            night += timedelta(days=1)
+    RoomNight.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_listing', '0002_room_description_room_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('booking_status', models.CharField(choices=[('Confirmed', 'Confirmed'), ('Pending', 'Pending'), ('Cancelled', 'Cancelled')], max_length=20)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_nights', to='hotel_listing.booking')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_nights', to='hotel_listing.room')),
+            ],
+            options={
+                'db_table': 'room_nights',
+                'indexes': [models.Index(fields=['night', 'booking_status', 'room'], name='room_nights_lookup_idx')],
+            },
+        ),
+        migrations.RunPython(populate_room_nights, migrations.RunPython.noop),
+    ]
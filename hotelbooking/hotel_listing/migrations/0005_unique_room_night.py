@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+from ._overlaps import cancel_overlapping_bookings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_listing', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_overlapping_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='roomnight',
+            constraint=models.UniqueConstraint(fields=('room', 'night'), name='room_nights_unique_room_night'),
+        ),
+    ]
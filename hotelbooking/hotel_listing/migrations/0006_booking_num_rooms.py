@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:13
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_listing', '0005_unique_room_night'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='num_rooms',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:27
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_listing', '0007_admin_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='guests_first_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='guests_last_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='guests_email_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(django.db.models.functions.text.Lower('phone'), name='guests_phone_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='guests_name_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from ._overlaps import cancel_overlapping_bookings
+
+# PostgreSQL only: the other backends rely on the room_nights unique key
+# (0005) alone. Written as SQL so that loading migrations never needs
+# django.contrib.postgres (and with it psycopg) on SQLite installs.
+ACTIVE = "booking_status IN ('Pending', 'Confirmed')"
+STAY = "daterange(start_date, end_date, '[)')"
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    # Writes that skipped the booking signals may have overlapped since 0005.
+    cancel_overlapping_bookings(apps, schema_editor)
+    # btree_gist lets the GiST index compare room_id with plain equality.
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+        f"EXCLUDE USING gist (room_id WITH =, {STAY} WITH &&) WHERE ({ACTIVE})"
+    )
+    # For searches across all rooms (occupancy.booked_room_ids).
+    schema_editor.execute(f"CREATE INDEX bookings_stay_gist_idx ON bookings USING gist ({STAY}) WHERE {ACTIVE}")
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS bookings_stay_gist_idx")
+    schema_editor.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_listing', '0009_room_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_listing', '0010_postgres_booking_exclusion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='account_invite',
+            field=models.CharField(blank=True, choices=[('Pending', 'Pending'), ('Sent', 'Sent')], default='', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(condition=models.Q(('account_invite', 'Pending')), fields=['id'], name='guests_invite_queue_idx'),
+        ),
+    ]
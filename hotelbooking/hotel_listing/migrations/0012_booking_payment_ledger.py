@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def populate_payment_ledger(apps, schema_editor):
+    Booking = apps.get_model('hotel_listing', 'Booking')
+    Payment = apps.get_model('hotel_listing', 'Payment')
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+    total = (
+        Payment.objects.filter(booking=OuterRef('pk')).order_by().values('booking')
+        .annotate(total=Sum('amount')).values('total')
+    )
+    Booking.objects.filter(pk__in=Payment.objects.values('booking')).update(
+        amount_paid=Coalesce(Subquery(total, output_field=money), Value(Decimal('0.00')), output_field=money),
+    )
+    Booking.objects.update(payment_state=Case(
+        When(amount_paid__gte=F('total_price'), then=Value('Paid')),
+        When(amount_paid__gt=0, then=Value('Partial')),
+        default=Value('Unpaid'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_listing', '0011_guest_account_invite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='payment_state',
+            field=models.CharField(choices=[('Paid', 'Paid'), ('Partial', 'Partial'), ('Unpaid', 'Unpaid')], default='Unpaid', editable=False, max_length=10),
+        ),
+        migrations.RunPython(populate_payment_ledger, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('payment_state__in', ['Partial', 'Unpaid'])), fields=['start_date', 'id'], name='bookings_unpaid_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+"""
+Shared by the migrations that make overlapping active bookings impossible
+(0005 and 0010). Not a migration itself: the loader skips ``_`` modules.
+
+Older code could book a room twice (``confirm_booking`` never re-checked
+availability and ``home`` only hid Confirmed bookings), so such rows may
+exist. Of each overlapping pair the later-created booking is cancelled and
+logged, and its room nights dropped, before the constraint is added.
+"""
+import logging
+
+logger = logging.getLogger("hotel_listing.migrations")
+
+ACTIVE_STATUSES = ("Pending", "Confirmed")
+
+
+def _rooms_with_overlaps(Booking):
+    rooms, room_id, last_end = [], None, None
+    stays = (
+        Booking.objects.filter(booking_status__in=ACTIVE_STATUSES)
+        .order_by("room_id", "start_date")
+        .values_list("room_id", "start_date", "end_date")
+    )
+    for room, start, end in stays.iterator(chunk_size=5000):
+        if room != room_id:
+            room_id, last_end = room, end
+        elif start < last_end:
+            if not rooms or rooms[-1] != room:
+                rooms.append(room)
+            last_end = max(last_end, end)
+        else:
+            last_end = end
+    return rooms
+
+
+def cancel_overlapping_bookings(apps, schema_editor):
+    """Cancel the later-created booking of every overlapping active pair; returns their ids."""
+    Booking = apps.get_model("hotel_listing", "Booking")
+    RoomNight = apps.get_model("hotel_listing", "RoomNight")
+    cancelled = []
+    for room_id in _rooms_with_overlaps(Booking):
+        kept = []
+        bookings = (
+            Booking.objects.filter(room_id=room_id, booking_status__in=ACTIVE_STATUSES)
+            .order_by("created_at", "id")
+            .values_list("id", "start_date", "end_date")
+        )
+        for booking_id, start, end in bookings:
+            clash = next((other for other, other_start, other_end in kept if start < other_end and other_start < end), None)
+            if clash is None:
+                kept.append((booking_id, start, end))
+                continue
+            logger.warning(
+                "Cancelled booking %s: it overlaps the earlier booking %s of room %s (%s to %s).",
+                booking_id, clash, room_id, start, end,
+            )
+            cancelled.append(booking_id)
+    if cancelled:
+        Booking.objects.filter(pk__in=cancelled).update(booking_status="Cancelled")
+        RoomNight.objects.filter(booking_id__in=cancelled).delete()
+    return cancelled
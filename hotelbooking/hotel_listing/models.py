@@ -1,6 +1,10 @@
+from decimal import Decimal
+
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.db.models import CheckConstraint, Q, F
+from django.db.models import Case, DecimalField, CharField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Lower
 from django.contrib.auth.models import User
 
 class Room(models.Model):
@@ -19,7 +23,11 @@ class Room(models.Model):
     )
     is_available = models.BooleanField(default=True)
     image = models.ImageField(upload_to='rooms/', blank=True, null=True)  # New image field
+    # Resized WebP/JPEG copies of ``image``, maintained by images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(blank=True, null=True)  # New description field
+    # Bumped by every save; part of the API and calendar ETags (occupancy.version)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'rooms'
@@ -34,19 +42,84 @@ class Guest(models.Model):
     last_name = models.CharField(max_length=50)
     email = models.EmailField(max_length=100, null=True, blank=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
+    # Guest checkout: '' (no account wanted), 'Pending' (invite not yet mailed) or 'Sent'; see accounts.py
+    account_invite = models.CharField(
+        max_length=10, blank=True, default='', editable=False,
+        choices=[('Pending', 'Pending'), ('Sent', 'Sent')]
+    )
 
     class Meta:
         db_table = 'guests'
+        indexes = [
+            # Admin search and autocomplete: case-insensitive prefix ranges (changelists.prefix_filter)
+            models.Index(Lower('first_name'), name='guests_first_name_prefix_idx'),
+            models.Index(Lower('last_name'), name='guests_last_name_prefix_idx'),
+            models.Index(Lower('email'), name='guests_email_prefix_idx'),
+            models.Index(Lower('phone'), name='guests_phone_prefix_idx'),
+            # Admin changelist and autocomplete ordering
+            models.Index(fields=['last_name', 'first_name', 'id'], name='guests_name_idx'),
+            # The send_account_invites worker's queue
+            models.Index(fields=['id'], name='guests_invite_queue_idx', condition=Q(account_invite='Pending')),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+def payments_total():
+    """The sum of a booking's payments, as a subquery correlated on the booking's ``pk``."""
+    money = DecimalField(max_digits=10, decimal_places=2)
+    paid = (
+        Payment.objects.filter(booking=OuterRef("pk"))
+        .order_by()
+        .values("booking")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    return Coalesce(Subquery(paid, output_field=money), Value(Decimal("0.00")), output_field=money)
+
+
+class BookingQuerySet(models.QuerySet):
+    def with_payment_totals(self):
+        """
+        Annotate ``total_paid``, ``balance`` and ``payment_status`` (Paid/Partial/Unpaid)
+        straight from the payments.
+
+        Pages read the persisted ``amount_paid`` and ``payment_state``
+        instead; this is what ``ledger.find_drift`` checks them against.
+        Totals come from a correlated subquery rather than a JOIN + GROUP BY,
+        so an ordered, sliced queryset only aggregates the rows it returns.
+        """
+        money = DecimalField(max_digits=10, decimal_places=2)
+        return self.annotate(total_paid=payments_total()).annotate(
+            balance=models.ExpressionWrapper(F("total_price") - F("total_paid"), output_field=money),
+            payment_status=Case(
+                When(total_paid__gte=F("total_price"), then=Value("Paid")),
+                When(total_paid__gt=0, then=Value("Partial")),
+                default=Value("Unpaid"),
+                output_field=CharField(),
+            ),
+        )
+
+    def unpaid(self):
+        """Live bookings not yet paid in full, by arrival: the front desk's list."""
+        return (
+            self.filter(payment_state__in=Booking.UNPAID_STATES)
+            .exclude(booking_status="Cancelled")
+            .order_by("start_date", "id")
+        )
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('Confirmed', 'Confirmed'),
         ('Pending', 'Pending'),
         ('Cancelled', 'Cancelled'),
     ]
+    PAYMENT_STATE_CHOICES = [
+        ('Paid', 'Paid'),
+        ('Partial', 'Partial'),
+        ('Unpaid', 'Unpaid'),
+    ]
+    UNPAID_STATES = ['Partial', 'Unpaid']
 
     primary_guest = models.ForeignKey(Guest, on_delete=models.CASCADE, null=True, related_name='bookings')
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='bookings')
@@ -54,12 +127,31 @@ class Booking(models.Model):
     end_date = models.DateField()
     num_adults = models.IntegerField(validators=[MinValueValidator(1)])
     num_children = models.IntegerField(validators=[MinValueValidator(0)])
+    num_rooms = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     total_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0.01)])
     booking_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Sum of the payments and Paid/Partial/Unpaid, maintained by ledger.py
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
+    payment_state = models.CharField(max_length=10, choices=PAYMENT_STATE_CHOICES, default='Unpaid', editable=False)
+
+    objects = BookingQuerySet.as_manager()
 
     class Meta:
         db_table = 'bookings'
+        indexes = [
+            # Overlap checks: home search and admin BookingForm.clean
+            models.Index(fields=['room', 'start_date', 'end_date', 'booking_status'], name='bookings_room_dates_idx'),
+            # Guest history: dashboard
+            models.Index(fields=['primary_guest', 'created_at'], name='bookings_guest_created_idx'),
+            # Admin changelist keyset paging
+            models.Index(fields=['created_at', 'id'], name='bookings_created_idx'),
+            # Front desk's unpaid list: BookingQuerySet.unpaid
+            models.Index(
+                fields=['start_date', 'id'], name='bookings_unpaid_idx',
+                condition=Q(payment_state__in=['Partial', 'Unpaid']),
+            ),
+        ]
         constraints = [
             CheckConstraint(
                 check=Q(end_date__gt=F('start_date')),
@@ -74,6 +166,10 @@ class Booking(models.Model):
     def __str__(self):
         return f"Booking {self.id} for {self.primary_guest} in {self.room.room_number}"
 
+    @property
+    def balance(self):
+        return self.total_price - self.amount_paid
+
 class BookingGuest(models.Model):
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='booking_guests')
     guest = models.ForeignKey(Guest, on_delete=models.CASCADE, related_name='booking_guest_entries')
@@ -131,6 +227,12 @@ class Payment(models.Model):
 
     class Meta:
         db_table = 'payments'
+        indexes = [
+            # Paid totals and receipts
+            models.Index(fields=['booking', 'payment_status'], name='payments_booking_status_idx'),
+            # Admin changelist keyset paging
+            models.Index(fields=['payment_date', 'id'], name='payments_date_idx'),
+        ]
         constraints = [
             CheckConstraint(
                 check=Q(amount__gt=0),
@@ -139,4 +241,28 @@ class Payment(models.Model):
         ]
 
     def __str__(self):
-        return f"Payment {self.id} for Booking {self.booking.id}"
\ No newline at end of file
+        return f"Payment {self.id} for Booking {self.booking.id}"
+
+class RoomNight(models.Model):
+    """One row per occupied night of a non-cancelled booking.
+
+    Maintained from ``Booking`` saves (see ``occupancy.py``) so availability
+    searches only touch the nights of the requested stay. The unique
+    (room, night) key is what finally rules out double booking.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='room_nights')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='room_nights')
+    night = models.DateField()
+    booking_status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+
+    class Meta:
+        db_table = 'room_nights'
+        indexes = [
+            models.Index(fields=['night', 'booking_status', 'room'], name='room_nights_lookup_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'night'], name='room_nights_unique_room_night'),
+        ]
+
+    def __str__(self):
+        return f"Room {self.room_id} on {self.night} (Booking {self.booking_id})"
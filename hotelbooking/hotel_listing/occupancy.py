@@ -0,0 +1,181 @@
+"""
+Room-night occupancy index.
+
+Every non-cancelled booking is expanded into one ``RoomNight`` row per night
+it occupies. Availability for a stay [checkin, checkout) is then an indexed
+range lookup over the nights of that stay instead of an overlap scan of the
+whole ``bookings`` table.
+
+On PostgreSQL the bookings table itself has a GiST index on each active
+booking's stay as a ``daterange`` (migration 0010, next to the exclusion
+constraint that rules out overlaps), so the search asks it directly.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, Field, Func, Max, Value
+
+from .models import Booking, Room, RoomNight
+
+# Statuses that hold a room. Cancelled bookings free their nights.
+ACTIVE_STATUSES = ("Pending", "Confirmed")
+
+
+def nights(start_date, end_date):
+    """Yield every night of the half-open stay [start_date, end_date)."""
+    night = start_date
+    while night < end_date:
+        yield night
+        night += timedelta(days=1)
+
+
+def room_nights_for(booking):
+    """Unsaved ``RoomNight`` rows the given booking should own."""
+    if booking.booking_status not in ACTIVE_STATUSES:
+        return []
+    return [
+        RoomNight(
+            room_id=booking.room_id,
+            booking_id=booking.id,
+            night=night,
+            booking_status=booking.booking_status,
+        )
+        for night in nights(booking.start_date, booking.end_date)
+    ]
+
+
+def sync_booking(booking, created=False):
+    """Bring the index rows of one booking in line with its current state."""
+    if created:
+        RoomNight.objects.bulk_create(room_nights_for(booking))
+        return
+    with transaction.atomic():
+        RoomNight.objects.filter(booking_id=booking.id).delete()
+        RoomNight.objects.bulk_create(room_nights_for(booking))
+
+
+class DateRange(Func):
+    """PostgreSQL ``daterange(start, end, '[)')``: a half-open stay."""
+    function = "daterange"
+    output_field = Field()
+
+    def __init__(self, start, end):
+        super().__init__(start, end, Value("[)"))
+
+
+class Overlaps(Func):
+    """PostgreSQL range overlap, ``a && b``."""
+    template = "(%(expressions)s)"
+    arg_joiner = " && "
+    output_field = BooleanField()
+
+
+def booked_room_ids(checkin, checkout, statuses=ACTIVE_STATUSES):
+    """Room ids held on any night of [checkin, checkout)."""
+    if connection.vendor == "postgresql":
+        # Matches the partial GiST index bookings_stay_gist_idx when
+        # ``statuses`` are the active ones.
+        return Booking.objects.filter(
+            Overlaps(DateRange("start_date", "end_date"), DateRange(Value(checkin), Value(checkout))),
+            booking_status__in=statuses,
+        ).values("room_id")
+    return RoomNight.objects.filter(
+        night__gte=checkin,
+        night__lt=checkout,
+        booking_status__in=statuses,
+    ).values("room_id")
+
+
+ROOMS_VERSION = {"count": Count("id"), "changed": Max("updated_at")}
+NIGHTS_VERSION = {"count": Count("id"), "last": Max("id")}
+
+
+def _nights_between(start, end):
+    return RoomNight.objects.filter(night__gte=start, night__lt=end)
+
+
+def _version(rooms, held):
+    state = (rooms["count"], rooms["changed"] and rooms["changed"].isoformat())
+    return state if held is None else state + (held["count"], held["last"])
+
+
+def version(start=None, end=None):
+    """
+    A value that changes whenever a room, or any night of [start, end), changes.
+
+    Rows are never updated in place: a booking write deletes and re-inserts
+    its nights, so their count or highest id moves, and a room write bumps
+    ``Room.updated_at``. It is read from the database, so writes from any
+    process count (other workers, ``import_bookings``, ``rebuild_occupancy``).
+    Without dates only the rooms are read.
+    """
+    rooms = Room.objects.aggregate(**ROOMS_VERSION)
+    held = _nights_between(start, end).aggregate(**NIGHTS_VERSION) if start and end else None
+    return _version(rooms, held)
+
+
+async def aversion(start=None, end=None):
+    """``version()`` for async views."""
+    rooms = await Room.objects.aaggregate(**ROOMS_VERSION)
+    held = await _nights_between(start, end).aaggregate(**NIGHTS_VERSION) if start and end else None
+    return _version(rooms, held)
+
+
+def rebuild(batch_size=2000):
+    """Drop and regenerate the whole index from the ``bookings`` table."""
+    created = 0
+    with transaction.atomic():
+        RoomNight.objects.all().delete()
+        batch = []
+        bookings = Booking.objects.filter(booking_status__in=ACTIVE_STATUSES).only(
+            "id", "room_id", "start_date", "end_date", "booking_status"
+        )
+        for booking in bookings.iterator(chunk_size=batch_size):
+            batch.extend(room_nights_for(booking))
+            if len(batch) >= batch_size:
+                RoomNight.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        RoomNight.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def check_consistency(batch_size=2000):
+    """
+    Compare the index against the raw ``bookings`` table.
+
+    Bookings are walked in primary-key windows so memory stays bounded.
+    Returns ``(missing, extra)``: index rows that should exist but don't, and
+    rows that exist but shouldn't, each as ``(booking_id, room_id, night, status)``.
+    """
+    missing, extra = [], []
+    last_id = 0
+    while True:
+        window = list(
+            Booking.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "room_id", "start_date", "end_date", "booking_status")[:batch_size]
+        )
+        if not window:
+            break
+        upper_id = window[-1].id
+        expected = {
+            (row.booking_id, row.room_id, row.night, row.booking_status)
+            for booking in window
+            for row in room_nights_for(booking)
+        }
+        actual = set(
+            RoomNight.objects.filter(booking_id__gt=last_id, booking_id__lte=upper_id)
+            .values_list("booking_id", "room_id", "night", "booking_status")
+        )
+        missing.extend(sorted(expected - actual))
+        extra.extend(sorted(actual - expected))
+        last_id = upper_id
+
+    # Rows beyond the last booking can only belong to bookings that no longer exist.
+    extra.extend(
+        RoomNight.objects.filter(booking_id__gt=last_id)
+        .values_list("booking_id", "room_id", "night", "booking_status")
+    )
+    return missing, extra
@@ -0,0 +1,148 @@
+"""
+Keyset (seek) pagination.
+
+Pages are addressed by an opaque cursor holding the ordering values of the
+row at the page boundary, so fetching page N costs the same index seek as
+page 1 instead of an ever-growing OFFSET.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+def _json_default(value):
+    # Full-precision ISO for dates/datetimes (DjangoJSONEncoder drops microseconds),
+    # strings for Decimals.
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the cursor values, or None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class KeysetPage:
+    """A page of rows plus cursors; quacks like ``django.core.paginator.Page`` in templates."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, e.g. ``("-created_at", "-id")``.
+
+    All ordering fields must share one direction and the last one must be
+    unique so every row has a distinct position.
+    """
+
+    def __init__(self, queryset, ordering, per_page=20):
+        descending = {field.startswith("-") for field in ordering}
+        if len(descending) != 1:
+            raise ValueError("Keyset ordering fields must all sort in the same direction.")
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip("-") for field in ordering)
+        self.descending = descending.pop()
+        self.per_page = per_page
+
+    def _seek(self, values, forward):
+        # Rows strictly after ``values`` in the requested direction:
+        # (a > x) OR (a = x AND b > y) OR ...
+        op = "lt" if self.descending == forward else "gt"
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            equal = dict(zip(self.fields[:i], values[:i]))
+            condition |= Q(**equal, **{f"{field}__{op}": values[i]})
+        return condition
+
+    def _cursor(self, obj):
+        return encode_cursor(getattr(obj, field) for field in self.fields)
+
+    def _decode(self, cursor):
+        """
+        The cursor's values as the ordering fields' Python types, or None when
+        the cursor is missing, malformed or doesn't fit the fields (e.g. one
+        edited by hand), so it never reaches the query as a bad lookup value.
+        """
+        values = decode_cursor(cursor)
+        if values is None or len(values) != len(self.fields):
+            return None
+        converted = []
+        for field, value in zip(self.fields, values):
+            if value is None:
+                return None
+            try:
+                value = self.queryset.model._meta.get_field(field).to_python(value)
+            except FieldDoesNotExist:
+                pass  # an annotation; compared as given
+            except (ValidationError, ValueError, TypeError):
+                return None
+            converted.append(value)
+        return converted
+
+    def _plan(self, after, before):
+        """The page's queryset and whether it walks backwards (and so must be flipped)."""
+        after, before = self._decode(after), self._decode(before)
+
+        if before is not None:
+            reverse = tuple(field[1:] if field.startswith("-") else f"-{field}" for field in self.ordering)
+            return self.queryset.filter(self._seek(before, forward=False)).order_by(*reverse)[:self.per_page + 1], True, after
+        queryset = self.queryset if after is None else self.queryset.filter(self._seek(after, forward=True))
+        return queryset.order_by(*self.ordering)[:self.per_page + 1], False, after
+
+    def _build(self, rows, backwards, after):
+        has_more = len(rows) > self.per_page
+        if backwards:
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor(rows[-1]) if rows else None,
+                previous_cursor=self._cursor(rows[0]) if has_more else None,
+            )
+        rows = rows[:self.per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor(rows[-1]) if has_more else None,
+            previous_cursor=self._cursor(rows[0]) if after is not None and rows else None,
+        )
+
+    def page(self, after=None, before=None):
+        queryset, backwards, after = self._plan(after, before)
+        return self._build(list(queryset), backwards, after)
+
+    async def apage(self, after=None, before=None):
+        """``page()`` for async views."""
+        queryset, backwards, after = self._plan(after, before)
+        return self._build([row async for row in queryset], backwards, after)
@@ -0,0 +1,88 @@
+"""
+Stay pricing: nights x (room + selected meals) x rooms, plus VAT.
+
+``quote()`` prices one stay, ``quote_many()`` prices a batch in one pass
+with no queries, and
+``annotate_stay_total()`` pushes the same formula into SQL so a whole
+search result is priced by the query that fetches it.
+
+VAT is rounded to the cent half up (0.225 -> 0.23), not half to even as
+``Decimal`` and the original unrounded amounts ended up when they were
+formatted or saved (0.225 -> 0.22). SQL ``ROUND`` rounds halves away from
+zero on both SQLite and PostgreSQL, and a searched price must equal the
+price booked, so Python rounds the same way.
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Round
+
+VAT_RATE = Decimal("0.18")
+CENT = Decimal("0.01")
+
+Quote = namedtuple("Quote", ["nights", "rooms", "room_total", "meal_total", "subtotal", "vat", "total"])
+
+
+def nights_between(checkin, checkout):
+    return (checkout - checkin).days
+
+
+def quote(price_per_night, checkin, checkout, meal_prices=(), rooms=1):
+    """Price one stay; ``meal_prices`` are the per-night prices of the selected meals."""
+    return _quote(price_per_night, nights_between(checkin, checkout), sum(meal_prices, Decimal("0.00")), rooms)
+
+
+def _quote(price_per_night, nights, meals_per_night, rooms):
+    room_total = price_per_night * nights * rooms
+    meal_total = meals_per_night * nights * rooms
+    subtotal = room_total + meal_total
+    vat = (subtotal * VAT_RATE).quantize(CENT, rounding=ROUND_HALF_UP)
+    return Quote(nights, rooms, room_total, meal_total, subtotal, vat, subtotal + vat)
+
+
+def quote_many(stays):
+    """
+    Price many ``(room, checkin, checkout, meals[, rooms])`` stays in one pass.
+
+    ``room`` is a ``Room`` or a nightly price and ``meals`` holds ``Meal``
+    objects or prices. A result set shares a handful of price points, so
+    each distinct (price, nights, meals, rooms) combination is priced once
+    and reused; no queries are made.
+    """
+    nights_cache, meals_cache, quotes_cache, quotes = {}, {}, {}, []
+    for stay in stays:
+        room, checkin, checkout, meals = stay[:4]
+        rooms = stay[4] if len(stay) > 4 else 1
+
+        nights = nights_cache.get((checkin, checkout))
+        if nights is None:
+            nights = nights_cache[(checkin, checkout)] = nights_between(checkin, checkout)
+
+        # Stays usually share one meals list; the cache keeps it alive so its id stays unique.
+        cached = meals_cache.get(id(meals))
+        if cached is None:
+            cached = meals_cache[id(meals)] = (
+                meals, sum((getattr(meal, "price", meal) for meal in meals), Decimal("0.00")),
+            )
+        meals_per_night = cached[1]
+
+        price = getattr(room, "price_per_night", room)
+        key = (price, nights, meals_per_night, rooms)
+        result = quotes_cache.get(key)
+        if result is None:
+            result = quotes_cache[key] = _quote(price, nights, meals_per_night, rooms)
+        quotes.append(result)
+    return quotes
+
+
+def annotate_stay_total(rooms_queryset, checkin, checkout, meal_prices=(), rooms=1, name="stay_total"):
+    """Annotate each room with the VAT-inclusive price of the stay, computed in SQL."""
+    nights = nights_between(checkin, checkout)
+    meals_per_night = sum(meal_prices, Decimal("0.00"))
+    money = DecimalField(max_digits=14, decimal_places=2)
+    subtotal = ExpressionWrapper(
+        (F("price_per_night") + Value(meals_per_night)) * Value(nights * rooms), output_field=money
+    )
+    vat = Round(ExpressionWrapper(subtotal * Value(VAT_RATE), output_field=money), 2)
+    return rooms_queryset.annotate(**{name: ExpressionWrapper(subtotal + vat, output_field=money)})
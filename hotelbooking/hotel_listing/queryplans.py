@@ -0,0 +1,105 @@
+"""
+Query-plan harness for the booking/payment hot paths.
+
+Drives each view through the test client, captures the SELECTs it issues and
+asks SQLite for their ``EXPLAIN QUERY PLAN``. Any plan that walks a whole
+transactional table (``SCAN bookings`` rather than ``SEARCH bookings USING
+INDEX ...``) is reported as a full scan.
+"""
+import re
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Booking, Guest
+
+# Tables that grow with booking history. Catalogue tables (rooms, meals) are
+# listed in full by design and are not checked.
+HOT_TABLES = frozenset({
+    "bookings", "payments", "room_nights", "booking_guests", "meal_preferences", "guests",
+})
+SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+# Django aliases subquery tables ("room_nights" U0); SQLite reports the alias.
+ALIAS_RE = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan, sql="", tables=HOT_TABLES):
+    """Plan lines that scan one of ``tables`` end to end."""
+    aliases = {alias: table for table, alias in ALIAS_RE.findall(sql)}
+    scans = []
+    for line in plan:
+        match = SCAN_RE.match(line)
+        if match and aliases.get(match.group(1), match.group(1)) in tables:
+            scans.append(line)
+    return scans
+
+
+def probe_booking(username="queryplan-probe"):
+    """Attach a login to the guest of a fully paid booking and return both."""
+    booking = (
+        Booking.objects.filter(booking_status="Confirmed", payments__payment_status="Completed",
+                               primary_guest__user__isnull=True)
+        .select_related("primary_guest", "room")
+        .order_by("id")
+        .first()
+    )
+    if booking is None:
+        raise ValueError("No confirmed, paid booking available; seed some data first.")
+    user = User.objects.create_user(username=username, password=None)
+    Guest.objects.filter(pk=booking.primary_guest_id).update(user=user)
+    return user, booking
+
+
+def scenarios(booking):
+    """(label, path, params) for every view on the booking/payment paths."""
+    checkin = booking.start_date
+    checkout = booking.start_date + timedelta(days=2)
+    stay = {"checkin": checkin.isoformat(), "checkout": checkout.isoformat(), "adults": "1"}
+    return [
+        ("home", reverse("home"), stay),
+        ("book_room", reverse("book_room", args=[booking.room_id]), stay),
+        ("dashboard", reverse("dashboard"), {}),
+        ("booking_details", reverse("booking_details", args=[booking.id]), {}),
+        ("print_receipt", reverse("print_receipt", args=[booking.id]), {}),
+        ("add_payment", reverse("add_payment", args=[booking.id]), {}),
+    ]
+
+
+def admin_overlap_check(booking):
+    from .admin import BookingForm
+
+    form = BookingForm(instance=booking, data={
+        "primary_guest": booking.primary_guest_id,
+        "room": booking.room_id,
+        "start_date": booking.start_date,
+        "end_date": booking.end_date,
+        "num_adults": booking.num_adults,
+        "num_children": booking.num_children,
+        "num_rooms": booking.num_rooms,
+        "total_price": booking.total_price,
+        "booking_status": booking.booking_status,
+    })
+    form.is_valid()
+
+
+def capture_plans(client, booking):
+    """Yield ``(label, sql, plan)`` for every SELECT issued by the hot paths."""
+    runs = [(label, lambda p=path, d=params: client.get(p, d)) for label, path, params in scenarios(booking)]
+    runs.append(("admin BookingForm.clean", lambda: admin_overlap_check(booking)))
+
+    for label, run in runs:
+        with CaptureQueriesContext(connection) as ctx:
+            run()
+        for query in ctx.captured_queries:
+            sql = query["sql"]
+            if sql.lstrip().upper().startswith("SELECT"):
+                yield label, sql, explain(sql)
@@ -0,0 +1,327 @@
+"""
+Receipt PDFs: rendering and an on-disk, content-addressed cache.
+
+A receipt is rendered from one booking graph (room, primary guest, payments,
+additional guests, selected meals) loaded with ``receipt_bookings()``. The
+cache key is ``<booking id>/<fingerprint>.pdf`` where the fingerprint hashes
+everything the PDF shows, so any change to the graph yields a new file and
+stale ones are never served. Saves and deletes of the underlying rows also
+drop the booking's directory eagerly (see ``signals.py``); ``evict()``
+enforces the size and age limits.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Prefetch
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import (
+    SimpleDocTemplate,
+    Paragraph,
+    Spacer,
+    Table,
+    TableStyle,
+    HRFlowable,
+)
+
+from . import pricing
+from .models import Booking, BookingGuest, MealPreference
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+
+def cache_dir():
+    return Path(getattr(settings, "RECEIPT_CACHE_DIR", Path(settings.BASE_DIR) / "receipt_cache"))
+
+
+def receipt_bookings():
+    """Bookings with everything a receipt renders, in four indexed queries."""
+    return Booking.objects.select_related("room", "primary_guest").prefetch_related(
+        "payments",
+        Prefetch("booking_guests", queryset=BookingGuest.objects.select_related("guest").order_by("id")),
+        Prefetch(
+            "meal_preferences",
+            queryset=MealPreference.objects.filter(selected=True).select_related("meal").order_by("id"),
+            to_attr="selected_meals",
+        ),
+    )
+
+
+def completed_payments(booking):
+    return sorted(
+        (payment for payment in booking.payments.all() if payment.payment_status == "Completed"),
+        key=lambda payment: payment.id,
+    )
+
+
+def issued_at(booking):
+    """
+    When the receipt counts as issued: the latest completed payment, else the
+    booking's creation. Both are in the fingerprint, unlike the wall clock,
+    so a cached PDF never shows a date from the day it happened to be rendered.
+    """
+    payments = completed_payments(booking)
+    return payments[-1].payment_date if payments else booking.created_at
+
+
+def fingerprint(booking):
+    """Stable hash of every value printed on the receipt."""
+    room, guest = booking.room, booking.primary_guest
+    parts = [
+        booking.id, booking.start_date, booking.end_date, booking.num_adults, booking.num_children, booking.num_rooms,
+        booking.total_price, booking.created_at,
+        room.room_number, room.room_type, room.price_per_night,
+        guest.first_name, guest.last_name, guest.email, guest.phone,
+    ]
+    for payment in completed_payments(booking):
+        parts += [payment.payment_method, payment.amount, payment.transaction_id, payment.payment_date]
+    for booking_guest in booking.booking_guests.all():
+        parts += [booking_guest.guest.first_name, booking_guest.guest.last_name, booking_guest.is_child]
+    for pref in booking.selected_meals:
+        parts += [pref.meal.name, pref.meal.price]
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def build_pdf(booking, out):
+    """Render the receipt for a booking loaded via ``receipt_bookings()`` into ``out``."""
+    price = pricing.quote(
+        booking.room.price_per_night, booking.start_date, booking.end_date,
+        [pref.meal.price for pref in booking.selected_meals], booking.num_rooms,
+    )
+    nights, rooms = price.nights, price.rooms
+    payments = completed_payments(booking)
+
+    # invariant: no creation timestamp or random file ID in the PDF itself,
+    # so the same fingerprint always yields the same bytes.
+    doc = SimpleDocTemplate(
+        out, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm, invariant=True,
+    )
+    elements = []
+
+    # Styles
+    title_style = ParagraphStyle(name='Title', fontSize=18, fontName='Helvetica-Bold', textColor=colors.HexColor('#2a6f97'), alignment=1, spaceAfter=10)
+    subtitle_style = ParagraphStyle(name='Subtitle', fontSize=12, fontName='Helvetica', alignment=1, spaceAfter=10)
+    section_style = ParagraphStyle(name='Section', fontSize=14, fontName='Helvetica-Bold', textColor=colors.HexColor('#2a6f97'), spaceAfter=5)
+    normal_style = ParagraphStyle(name='Normal', fontSize=10, fontName='Helvetica', spaceAfter=6)
+    footer_style = ParagraphStyle(name='Footer', fontSize=8, fontName='Helvetica', textColor=colors.HexColor('#666666'), alignment=1, spaceAfter=6)
+    dash_style = ParagraphStyle(name='Dash', fontSize=10, fontName='Helvetica', spaceAfter=10, spaceBefore=10)
+
+    # Header
+    elements.append(Paragraph("Hotel Booking Receipt", title_style))
+    elements.append(HRFlowable(width="100%", thickness=2, color=colors.HexColor('#2a6f97'), spaceAfter=10))
+    elements.append(Paragraph(f"Receipt for Booking ID: {booking.id}", subtitle_style))
+    elements.append(Paragraph(f"Issued on: {issued_at(booking).strftime('%Y-%m-%d')}", subtitle_style))
+    elements.append(Spacer(1, 0.5*cm))
+
+    # Dashed line separator
+    elements.append(Paragraph("------------", dash_style))
+
+    # Guest Information
+    elements.append(Paragraph("Guest Information", section_style))
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
+    elements.append(Paragraph(f"Primary Guest: {booking.primary_guest.first_name} {booking.primary_guest.last_name}", normal_style))
+    elements.append(Paragraph(f"Email: {booking.primary_guest.email or 'N/A'}", normal_style))
+    elements.append(Paragraph(f"Phone: {booking.primary_guest.phone or 'N/A'}", normal_style))
+    elements.append(Spacer(1, 0.5*cm))
+    elements.append(Paragraph("------------", dash_style))
+
+    # Booking Details
+    elements.append(Paragraph("Booking Details", section_style))
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
+    elements.append(Paragraph(f"Room Number: {booking.room.room_number} ({booking.room.room_type})", normal_style))
+    elements.append(Paragraph(f"Check-in Date: {booking.start_date}", normal_style))
+    elements.append(Paragraph(f"Check-out Date: {booking.end_date}", normal_style))
+    elements.append(Paragraph(f"Nights: {nights}", normal_style))
+    elements.append(Paragraph(f"Rooms: {rooms}", normal_style))
+    elements.append(Paragraph(f"Adults: {booking.num_adults}", normal_style))
+    elements.append(Paragraph(f"Children: {booking.num_children}", normal_style))
+    elements.append(Spacer(1, 0.5*cm))
+    elements.append(Paragraph("------------", dash_style))
+
+    # Cost Breakdown
+    elements.append(Paragraph("Cost Breakdown", section_style))
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
+    per_rooms = f" x {rooms} rooms" if rooms > 1 else ""
+    cost_data = [
+        ['Description', 'Amount (KSh)'],
+        [f"Room Cost ({nights} nights x {booking.room.price_per_night}/night{per_rooms})", f"{price.room_total:.2f}"],
+    ]
+    for pref in booking.selected_meals:
+        cost_data.append([f"{pref.meal.name} ({nights} nights x {pref.meal.price}/night{per_rooms})", f"{pref.meal.price * nights * rooms:.2f}"])
+    cost_data.extend([
+        ['Subtotal', f"{price.subtotal:.2f}"],
+        ['VAT (18%)', f"{price.vat:.2f}"],
+        ['Grand Total', f"{booking.total_price:.2f}"],
+    ])
+    cost_table = Table(cost_data, colWidths=[12*cm, 5*cm])
+    cost_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a4d6e')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
+    ]))
+    elements.append(cost_table)
+    elements.append(Spacer(1, 0.5*cm))
+    elements.append(Paragraph("------------", dash_style))
+
+    # Payment Details
+    elements.append(Paragraph("Payment Details", section_style))
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
+    payment_data = [
+        ['Payment Method', 'Amount (KSh)', 'Transaction ID', 'Date'],
+    ]
+    for payment in payments:
+        payment_data.append([
+            payment.payment_method,
+            f"{payment.amount:.2f}",
+            payment.transaction_id or 'N/A',
+            payment.payment_date.strftime('%Y-%m-%d %H:%M:%S'),
+        ])
+    payment_table = Table(payment_data, colWidths=[5*cm, 4*cm, 4*cm, 4*cm])
+    payment_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a4d6e')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
+    ]))
+    elements.append(payment_table)
+    elements.append(Spacer(1, 0.5*cm))
+    elements.append(Paragraph("------------", dash_style))
+
+    # Additional Guests
+    elements.append(Paragraph("Additional Guests", section_style))
+    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
+    booking_guests = booking.booking_guests.all()
+    if booking_guests:
+        for booking_guest in booking_guests:
+            elements.append(Paragraph(
+                f"{booking_guest.guest.first_name} {booking_guest.guest.last_name} "
+                f"({'Child' if booking_guest.is_child else 'Adult'})",
+                normal_style
+            ))
+    else:
+        elements.append(Paragraph("No additional guests.", normal_style))
+    elements.append(Spacer(1, 0.5*cm))
+    elements.append(Paragraph("------------", dash_style))
+
+    # Footer
+    elements.append(Paragraph("Thank you for choosing our hotel!", footer_style))
+    elements.append(Paragraph("Contact us at: support@hotel.com | +254 700 123 456", footer_style))
+    elements.append(Paragraph(f"Order Created: {booking.created_at.strftime('%Y-%m-%d %H:%M:%S')}", footer_style))
+
+    # Build PDF
+    doc.build(elements)
+
+
+def render_bytes(booking):
+    """Render one receipt to bytes; picklable entry point for process pools."""
+    out = io.BytesIO()
+    build_pdf(booking, out)
+    return booking.id, out.getvalue()
+
+
+def cached_pdf(booking):
+    """
+    Return ``(path, version)`` of the booking's receipt, rendering it on a miss.
+
+    Files are written to a temporary name and renamed into place, so
+    concurrent requests never see a half-written PDF.
+    """
+    version = fingerprint(booking)
+    directory = cache_dir() / str(booking.id)
+    path = directory / f"{version}.pdf"
+    if path.exists():
+        return path, version
+
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            build_pdf(booking, out)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path, version
+
+
+def open_pdf(booking):
+    """
+    Return ``(file, version, stat)``: the booking's receipt opened for reading, rendering it on a miss.
+
+    ``invalidate`` or ``evict`` may delete the file between ``cached_pdf``
+    and the open; it is then rendered again, once. An open file stays
+    readable after it is deleted, so callers can stream it.
+    """
+    for attempt in (1, 2):
+        try:
+            path, version = cached_pdf(booking)
+            pdf = open(path, "rb")
+        except FileNotFoundError:
+            if attempt == 2:
+                raise
+            continue
+        return pdf, version, os.fstat(pdf.fileno())
+
+
+def invalidate(booking_id):
+    """Drop every cached receipt of one booking."""
+    shutil.rmtree(cache_dir() / str(booking_id), ignore_errors=True)
+
+
+def evict(max_bytes=None, max_age=None):
+    """
+    Remove receipts older than ``max_age`` seconds, then the least recently
+    written ones until the cache fits in ``max_bytes``. Returns
+    ``(files_removed, bytes_removed)``.
+    """
+    max_bytes = getattr(settings, "RECEIPT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES) if max_bytes is None else max_bytes
+    max_age = getattr(settings, "RECEIPT_CACHE_MAX_AGE", DEFAULT_MAX_AGE) if max_age is None else max_age
+    root = cache_dir()
+    if not root.exists():
+        return 0, 0
+
+    now = time.time()
+    entries, removed, freed = [], 0, 0
+    for path in root.glob("*/*.pdf"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if now - stat.st_mtime > max_age:
+            path.unlink(missing_ok=True)
+            removed, freed = removed + 1, freed + stat.st_size
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed, freed = removed + 1, freed + size
+
+    for directory in root.iterdir():
+        if directory.is_dir() and not any(directory.iterdir()):
+            try:
+                directory.rmdir()
+            except OSError:
+                pass  # a receipt is being written into it right now
+    return removed, freed
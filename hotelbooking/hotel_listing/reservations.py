@@ -0,0 +1,102 @@
+"""
+Reservation engine.
+
+Every path that creates or moves a booking goes through ``book()``, which
+serializes the availability check and the insert per room:
+
+* on backends with row locks (PostgreSQL) the room row is locked with
+  ``SELECT ... FOR UPDATE`` for the rest of the transaction, so concurrent
+  bookings of the same room queue up while other rooms proceed in parallel;
+* on every backend the occupancy index has a unique (room, night) key, so
+  a booking that slips past the check still cannot commit an overlap; on
+  PostgreSQL the bookings table also carries an exclusion constraint on
+  (room, stay) for active bookings (migration 0010).
+
+SQLite already serializes writers database-wide, so there the insert goes
+first and the unique key does the checking. A read-then-write transaction
+would have to upgrade its lock, which SQLite refuses immediately with
+"database is locked" whenever another writer is active.
+"""
+from django.db import IntegrityError, connection, transaction
+
+from .models import Booking, Room, RoomNight
+from .occupancy import ACTIVE_STATUSES
+
+
+class RoomUnavailable(Exception):
+    """The room is already held by another booking for some of the requested nights."""
+
+    def __init__(self, room_id, start_date, end_date):
+        self.room_id = room_id
+        self.start_date = start_date
+        self.end_date = end_date
+        super().__init__(f"Room {room_id} is already booked between {start_date} and {end_date}.")
+
+
+def lock_room(room_id):
+    """Hold the room's row lock until the surrounding transaction ends (no-op on SQLite)."""
+    if connection.features.has_select_for_update:
+        list(Room.objects.select_for_update().filter(pk=room_id).values_list("pk", flat=True))
+
+
+def conflicts(room_id, start_date, end_date, exclude_booking_id=None):
+    """Ids of other bookings holding ``room_id`` on any night of [start_date, end_date)."""
+    taken = RoomNight.objects.filter(room_id=room_id, night__gte=start_date, night__lt=end_date)
+    if exclude_booking_id is not None:
+        taken = taken.exclude(booking_id=exclude_booking_id)
+    return taken.values_list("booking_id", flat=True).distinct()
+
+
+def check_available(room_id, start_date, end_date, exclude_booking_id=None, lock=True):
+    """Raise ``RoomUnavailable`` unless the room is free; optionally take the room lock first."""
+    if lock:
+        lock_room(room_id)
+    if conflicts(room_id, start_date, end_date, exclude_booking_id).exists():
+        raise RoomUnavailable(room_id, start_date, end_date)
+
+
+def book(booking):
+    """
+    Save ``booking`` (new or existing) if its room is free for its dates.
+
+    Runs in its own transaction, or joins the caller's one so related rows
+    written afterwards commit or roll back together with the booking.
+    """
+    adding = booking._state.adding
+    with transaction.atomic():
+        if booking.booking_status in ACTIVE_STATUSES and connection.features.has_select_for_update:
+            check_available(booking.room_id, booking.start_date, booking.end_date, exclude_booking_id=booking.pk)
+        try:
+            with transaction.atomic():
+                booking.save()
+        except IntegrityError:
+            if adding:
+                # The INSERT was rolled back with the savepoint; forget its id.
+                booking.pk = None
+                booking._state.adding = True
+            # Lost a race on the (room, night) key; report it as a clash.
+            if booking.booking_status in ACTIVE_STATUSES and conflicts(
+                booking.room_id, booking.start_date, booking.end_date, exclude_booking_id=booking.pk
+            ).exists():
+                raise RoomUnavailable(booking.room_id, booking.start_date, booking.end_date)
+            raise
+    return booking
+
+
+def overlapping_pairs(queryset=None):
+    """
+    Audit helper: pairs of active bookings that share a room-night.
+
+    Works on the raw ``bookings`` table so it also catches rows written
+    around the occupancy index.
+    """
+    queryset = queryset if queryset is not None else Booking.objects.all()
+    active = queryset.filter(booking_status__in=ACTIVE_STATUSES).order_by("room_id", "start_date", "id")
+    pairs = []
+    previous = None
+    for booking in active.only("id", "room_id", "start_date", "end_date").iterator():
+        if previous is not None and previous.room_id == booking.room_id and booking.start_date < previous.end_date:
+            pairs.append((previous.id, booking.id))
+        if previous is None or previous.room_id != booking.room_id or booking.end_date > previous.end_date:
+            previous = booking
+    return pairs
@@ -0,0 +1,79 @@
+"""
+Rendered result cards for ``home``, cached per room.
+
+The parts of a card that depend only on the room (picture, heading,
+capacities, price, description, booking link) are rendered from
+``room_card.html`` once and cached under the room id plus a per-room
+*version* token. Saving or deleting a room, or rebuilding its image
+variants, replaces that token, so the old fragment is never asked for
+again and ages out with ``ROOM_CARD_CACHE_TTL``. Tokens live in the search
+cache and behave like its tokens: an evicted one comes back as a fresh
+value, never as a default an old fragment could match.
+
+Per request, ``home`` only works out which rooms match and fills in the
+stay total and the search's query string around the cached parts.
+``attach`` costs two cache round trips however many rooms there are.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+# Marks where the per-request stay total goes inside a rendered card.
+STAY_SLOT = "<!-- stay -->"
+
+
+def get_cache():
+    return caches[settings.ROOM_CARD_CACHE_ALIAS]
+
+
+def version_key(room_id):
+    return f"card:version:{room_id}"
+
+
+def _versions(room_ids):
+    tokens = caches[settings.SEARCH_CACHE_ALIAS]
+    keys = [version_key(room_id) for room_id in room_ids]
+    found = tokens.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        tokens.set_many(missing, timeout=None)
+        found.update(missing)
+    return {room_id: found[key] for room_id, key in zip(room_ids, keys)}
+
+
+def render(room):
+    """The cacheable parts of ``room``'s card: ``head``, ``tail`` and ``book_url``."""
+    head, tail = render_to_string("room_card.html", {"room": room}).split(STAY_SLOT)
+    return {"head": mark_safe(head), "tail": mark_safe(tail), "book_url": reverse("book_room", args=[room.id])}
+
+
+def attach(rooms):
+    """Set ``room.card`` on each of ``rooms``, rendering and caching the ones not cached yet."""
+    if not rooms:
+        return
+    versions = _versions([room.id for room in rooms])
+    keys = {room.id: f"card:{room.id}:{versions[room.id]}" for room in rooms}
+    cache = get_cache()
+    cards = cache.get_many(list(keys.values()))
+    rendered = {}
+    for room in rooms:
+        room.card = cards.get(keys[room.id])
+        if room.card is None:
+            room.card = rendered[keys[room.id]] = render(room)
+    if rendered:
+        cache.set_many(rendered, timeout=settings.ROOM_CARD_CACHE_TTL)
+
+
+def _replace_versions(room_ids):
+    caches[settings.SEARCH_CACHE_ALIAS].set_many({version_key(room_id): uuid.uuid4().hex for room_id in room_ids}, timeout=None)
+
+
+def invalidate(*room_ids):
+    """Forget the cached cards of these rooms, now and again once the transaction commits."""
+    _replace_versions(room_ids)
+    transaction.on_commit(lambda: _replace_versions(room_ids))
@@ -0,0 +1,87 @@
+"""
+The room search behind the home page and the JSON API.
+
+``parse`` reads the query string both send (``checkin``, ``checkout``,
+``adults``, ``children``, ``rooms``, ``room_type``, ``bed_type``) and
+``matching_rooms`` turns it into a queryset of bookable rooms. Searches the
+search cache can hold are served from it: the queryset is then a
+primary-key lookup of the cached room ids.
+"""
+from datetime import datetime
+
+from . import occupancy, pricing, search_cache
+from .models import Room
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+def _count(value):
+    return int(value) if value and value.isdigit() else None
+
+
+def parse(params):
+    """The search criteria in ``params`` (a QueryDict or dict)."""
+    checkin = checkout = None
+    if params.get("checkin") and params.get("checkout"):
+        try:
+            checkin = datetime.strptime(params["checkin"], "%Y-%m-%d").date()
+            checkout = datetime.strptime(params["checkout"], "%Y-%m-%d").date()
+        except ValueError:
+            raise InvalidSearch("checkin and checkout must be YYYY-MM-DD")
+    return {
+        "checkin": checkin,
+        "checkout": checkout,
+        "adults": _count(params.get("adults")),
+        "children": _count(params.get("children")),
+        "rooms": _count(params.get("rooms")),
+        "room_type": params.get("room_type") or None,
+        "bed_type": params.get("bed_type") or None,
+    }
+
+
+def has_stay(criteria):
+    return bool(criteria["checkin"] and criteria["checkout"] and criteria["checkout"] > criteria["checkin"])
+
+
+def stay_rooms(criteria):
+    return criteria["rooms"] or 1
+
+
+def matching_rooms(criteria):
+    """
+    ``(rooms, cache_key, cached)`` for ``criteria``, ordered by id.
+
+    ``cache_key`` is ``None`` for searches the cache doesn't hold; when
+    ``cached`` is false the caller may ``search_cache.put`` the ids it reads.
+    Rooms carry a ``stay_total`` annotation when the search has a stay.
+    """
+    checkin, checkout = criteria["checkin"], criteria["checkout"]
+    rooms = Room.objects.filter(is_available=True).order_by("id")
+    if checkin and checkout:
+        rooms = rooms.exclude(id__in=occupancy.booked_room_ids(checkin, checkout))
+    if criteria["adults"] is not None:
+        rooms = rooms.filter(capacity_adults__gte=criteria["adults"])
+    if criteria["children"] is not None:
+        rooms = rooms.filter(capacity_children__gte=criteria["children"])
+    if criteria["rooms"] is not None and hasattr(Room, "total_rooms"):
+        rooms = rooms.filter(total_rooms__gte=criteria["rooms"])
+    if criteria["room_type"]:
+        rooms = rooms.filter(room_type__iexact=criteria["room_type"])
+    if criteria["bed_type"]:
+        rooms = rooms.filter(bed_type__iexact=criteria["bed_type"])
+
+    search = search_cache.normalize(
+        checkin, checkout, criteria["adults"], criteria["children"], criteria["room_type"], criteria["bed_type"],
+    )
+    cache_key, cached = None, False
+    if search is not None:
+        cache_key = search_cache.result_key(search, checkin, checkout)
+        cached_ids = search_cache.get(cache_key)
+        if cached_ids is not None:
+            rooms, cached = Room.objects.filter(id__in=cached_ids).order_by("id"), True
+
+    if has_stay(criteria):
+        rooms = pricing.annotate_stay_total(rooms, checkin, checkout, rooms=stay_rooms(criteria))
+    return rooms, cache_key, cached
@@ -0,0 +1,138 @@
+"""
+Result cache for the anonymous ``home`` search.
+
+A search is normalised to (checkin, checkout, adults, children, room type,
+bed type) and its matching room ids are cached under a key that also holds
+the current *tokens* of everything the result depends on: one token for the
+rooms table and one per night of the stay. Changing a room replaces the
+rooms token; changing a booking replaces the tokens of the nights it held
+before and after the change. Either way the old keys are simply never asked
+for again and age out with the TTL, so invalidation works on any Django
+cache backend without key scans.
+
+Tokens, results and the hit/miss counters live in the cache, so every
+process has to share it: a process-local backend (``LocMemCache``) never
+sees what another worker, ``import_bookings`` or ``rebuild_occupancy``
+invalidated, and ``search_cache_stats`` would read an empty cache of its
+own. ``manage.py check --deploy`` flags such a backend (see checks.py).
+Each process also counts its lookups in ``metrics``, served on /metrics
+whatever the backend.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from . import metrics
+from .occupancy import nights
+
+ROOMS_TOKEN = "search:rooms"
+HITS, MISSES = "search:stats:hits", "search:stats:misses"
+
+
+def get_cache():
+    return caches[settings.SEARCH_CACHE_ALIAS]
+
+
+def is_shared(alias=None):
+    """Whether other processes see the same cache (not ``LocMemCache`` or ``DummyCache``); the search cache by default."""
+    cache = get_cache() if alias is None else caches[alias]
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def night_token_key(night):
+    return f"search:night:{night.isoformat()}"
+
+
+def normalize(checkin=None, checkout=None, adults=None, children=None, room_type=None, bed_type=None):
+    """Canonical form of a search; ``None`` when it is not worth caching."""
+    if (checkin is None) != (checkout is None):
+        return None
+    if checkin and (checkout - checkin).days > settings.SEARCH_CACHE_MAX_NIGHTS:
+        return None
+    return (
+        checkin and checkin.isoformat(), checkout and checkout.isoformat(),
+        adults, children, (room_type or "").lower(), (bed_type or "").lower(),
+    )
+
+
+def _tokens(cache, checkin, checkout):
+    keys = [ROOMS_TOKEN]
+    if checkin:
+        keys += [night_token_key(night) for night in nights(checkin, checkout)]
+    found = cache.get_many(keys)
+    # A token that was never set (or was evicted) gets a fresh value rather
+    # than a default, so results cached under an older token can't resurface.
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def tokens(checkin=None, checkout=None):
+    """Current rooms token plus one token per night of [checkin, checkout); any write they cover changes them."""
+    return _tokens(get_cache(), checkin, checkout)
+
+
+def result_key(search, checkin=None, checkout=None):
+    digest = hashlib.sha1(repr((search, tokens(checkin, checkout))).encode()).hexdigest()
+    return f"search:result:{digest}"
+
+
+def get(key):
+    """Cached room ids for ``key``, counting the hit or miss."""
+    cache = get_cache()
+    room_ids = cache.get(key)
+    _count(cache, MISSES if room_ids is None else HITS)
+    metrics.registry.increment("search_cache", "miss" if room_ids is None else "hit")
+    return room_ids
+
+
+def put(key, room_ids):
+    get_cache().set(key, list(room_ids), timeout=settings.SEARCH_CACHE_TTL)
+
+
+def _count(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def stats():
+    counts = get_cache().get_many([HITS, MISSES])
+    hits, misses = counts.get(HITS, 0), counts.get(MISSES, 0)
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None}
+
+
+def reset_stats():
+    get_cache().delete_many([HITS, MISSES])
+
+
+def _replace_tokens(keys):
+    get_cache().set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+
+def _replace_tokens_now_and_on_commit(keys):
+    # Replacing again after commit stops a search that ran between the write
+    # and the commit from caching the pre-commit result under the new token.
+    _replace_tokens(keys)
+    transaction.on_commit(lambda: _replace_tokens(keys))
+
+
+def invalidate_rooms():
+    """Forget every cached search (any room change can alter any result)."""
+    _replace_tokens_now_and_on_commit([ROOMS_TOKEN])
+
+
+def invalidate_stay(*ranges):
+    """Forget searches overlapping any of the given (start_date, end_date) ranges."""
+    keys = {night_token_key(night) for start, end in ranges if start and end for night in nights(start, end)}
+    if keys:
+        _replace_tokens_now_and_on_commit(sorted(keys))
@@ -0,0 +1,100 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import images, ledger, occupancy, receipts, room_cards, search_cache
+from .models import Booking, BookingGuest, MealPreference, Payment, Room
+
+
+# Deletes need no handler: RoomNight rows cascade with their booking.
+@receiver(post_save, sender=Booking)
+def sync_room_nights(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    occupancy.sync_booking(instance, created=created)
+
+
+# Receipts are content-addressed, so a stale file is never served; dropping
+# the booking's files here just frees the disk space straight away.
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def drop_booking_receipts(sender, instance, created=False, **kwargs):
+    if not created:
+        receipts.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=BookingGuest)
+@receiver(post_delete, sender=BookingGuest)
+@receiver(post_save, sender=MealPreference)
+@receiver(post_delete, sender=MealPreference)
+def drop_related_receipts(sender, instance, **kwargs):
+    receipts.invalidate(instance.booking_id)
+
+
+# Payment totals live on the booking (ledger.py). A payment moved to
+# another booking changes both, so remember where it was.
+@receiver(pre_save, sender=Payment)
+def remember_payment_booking(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._previous_booking_id = None
+        return
+    instance._previous_booking_id = (
+        Payment.objects.filter(pk=instance.pk).values_list("booking_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def update_payment_ledger(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ledger.refresh(instance.booking_id, getattr(instance, "_previous_booking_id", None))
+
+
+# A new booking has no payments yet; an updated one may have a new price,
+# and its save wrote back whatever amount_paid it was loaded with.
+@receiver(post_save, sender=Booking)
+def update_booking_ledger(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    ledger.refresh(instance.pk)
+
+
+# A moved booking frees its old nights, so remember them for the post_save handler.
+@receiver(pre_save, sender=Booking)
+def remember_stay(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        instance._previous_stay = None
+        return
+    instance._previous_stay = (
+        Booking.objects.filter(pk=instance.pk).values_list("start_date", "end_date").first()
+    )
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def drop_cached_searches_for_stay(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_stay", None)
+    search_cache.invalidate_stay((instance.start_date, instance.end_date), *([previous] if previous else []))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def drop_cached_searches(sender, **kwargs):
+    search_cache.invalidate_rooms()
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def drop_cached_card(sender, instance, **kwargs):
+    room_cards.invalidate(instance.pk)
+
+
+# Resize new uploads (and drop the copies of removed ones) as they are saved.
+@receiver(post_save, sender=Room)
+def refresh_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if (instance.image and not images.is_current(instance)) or (not instance.image and instance.image_variants):
+        images.refresh(instance)
@@ -0,0 +1,200 @@
+"""
+Production static files: content-hashed names, precompressed at collectstatic time.
+
+``CompressedManifestStaticFilesStorage`` is Django's manifest storage (every
+``{% static %}`` URL carries a hash of the file's contents) that also writes
+``.gz`` and, when the optional ``brotli`` package is installed, ``.br``
+copies of every text asset next to it in ``STATIC_ROOT``.
+
+``PrecompressedStaticMiddleware`` serves ``STATIC_URL`` straight from
+``STATIC_ROOT`` before sessions, auth or URL resolving run. It picks the
+smallest variant the client's ``Accept-Encoding`` allows, and marks hashed
+names ``Cache-Control: public, max-age=31536000, immutable`` so browsers
+never ask for them again; unhashed names get a short ``max-age``. Behind a
+CDN or nginx the same files and headers can be served by them instead.
+"""
+import gzip
+import mimetypes
+import os
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # optional; gzip alone still covers every browser
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".map", ".svg", ".json", ".txt", ".html", ".xml", ".ico"}
+# A compressed copy is only kept when it saves at least this fraction.
+MIN_SAVING = 0.05
+IMMUTABLE = "public, max-age=31536000, immutable"
+# (Content-Encoding, file suffix) in order of preference.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def compress(path):
+    """Write the ``.gz`` (and ``.br``) copies of ``path``; returns the suffixes written."""
+    with open(path, "rb") as f:
+        data = f.read()
+    written = []
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data)
+    for suffix, compressed in variants.items():
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + suffix, "wb") as f:
+                f.write(compressed)
+            written.append(suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        # Compress the final files: the hashed copies (whose CSS now points
+        # at other hashed names) and the unhashed originals.
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                compress(self.path(name))
+
+
+def accepted_encodings(header):
+    """Content codings with a non-zero q-value in an ``Accept-Encoding`` header."""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFile:
+    __slots__ = ("path", "content_type", "cache_control", "encodings", "mtime")
+
+    def __init__(self, path, content_type, cache_control, encodings, mtime):
+        self.path = path
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.encodings = encodings
+        self.mtime = mtime
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def build_index():
+    """{name relative to STATIC_ROOT: StaticFile} for everything collectstatic wrote."""
+    root = settings.STATIC_ROOT
+    if not root or not os.path.isdir(root):
+        return {}
+    hashed = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+    suffixes = {suffix for _, suffix in ENCODINGS}
+    index = {}
+    for directory, _, files in os.walk(root):
+        present = set(files)
+        for filename in files:
+            base, suffix = os.path.splitext(filename)
+            if suffix in suffixes and base in present:
+                continue  # a compressed copy, served through its original
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            content_type, _ = mimetypes.guess_type(filename)
+            if content_type and (content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml")):
+                content_type += "; charset=utf-8"
+            index[name] = StaticFile(
+                path,
+                content_type or "application/octet-stream",
+                IMMUTABLE if name in hashed else f"public, max-age={settings.STATIC_UNHASHED_MAX_AGE}",
+                [(coding, path + suffix) for coding, suffix in ENCODINGS if filename + suffix in present],
+                int(os.stat(path).st_mtime),
+            )
+    return index
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+    return _index
+
+
+@receiver(setting_changed)
+def reset_index(setting, **kwargs):
+    global _index
+    if setting in ("STATIC_ROOT", "STATIC_URL", "STORAGES"):
+        _index = None
+
+
+class PrecompressedStaticMiddleware:
+    """Answers STATIC_URL requests from STATIC_ROOT; everything else passes through."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        static_file = self.lookup(request)
+        if static_file is None:
+            return self.get_response(request)
+        return self.serve(request, static_file)
+
+    async def __acall__(self, request):
+        static_file = self.lookup(request)
+        if static_file is None:
+            return await self.get_response(request)
+        return self.serve(request, static_file)
+
+    def lookup(self, request):
+        prefix = settings.STATIC_URL if settings.STATIC_URL.startswith("/") else "/" + settings.STATIC_URL
+        if request.method not in ("GET", "HEAD") or not request.path_info.startswith(prefix):
+            return None
+        return get_index().get(request.path_info[len(prefix):])
+
+    def serve(self, request, static_file):
+        response = get_conditional_response(request, last_modified=static_file.mtime)
+        if response is None:
+            path, coding = static_file.path, None
+            accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+            for candidate, candidate_path in static_file.encodings:
+                if candidate in accepted:
+                    path, coding = candidate_path, candidate
+                    break
+            response = FileResponse(open(path, "rb"), content_type=static_file.content_type)
+            del response["Content-Disposition"]
+            if coding:
+                response["Content-Encoding"] = coding
+            response["Last-Modified"] = http_date(static_file.mtime)
+        if static_file.encodings:
+            response["Vary"] = "Accept-Encoding"
+        response["Cache-Control"] = static_file.cache_control
+        return response
@@ -0,0 +1,125 @@
+"""
+Deterministic synthetic data for benchmarks and query-plan checks.
+
+The same ``seed`` always produces the same rooms, guests, bookings, payments
+and meal preferences, so runs against freshly seeded databases are comparable.
+Rows are written with ``bulk_create`` in batches; the occupancy index and
+the bookings' payment columns are rebuilt at the end because bulk inserts
+bypass the ``Booking`` and ``Payment`` signals.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from . import ledger, occupancy, pricing
+from .models import (
+    Room,
+    Guest,
+    Booking,
+    BookingGuest,
+    Meal,
+    MealPreference,
+    Payment,
+)
+
+ROOM_KINDS = [
+    # room_type, bed_type, adults, children
+    ("Single", "Single", 1, 0),
+    ("Double", "Double", 2, 1),
+    ("Double", "Two Singles", 2, 2),
+    ("Suite", "Double", 4, 3),
+]
+MEALS = [("Breakfast", Decimal("500.00")), ("Lunch", Decimal("800.00")), ("Dinner", Decimal("1200.00"))]
+LAST_NAMES = ["Otieno", "Wanjiru", "Mwangi", "Achieng", "Kamau", "Njeri", "Odhiambo", "Chebet"]
+STATUS_WEIGHTS = [("Confirmed", 70), ("Pending", 20), ("Cancelled", 10)]
+
+
+def seed(rooms=100, guests=1000, bookings=5000, seed=0, start=date(2025, 1, 1), batch_size=2000, stdout=None):
+    """Populate the current database and return a dict of row counts."""
+    rng = random.Random(seed)
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+
+    meals = [Meal.objects.get_or_create(name=name, defaults={"price": price})[0] for name, price in MEALS]
+
+    room_objs = []
+    for n in range(rooms):
+        room_type, bed_type, adults, children = ROOM_KINDS[n % len(ROOM_KINDS)]
+        room_objs.append(Room(
+            room_number=f"S{n:05d}",
+            room_type=room_type,
+            bed_type=bed_type,
+            capacity_adults=adults,
+            capacity_children=children,
+            price_per_night=Decimal(rng.randrange(2000, 20000, 500)),
+            description=f"Synthetic {room_type.lower()} room {n}",
+        ))
+    room_objs = Room.objects.bulk_create(room_objs, batch_size=batch_size)
+
+    guest_ids = []
+    for offset in range(0, guests, batch_size):
+        batch = [
+            Guest(
+                first_name=f"Guest{n}",
+                last_name=rng.choice(LAST_NAMES),
+                email=f"guest{n}@example.com",
+                phone=f"+2547{n:08d}",
+            )
+            for n in range(offset, min(offset + batch_size, guests))
+        ]
+        guest_ids.extend(g.id for g in Guest.objects.bulk_create(batch))
+
+    # Each room's stays are laid end to end so generated bookings never overlap.
+    cursors = {room.id: start for room in room_objs}
+    counts = {"rooms": len(room_objs), "guests": len(guest_ids), "bookings": 0,
+              "booking_guests": 0, "payments": 0, "meal_preferences": 0}
+    for offset in range(0, bookings, batch_size):
+        batch, batch_meals = [], []
+        for _ in range(offset, min(offset + batch_size, bookings)):
+            room = rng.choice(room_objs)
+            checkin = cursors[room.id] + timedelta(days=rng.randint(0, 3))
+            nights = rng.randint(1, 7)
+            cursors[room.id] = checkin + timedelta(days=nights)
+            chosen = [meal for meal in meals if rng.random() < 0.3]
+            batch.append(Booking(
+                primary_guest_id=rng.choice(guest_ids) if guest_ids else None,
+                room=room,
+                start_date=checkin,
+                end_date=cursors[room.id],
+                num_adults=rng.randint(1, room.capacity_adults),
+                num_children=rng.randint(0, room.capacity_children),
+                total_price=pricing.quote(room.price_per_night, checkin, cursors[room.id], [meal.price for meal in chosen]).total,
+                booking_status=rng.choices(statuses, weights)[0],
+            ))
+            batch_meals.append(chosen)
+        batch = Booking.objects.bulk_create(batch)
+
+        booking_guests, preferences, payments = [], [], []
+        for booking, chosen in zip(batch, batch_meals):
+            if booking.primary_guest_id:
+                booking_guests.append(BookingGuest(booking=booking, guest_id=booking.primary_guest_id))
+            preferences.extend(MealPreference(booking=booking, meal=meal, selected=True) for meal in chosen)
+            if booking.booking_status == "Confirmed":
+                payments.append(Payment(
+                    booking=booking, amount=booking.total_price, payment_method="Cash",
+                    payment_status="Completed", transaction_id=f"SYN{booking.id}",
+                ))
+            elif booking.booking_status == "Pending" and rng.random() < 0.5:
+                payments.append(Payment(
+                    booking=booking, amount=(booking.total_price / 2).quantize(Decimal("0.01")),
+                    payment_method="Credit Card", payment_status="Pending",
+                ))
+        BookingGuest.objects.bulk_create(booking_guests)
+        MealPreference.objects.bulk_create(preferences)
+        Payment.objects.bulk_create(payments)
+
+        counts["bookings"] += len(batch)
+        counts["booking_guests"] += len(booking_guests)
+        counts["meal_preferences"] += len(preferences)
+        counts["payments"] += len(payments)
+        if stdout is not None:
+            stdout.write(f"  seeded {counts['bookings']}/{bookings} bookings")
+
+    counts["room_nights"] = occupancy.rebuild(batch_size=batch_size)
+    ledger.rebuild(batch_size=batch_size)
+    return counts
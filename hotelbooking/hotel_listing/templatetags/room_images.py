@@ -0,0 +1,40 @@
+from django import template
+from django.utils.html import format_html
+
+from .. import images
+
+register = template.Library()
+
+CARD_SIZES = "(min-width: 768px) 33vw, 100vw"
+
+
+@register.filter
+def srcset(room, fmt="jpeg"):
+    """
+    ``srcset`` value listing the room's resized variants in ``fmt`` ("webp" or "jpeg").
+    Usage: <img srcset="{{ room|srcset:'webp' }}" ...>
+    """
+    return images.srcset(room, fmt)
+
+
+@register.simple_tag
+def room_picture(room, css_class="", sizes=CARD_SIZES, alt=""):
+    """
+    <picture> with WebP and JPEG ``srcset``s for ``room.image``, falling back
+    to the original upload until its variants exist.
+    Usage: {% room_picture room "w-full h-48 object-cover" alt="Suite" %}
+    """
+    fallback = images.smallest(room, min_width=640)
+    if fallback is None:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            room.image.url, alt, css_class,
+        )
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        images.srcset(room, "webp"), sizes,
+        room.image.storage.url(fallback["jpeg"]), images.srcset(room, "jpeg"), sizes,
+        fallback["width"], fallback["height"], alt, css_class,
+    )
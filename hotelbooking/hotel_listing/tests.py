@@ -1,3 +1,1210 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import (
+    accounts, availability, booking_import, checks, images, ledger, logins, metrics, occupancy, pricing, queryplans,
+    receipts, reservations, room_cards, search_cache, static_assets, synthetic,
+)
+from .pagination import encode_cursor
+from .models import Room, Guest, Booking, BookingGuest, Meal, Payment, RoomNight
+
+
+def make_room(number="101", **kwargs):
+    defaults = dict(
+        room_type="Double", capacity_adults=2, capacity_children=1,
+        price_per_night=Decimal("5000.00"), bed_type="Double",
+    )
+    defaults.update(kwargs)
+    return Room.objects.create(room_number=number, **defaults)
+
+
+def make_booking(room, start, end, status="Confirmed", guest=None):
+    return Booking.objects.create(
+        primary_guest=guest, room=room, start_date=start, end_date=end,
+        num_adults=1, num_children=0, total_price=Decimal("100.00"),
+        booking_status=status,
+    )
+
+
+class OccupancyIndexTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+
+    def nights_of(self, booking):
+        return sorted(
+            RoomNight.objects.filter(booking=booking).values_list("night", flat=True)
+        )
+
+    def test_index_follows_booking_lifecycle(self):
+        booking = make_booking(self.room, date(2030, 1, 1), date(2030, 1, 4))
+        self.assertEqual(
+            self.nights_of(booking),
+            [date(2030, 1, 1), date(2030, 1, 2), date(2030, 1, 3)],
+        )
+
+        booking.end_date = date(2030, 1, 2)
+        booking.save()
+        self.assertEqual(self.nights_of(booking), [date(2030, 1, 1)])
+
+        booking.booking_status = "Cancelled"
+        booking.save()
+        self.assertEqual(self.nights_of(booking), [])
+
+        booking.booking_status = "Pending"
+        booking.save()
+        booking.delete()
+        self.assertFalse(RoomNight.objects.exists())
+
+    def test_home_excludes_rooms_held_for_the_stay(self):
+        free = make_room("102")
+        pending = make_room("103")
+        make_booking(self.room, date(2030, 1, 1), date(2030, 1, 4))
+        make_booking(pending, date(2030, 1, 3), date(2030, 1, 4), status="Pending")
+        make_booking(free, date(2030, 1, 1), date(2030, 1, 4), status="Cancelled")
+
+        response = self.client.get(reverse("home"), {"checkin": "2030-01-03", "checkout": "2030-01-05"})
+        self.assertEqual(list(response.context["rooms"]), [free])
+
+        # Checkout day is free again.
+        response = self.client.get(reverse("home"), {"checkin": "2030-01-04", "checkout": "2030-01-05"})
+        self.assertEqual(set(response.context["rooms"]), {self.room, pending, free})
+
+    def test_consistency_check_and_rebuild(self):
+        booking = make_booking(self.room, date(2030, 1, 1), date(2030, 1, 3))
+        self.assertEqual(occupancy.check_consistency(), ([], []))
+
+        # Simulate drift from a write that bypassed signals.
+        Booking.objects.filter(pk=booking.pk).update(end_date=date(2030, 1, 4))
+        missing, extra = occupancy.check_consistency()
+        self.assertEqual(missing, [(booking.id, self.room.id, date(2030, 1, 3), "Confirmed")])
+        self.assertEqual(extra, [])
+
+        self.assertEqual(occupancy.rebuild(), 3)
+        self.assertEqual(occupancy.check_consistency(), ([], []))
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite's")
+class QueryPlanTests(TestCase):
+    def test_full_scan_detection_resolves_subquery_aliases(self):
+        sql = 'SELECT 1 FROM "rooms" WHERE id IN (SELECT U0."room_id" FROM "room_nights" U0)'
+        self.assertEqual(queryplans.full_scans(["SCAN rooms", "SCAN U0"], sql), ["SCAN U0"])
+        self.assertEqual(queryplans.full_scans(["SEARCH U0 USING INDEX room_nights_lookup_idx"], sql), [])
+
+    def test_hot_paths_use_indexes(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        override = override_settings(RECEIPT_CACHE_DIR=Path(cache_dir))
+        override.enable()
+        self.addCleanup(override.disable)
+        synthetic.seed(rooms=20, guests=50, bookings=400)
+        user, booking = queryplans.probe_booking()
+        self.client.force_login(user)
+
+        offenders = [
+            (label, sql, queryplans.full_scans(plan, sql))
+            for label, sql, plan in queryplans.capture_plans(self.client, booking)
+            if queryplans.full_scans(plan, sql)
+        ]
+        self.assertEqual(offenders, [])
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="guest", password=None)
+        self.guest = Guest.objects.create(user=self.user, first_name="Ann", last_name="Guest")
+        self.client.force_login(self.user)
+
+    def book(self, room, start, total="100.00", paid=()):
+        booking = make_booking(room, start, start + timedelta(days=1), guest=self.guest)
+        Booking.objects.filter(pk=booking.pk).update(total_price=Decimal(total))
+        for amount in paid:
+            Payment.objects.create(booking=booking, amount=Decimal(amount), payment_method="Cash")
+        return booking
+
+    def test_payment_totals_are_read_from_the_booking(self):
+        room = make_room()
+        paid = self.book(room, date(2030, 1, 1), paid=["60.00", "40.00"])
+        partial = self.book(room, date(2030, 1, 2), paid=["10.00"])
+        unpaid = self.book(room, date(2030, 1, 3))
+
+        response = self.client.get(reverse("dashboard"))
+        rows = {b.id: (b.amount_paid, b.balance, b.payment_state) for b in response.context["bookings"]}
+        self.assertEqual(rows[paid.id], (Decimal("100.00"), Decimal("0.00"), "Paid"))
+        self.assertEqual(rows[partial.id], (Decimal("10.00"), Decimal("90.00"), "Partial"))
+        self.assertEqual(rows[unpaid.id], (Decimal("0.00"), Decimal("100.00"), "Unpaid"))
+
+    def test_booking_details_loads_everything_before_rendering(self):
+        booking = self.book(make_room(), date(2030, 1, 1), paid=["60.00"])
+        booking.booking_guests.create(guest=Guest.objects.create(first_name="Child", last_name="Guest"), is_child=True)
+        booking.meal_preferences.create(meal=Meal.objects.create(name="Breakfast", price=Decimal("10.00")), selected=True)
+
+        # user, guest, booking, booking guests, their guest rows, meal
+        # preferences, meals
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse("booking_details", args=[booking.id]))
+        self.assertContains(response, "Child Guest")
+        self.assertContains(response, "Breakfast")
+        self.assertEqual(response.context["booking"].payment_state, "Partial")
+        self.assertEqual(self.client.get(reverse("booking_details", args=[booking.id + 1])).status_code, 404)
+
+    def test_query_count_is_flat_and_pages_walk_both_ways(self):
+        room = make_room()
+        booked = [self.book(room, date(2030, 1, 1) + timedelta(days=i), paid=["5.00"]) for i in range(45)]
+        newest_first = [b.id for b in reversed(booked)]
+
+        # user, guest, bookings page (sessions are read from the cache)
+        with self.assertNumQueries(3):
+            first = self.client.get(reverse("dashboard")).context["bookings"]
+        self.assertEqual([b.id for b in first], newest_first[:20])
+        self.assertFalse(first.has_previous())
+
+        second = self.client.get(reverse("dashboard"), {"after": first.next_cursor}).context["bookings"]
+        third = self.client.get(reverse("dashboard"), {"after": second.next_cursor}).context["bookings"]
+        self.assertEqual([b.id for b in second], newest_first[20:40])
+        self.assertEqual([b.id for b in third], newest_first[40:])
+        self.assertFalse(third.has_next())
+
+        back = self.client.get(reverse("dashboard"), {"before": third.previous_cursor}).context["bookings"]
+        self.assertEqual([b.id for b in back], newest_first[20:40])
+        self.assertTrue(back.has_previous())
+
+    def test_tampered_cursor_is_ignored(self):
+        self.book(make_room(), date(2030, 1, 1))
+        for cursor in (encode_cursor(["notadate", 1]), encode_cursor([None, 1]), encode_cursor(["2030-01-01"])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse("dashboard"), {"after": cursor, "before": cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context["bookings"]), 1)
+
+
+class PaymentLedgerTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+        self.booking = make_booking(self.room, date(2030, 1, 1), date(2030, 1, 2))
+        self.other = make_booking(self.room, date(2030, 1, 5), date(2030, 1, 6))
+
+    def ledger_of(self, booking):
+        booking.refresh_from_db(fields=["amount_paid", "payment_state"])
+        return booking.amount_paid, booking.payment_state
+
+    def test_payment_writes_keep_the_booking_columns_current(self):
+        self.assertEqual(self.ledger_of(self.booking), (Decimal("0.00"), "Unpaid"))
+        first = Payment.objects.create(booking=self.booking, amount=Decimal("40.00"), payment_method="Cash")
+        self.assertEqual(self.ledger_of(self.booking), (Decimal("40.00"), "Partial"))
+        Payment.objects.create(booking=self.booking, amount=Decimal("60.00"), payment_method="Cash")
+        self.assertEqual(self.ledger_of(self.booking), (Decimal("100.00"), "Paid"))
+
+        # A price change re-derives the state even though no payment moved.
+        booking = Booking.objects.get(pk=self.booking.pk)
+        booking.total_price = Decimal("150.00")
+        booking.save()
+        self.assertEqual(self.ledger_of(self.booking), (Decimal("100.00"), "Partial"))
+
+        first.booking = self.other
+        first.save()
+        self.assertEqual(self.ledger_of(self.booking), (Decimal("60.00"), "Partial"))
+        self.assertEqual(self.ledger_of(self.other), (Decimal("40.00"), "Partial"))
+        first.delete()
+        self.assertEqual(self.ledger_of(self.other), (Decimal("0.00"), "Unpaid"))
+        self.assertEqual(list(Booking.objects.unpaid()), [self.booking, self.other])
+
+    def test_reconcile_repairs_drift(self):
+        Payment.objects.bulk_create([Payment(booking=self.booking, amount=Decimal("100.00"), payment_method="Cash")])
+        with self.assertRaises(CommandError):
+            call_command("reconcile_payments", "--check", stdout=StringIO())
+        out = StringIO()
+        call_command("reconcile_payments", stdout=out)
+        self.assertIn(f"booking={self.booking.id} stored=0", out.getvalue())
+        self.assertEqual(self.ledger_of(self.booking), (Decimal("100.00"), "Paid"))
+        self.assertEqual(ledger.find_drift(), [])
+
+
+class ConfirmBookingTests(TestCase):
+    def setUp(self):
+        self.room = make_room(capacity_adults=4, capacity_children=2)
+        self.meals = [Meal.objects.create(name=name, price=Decimal("100.00")) for name in ("Breakfast", "Dinner")]
+        self.user = User.objects.create_user(username="guest", password=None)
+        self.guest = Guest.objects.create(user=self.user, first_name="Ann", last_name="Guest")
+        self.client.force_login(self.user)
+        self.url = reverse("confirm_booking", args=[self.room.id]) + "?checkin=2030-01-01&checkout=2030-01-03&adults=4&children=2"
+
+    def party(self):
+        data = {"is_primary_guest_in_booking": "on", "meals": [str(meal.id) for meal in self.meals]}
+        for i in range(1, 4):
+            data.update({f"adult_{i}_first": "Adult", f"adult_{i}_last": str(i), f"adult_{i}_email": f"a{i}@example.com"})
+        for i in range(1, 3):
+            data.update({f"child_{i}_first": "Child", f"child_{i}_last": str(i)})
+        return data
+
+    def test_six_guest_booking_is_written_in_batches(self):
+        # user, room, guest profile, meals, savepoint, [savepoint,
+        # savepoint, booking, room nights, release, release], guests,
+        # booking guests, meal preferences, release; plus the room lock and
+        # availability check where there are row locks
+        with self.assertNumQueries(17 if connection.features.has_select_for_update else 15):
+            response = self.client.post(self.url, self.party())
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+
+        booking = Booking.objects.get()
+        # 2 nights x (5000 room + 2 x 100 meals) + 18% VAT
+        self.assertEqual(booking.total_price, Decimal("12272.00"))
+        self.assertEqual(booking.booking_guests.count(), 6)
+        self.assertEqual(booking.booking_guests.filter(is_child=True).count(), 2)
+        self.assertEqual(booking.meal_preferences.count(), 2)
+        self.assertTrue(Guest.objects.filter(email=f"child2_{booking.id}@noemail.com").exists())
+
+    def test_incomplete_party_writes_nothing(self):
+        data = self.party()
+        del data["child_2_first"]
+        response = self.client.post(self.url, data)
+        self.assertContains(response, "Please provide all required guests")
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(Guest.objects.count(), 1)
+
+    def test_failure_midway_rolls_back_everything(self):
+        self.client.logout()
+        data = self.party()
+        data.update({"first_name": "New", "last_name": "Guest", "email": "new@example.com"})
+        with mock.patch.object(BookingGuest.objects, "bulk_create", side_effect=IntegrityError("boom")):
+            response = self.client.post(self.url, data)
+        self.assertContains(response, "Error adding guests")
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(Guest.objects.count(), 1)
+
+
+class GuestCheckoutTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+        self.url = reverse("confirm_booking", args=[self.room.id]) + "?checkin=2030-01-01&checkout=2030-01-03&adults=1&children=0"
+        self.data = {"is_primary_guest_in_booking": "on", "create_account": "on",
+                     "first_name": "New", "last_name": "Guest", "email": "new@example.com", "phone": "0700"}
+
+    def test_checkout_writes_a_guest_and_never_hashes_a_password(self):
+        with mock.patch("django.contrib.auth.base_user.make_password") as make_password:
+            response = self.client.post(self.url, self.data)
+        self.assertRedirects(response, reverse("booking_received"), fetch_redirect_response=False)
+        make_password.assert_not_called()
+        self.assertFalse(User.objects.exists())
+        guest = Booking.objects.get().primary_guest
+        self.assertEqual((guest.email, guest.user, guest.account_invite), ("new@example.com", None, accounts.PENDING))
+        self.assertContains(self.client.get(reverse("booking_received")), "We will email new@example.com")
+
+    def test_emailed_link_creates_the_account_once(self):
+        self.client.post(self.url, self.data)
+        call_command("send_account_invites", stdout=StringIO())
+        call_command("send_account_invites", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        guest = Guest.objects.get()
+        self.assertEqual(guest.account_invite, accounts.SENT)
+
+        link = next(line for line in mail.outbox[0].body.splitlines() if "/activate/" in line)
+        path = link[link.index("/activate/"):]
+        password = "Correct-Horse-42"
+        response = self.client.post(path, {"username": "newguest", "password1": password, "password2": password})
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+        guest.refresh_from_db()
+        self.assertEqual((guest.user.username, guest.user.email), ("newguest", "new@example.com"))
+        self.assertTrue(guest.user.check_password(password))
+
+        self.client.logout()
+        self.assertEqual(self.client.get(path).status_code, 400)
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="ann", password="s3cret-pass")
+
+    def test_login_checks_the_hash_off_the_view_and_survives_a_cache_restart(self):
+        # the user row and its last_login, then the session row: created, then filled in
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse("login"), {"username": "ann", "password": "s3cret-pass"})
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+        self.assertEqual(self.client.session["_auth_user_id"], str(User.objects.get().pk))
+
+        # A restarted process has an empty cache; the session comes back from the database.
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.assertEqual(self.client.session["_auth_user_id"], str(User.objects.get().pk))
+
+        self.client.logout()
+        response = self.client.post(reverse("login"), {"username": "nobody", "password": "s3cret-pass"})
+        self.assertContains(response, "Invalid username or password.")
+
+    @override_settings(LOGIN_HASH_QUEUE=1)
+    def test_full_hashing_pool_is_rejected_with_429(self):
+        _, slots = logins.get_pool()
+        slots.acquire()  # another login's check
+        self.addCleanup(slots.release)
+        with mock.patch("hotel_listing.logins.verify_password") as verify:
+            response = self.client.post(reverse("login"), {"username": "ann", "password": "s3cret-pass"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], str(settings.LOGIN_RETRY_AFTER))
+        verify.assert_not_called()
+
+    @override_settings(LOGIN_HASH_QUEUE=0, LOGIN_HASH_WORKERS=1)
+    def test_no_queue_still_admits_one_check_per_thread(self):
+        response = self.client.post(reverse("login"), {"username": "ann", "password": "s3cret-pass"})
+        self.assertRedirects(response, reverse("dashboard"), fetch_redirect_response=False)
+
+
+class PricingTests(TestCase):
+    def test_batch_and_sql_quotes_match_single_quote(self):
+        rooms = [make_room(str(n), price_per_night=Decimal(price)) for n, price in enumerate(("4999.99", "5000.00", "7250.50"))]
+        meals = [Decimal("333.33"), Decimal("100.00")]
+        ranges = [(date(2030, 1, 1), date(2030, 1, 2)), (date(2030, 1, 1), date(2030, 1, 8))]
+        stays = [(room, checkin, checkout, meals, 3) for checkin, checkout in ranges for room in rooms]
+
+        expected = [pricing.quote(room.price_per_night, checkin, checkout, meals, 3) for room, checkin, checkout, _, _ in stays]
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing.quote_many(stays), expected)
+
+        checkin, checkout = ranges[1]
+        annotated = pricing.annotate_stay_total(Room.objects.order_by("id"), checkin, checkout, meals, rooms=3)
+        self.assertEqual(list(annotated.values_list("stay_total", flat=True)), [q.total for q in expected[3:]])
+
+    def test_vat_rounds_half_cents_up_in_python_and_sql(self):
+        # 1.25 x 18% = 0.225: half up gives 0.23 where half to even would give 0.22.
+        make_room(price_per_night=Decimal("1.25"))
+        checkin, checkout = date(2030, 1, 1), date(2030, 1, 2)
+        quoted = pricing.quote(Decimal("1.25"), checkin, checkout)
+        self.assertEqual((quoted.vat, quoted.total), (Decimal("0.23"), Decimal("1.48")))
+        annotated = pricing.annotate_stay_total(Room.objects.all(), checkin, checkout)
+        self.assertEqual(annotated.get().stay_total, Decimal("1.48"))
+
+    def test_home_prices_every_card_in_the_search_query(self):
+        for n in range(5):
+            make_room(str(n))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("home"), {"checkin": "2030-01-01", "checkout": "2030-01-03", "rooms": "2"})
+        # 2 nights x 2 rooms x 5000 + 18% VAT
+        self.assertContains(response, "KSh 23600.00 for 2 nights x 2 rooms", count=5)
+
+    def test_multi_room_booking_is_priced_and_recorded_per_room(self):
+        room = make_room(capacity_adults=2, capacity_children=0)
+        user = User.objects.create_user(username="guest", password=None)
+        Guest.objects.create(user=user, first_name="Ann", last_name="Guest")
+        self.client.force_login(user)
+        url = reverse("confirm_booking", args=[room.id]) + "?checkin=2030-01-01&checkout=2030-01-02&adults=3&children=0&rooms=2"
+        data = {"is_primary_guest_in_booking": "on"}
+        for i in (1, 2):
+            data.update({f"adult_{i}_first": "Adult", f"adult_{i}_last": str(i), f"adult_{i}_email": f"a{i}@example.com"})
+        self.client.post(url, data)
+
+        booking = Booking.objects.get()
+        self.assertEqual(booking.num_rooms, 2)
+        self.assertEqual(booking.total_price, pricing.quote(room.price_per_night, booking.start_date, booking.end_date, rooms=2).total)
+
+
+class SearchCacheTests(TestCase):
+    params = {"checkin": "2030-01-10", "checkout": "2030-01-12", "adults": "1"}
+
+    def setUp(self):
+        search_cache.get_cache().clear()
+        self.rooms = [make_room(str(n)) for n in range(3)]
+
+    def search(self):
+        return [room.id for room in self.client.get(reverse("home"), self.params).context["rooms"]]
+
+    def test_repeat_search_is_served_from_cache(self):
+        all_ids = [room.id for room in self.rooms]
+        self.assertEqual(self.search(), all_ids)
+        with self.assertNumQueries(1):  # the room rows, by primary key
+            self.assertEqual(self.search(), all_ids)
+        self.assertEqual(search_cache.stats(), {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+    def test_only_bookings_touching_the_range_invalidate(self):
+        self.search()
+        make_booking(self.rooms[0], date(2030, 2, 1), date(2030, 2, 3))
+        self.search()
+        self.assertEqual(search_cache.stats()["hits"], 1)
+
+        booking = make_booking(self.rooms[0], date(2030, 1, 11), date(2030, 1, 13))
+        self.assertEqual(self.search(), [self.rooms[1].id, self.rooms[2].id])
+
+        # Moving the booking away frees the cached nights it used to hold.
+        booking.start_date, booking.end_date = date(2030, 3, 1), date(2030, 3, 2)
+        booking.save()
+        self.assertEqual(len(self.search()), 3)
+        self.assertEqual(search_cache.stats()["misses"], 3)
+
+    def test_room_change_invalidates(self):
+        self.search()
+        self.rooms[2].is_available = False
+        self.rooms[2].save()
+        self.assertEqual(self.search(), [self.rooms[0].id, self.rooms[1].id])
+
+
+    def test_each_process_counts_its_lookups_in_metrics(self):
+        metrics.registry.reset()
+        self.search()
+        self.search()
+        self.assertIn('hotelbooking_search_cache_lookups_total{result="hit"} 1', metrics.registry.render())
+        self.assertIn('hotelbooking_search_cache_lookups_total{result="miss"} 1', metrics.registry.render())
+
+    def test_process_local_cache_is_reported(self):
+        errors = checks.check_caches_are_shared(None)
+        self.assertEqual([error.id for error in errors], ["hotel_listing.E001"] * 2)
+        self.assertIn("CACHES['sessions']", errors[1].msg)
+        with self.assertRaises(CommandError):
+            call_command("search_cache_stats", stdout=StringIO())
+
+        with tempfile.TemporaryDirectory() as location:
+            shared = {
+                **settings.CACHES,
+                "search": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": f"{location}/search"},
+                "sessions": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": f"{location}/sessions"},
+            }
+            with override_settings(CACHES=shared):
+                self.assertEqual(checks.check_caches_are_shared(None), [])
+
+
+class RoomCardTests(TestCase):
+    def setUp(self):
+        room_cards.get_cache().clear()
+        self.room = make_room("101", description="Sea view")
+        self.other = make_room("102")
+
+    def test_cards_are_rendered_once_until_their_room_changes(self):
+        params = {"checkin": "2030-01-10", "checkout": "2030-01-12", "adults": "2"}
+        with mock.patch.object(room_cards, "render", wraps=room_cards.render) as render:
+            response = self.client.get(reverse("home"), params)
+            self.assertEqual(render.call_count, 2)
+            self.assertContains(response, "Sea view")
+            self.assertContains(response, "KSh 11800.00 for 2 nights")
+            self.assertContains(response, f'{reverse("book_room", args=[self.room.id])}?checkin=2030-01-10&amp;checkout=2030-01-12&amp;adults=2"')
+
+            response = self.client.get(reverse("home"), {"checkin": "2030-01-10", "checkout": "2030-01-11"})
+            self.assertEqual(render.call_count, 2)
+            self.assertContains(response, "KSh 5900.00 for 1 night ")
+
+            self.room.description = "Garden view"
+            self.room.save()
+            response = self.client.get(reverse("home"))
+            self.assertEqual(render.call_count, 3)
+            self.assertContains(response, "Garden view")
+            self.assertNotContains(response, "Sea view")
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        search_cache.get_cache().clear()
+        make_room()
+
+    def test_metrics_are_staff_only_and_per_view(self):
+        self.client.get(reverse("home"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 302)
+
+        staff = User.objects.create_user(username="ops", password=None, is_staff=True)
+        self.client.force_login(staff)
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('hotelbooking_requests_total{view="home",method="GET",status="200"} 1', body)
+        self.assertIn('hotelbooking_request_db_queries_bucket{view="home",le="+Inf"} 1', body)
+        self.assertIn('hotelbooking_request_template_duration_seconds_count{view="home"} 1', body)
+        self.assertRegex(body, r'hotelbooking_response_size_bytes_sum\{view="home"\} [1-9]')
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs("hotel_listing.slow_requests", "WARNING") as logs:
+            self.client.get(reverse("home"))
+        self.assertIn("Slow request: GET / -> 200 (home)", logs.output[0])
+        self.assertIn('FROM "rooms"', logs.output[0])
+
+    @override_settings(METRICS_SLOW_REQUEST_SECONDS=0)
+    async def test_async_requests_are_measured_with_their_sql(self):
+        with self.assertLogs("hotel_listing.slow_requests", "WARNING") as logs:
+            response = await self.async_client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Slow request: GET / -> 200 (home)", logs.output[0])
+        self.assertIn(", 1 queries in", logs.output[0])
+        self.assertIn('FROM "rooms"', logs.output[0])
+
+
+class BookingImportTests(TestCase):
+    header = "room_number,start_date,end_date,num_adults,num_children,booking_status,guest_first_name,guest_last_name,guest_email\n"
+
+    def setUp(self):
+        self.room = make_room("101")
+        self.other = make_room("102")
+        self.existing = make_booking(self.room, date(2030, 1, 10), date(2030, 1, 12))
+
+    def run_import(self, body):
+        rejects = StringIO()
+        result = booking_import.import_bookings(StringIO(self.header + body), rejects=rejects)
+        return result, {row[0]: row[1] for row in csv.reader(StringIO(rejects.getvalue()))}
+
+    def test_rows_are_validated_swept_and_written(self):
+        result, rejects = self.run_import(
+            "101,2030-01-01,2030-01-03,1,0,Confirmed,Ann,Guest,ann@example.com\n"  # ok
+            "101,2030-01-02,2030-01-04,1,0,Pending,,,\n"                          # clashes with line 2
+            "101,2030-01-11,2030-01-13,1,0,Confirmed,,,\n"                        # clashes with existing
+            "101,2030-01-11,2030-01-13,1,0,Cancelled,,,\n"                        # cancelled: holds nothing
+            "102,2030-01-05,2030-01-04,1,0,Pending,,,\n"                          # dates reversed
+            "102,2030-01-05,2030-01-06,3,0,Pending,,,\n"                          # over capacity
+            "999,2030-01-05,2030-01-06,1,0,Pending,,,\n"                          # unknown room
+            "102,2030-01-05,2030-01-07,2,1,Pending,Bo,Guest,ann@example.com\n"    # ok, same guest
+        )
+        self.assertEqual((result.read, result.imported, result.rejected), (8, 3, 5))
+        self.assertEqual(rejects, {
+            "line": "reason",
+            "3": "overlaps line 2 of this file",
+            "4": f"overlaps existing booking {self.existing.id}",
+            "6": "end_date must be after start_date",
+            "7": "room capacity exceeded (max 2 adults, 1 children)",
+            "8": "unknown room_number",
+        })
+        self.assertEqual(Guest.objects.filter(email="ann@example.com").count(), 1)
+        imported = Booking.objects.exclude(pk=self.existing.pk).filter(booking_status="Pending").get()
+        self.assertEqual(imported.total_price, pricing.quote(self.other.price_per_night, imported.start_date, imported.end_date).total)
+        self.assertEqual(occupancy.check_consistency(), ([], []))
+
+    def test_each_chunk_is_written_before_the_next_is_read(self):
+        body = (
+            "101,2030-02-01,2030-02-03,1,0,Confirmed,,,\n"
+            "102,2030-02-01,2030-02-03,1,0,Confirmed,,,\n"
+            "101,2030-02-02,2030-02-04,1,0,Confirmed,,,\n"  # next chunk: clashes with line 2, now written
+        )
+        result = booking_import.import_bookings(StringIO(self.header + body), batch_size=2, dry_run=True)
+        self.assertEqual((result.imported, result.rejected), (2, 1))
+        self.assertEqual(Booking.objects.count(), 1)
+
+        rejects = StringIO()
+        result = booking_import.import_bookings(StringIO(self.header + body), rejects=rejects, batch_size=2)
+        self.assertEqual((result.imported, result.rejected), (2, 1))
+        first = Booking.objects.get(room=self.room, start_date=date(2030, 2, 1))
+        self.assertIn(f"4,overlaps existing booking {first.id}", rejects.getvalue())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        rows = "".join(f"102,{date(2031, 1, 1) + timedelta(days=2 * n)},{date(2031, 1, 2) + timedelta(days=2 * n)},1,0,Confirmed,,,\n" for n in range(200))
+        with CaptureQueriesContext(connection) as ctx:
+            result, _ = self.run_import(rows)
+        self.assertEqual(result.imported, 200)
+        # Rooms and the existing stays; everything else is batched INSERTs.
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 2)
+
+    def test_admin_upload(self):
+        admin_user = User.objects.create_superuser(username="admin", password=None)
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile("bookings.csv", (self.header + "102,2030-02-01,2030-02-03,1,0,Confirmed,,,\n").encode())
+        response = self.client.post(reverse("admin:hotel_listing_booking_import"), {"file": upload})
+        self.assertContains(response, "1 rows read, 1 imported, 0 rejected")
+        self.assertTrue(Booking.objects.filter(room=self.other, start_date=date(2030, 2, 1)).exists())
+
+
+class LargeTableAdminTests(TestCase):
+    # user, one joined page query, row estimate, capped count
+    budgets = {
+        "booking": 4,
+        "payment": 4,
+        "bookingguest": 4,
+        "mealpreference": 5,  # + the meal list filter
+    }
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username="admin", password=None))
+        meal = Meal.objects.create(name="Breakfast", price=Decimal("100.00"))
+        room = make_room()
+        for n in range(30):
+            guest = Guest.objects.create(first_name="Guest", last_name=str(n))
+            booking = make_booking(room, date(2030, 1, 1) + timedelta(days=n), date(2030, 1, 2) + timedelta(days=n), guest=guest)
+            booking.booking_guests.create(guest=guest)
+            booking.meal_preferences.create(meal=meal, selected=True)
+            booking.payments.create(amount=Decimal("100.00"), payment_method="Cash", payment_status="Completed")
+
+    def test_changelists_stay_within_query_budget(self):
+        for model, budget in self.budgets.items():
+            with self.subTest(model=model), self.assertNumQueries(budget):
+                response = self.client.get(reverse(f"admin:hotel_listing_{model}_changelist"))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context["cl"].result_list), 30)
+
+    def test_keyset_pages_walk_the_whole_table(self):
+        from .admin import BookingAdmin
+
+        url = reverse("admin:hotel_listing_booking_changelist")
+        newest_first = list(Booking.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        seen, params = [], {}
+        with mock.patch.object(BookingAdmin, "list_per_page", 12):
+            while True:
+                cl = self.client.get(url, params).context["cl"]
+                seen += [booking.id for booking in cl.result_list]
+                if not cl.keyset_page.has_next():
+                    break
+                params = {"after": cl.keyset_page.next_cursor}
+            self.assertEqual(seen, newest_first)
+            self.assertEqual(cl.result_count, 30)
+
+            back = self.client.get(url, {"before": cl.keyset_page.previous_cursor}).context["cl"]
+            self.assertEqual([b.id for b in back.result_list], newest_first[12:24])
+
+            # Sorting by a column uses the stock numbered pages.
+            self.assertIsNone(self.client.get(url, {"o": "4"}).context["cl"].keyset_page)
+
+    @override_settings(ADMIN_COUNT_CAP=10)
+    def test_counts_are_capped_or_estimated(self):
+        url = reverse("admin:hotel_listing_payment_changelist")
+        self.assertContains(self.client.get(url, {"payment_status__exact": "Completed"}), "10+")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertContains(self.client.get(url), "about 30")
+
+
+class AdminAutocompleteTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username="admin", password=None))
+        self.room = make_room()
+        self.guest = Guest.objects.create(first_name="Ann", last_name="Smith", email="ann@example.com", phone="0711000000")
+        Guest.objects.create(first_name="Annabel", last_name="Jones", email="bel@example.com")
+        Guest.objects.create(first_name="Joan", last_name="Annan", email="joan@example.com")
+        self.booking = make_booking(self.room, date(2030, 1, 1), date(2030, 1, 3), guest=self.guest)
+        self.booking.booking_guests.create(guest=self.guest)
+
+    def change_form(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:hotel_listing_booking_change", args=[self.booking.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_booking_change_form_does_not_list_every_guest(self):
+        self.change_form()  # warm the content type cache
+        response, baseline = self.change_form()
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, "Annabel")
+        Guest.objects.bulk_create([Guest(first_name="Extra", last_name=str(n)) for n in range(200)])
+        response, queries = self.change_form()
+        self.assertNotContains(response, "Extra")
+        self.assertEqual(queries, baseline)
+
+    def test_prefix_search_matches_word_starts_only(self):
+        def names(term):
+            response = self.client.get(reverse("admin:autocomplete"), {
+                "app_label": "hotel_listing", "model_name": "booking", "field_name": "primary_guest", "term": term,
+            })
+            return sorted(result["text"] for result in response.json()["results"])
+
+        self.assertEqual(names("ann"), ["Ann Smith", "Annabel Jones", "Joan Annan"])
+        self.assertEqual(names("ANN SMI"), ["Ann Smith"])
+        self.assertEqual(names("0711"), ["Ann Smith"])
+        self.assertEqual(names("nn"), [])  # prefixes, not substrings
+
+    def test_booking_search_by_number_room_or_guest(self):
+        url = reverse("admin:hotel_listing_booking_changelist")
+        for term in (str(self.booking.pk), self.room.room_number, "smith"):
+            with self.subTest(term=term):
+                results = self.client.get(url, {"q": term}).context["cl"].result_list
+                self.assertEqual([booking.pk for booking in results], [self.booking.pk])
+
+
+class AvailabilityCalendarTests(TestCase):
+    url = reverse("availability_calendar")
+
+    def setUp(self):
+        self.room = make_room("101")
+        self.other = make_room("102")
+        make_booking(self.room, date(2030, 1, 3), date(2030, 1, 5))
+        make_booking(self.room, date(2030, 1, 5), date(2030, 1, 6), status="Pending")
+        make_booking(self.other, date(2029, 12, 30), date(2030, 1, 2))
+        make_booking(self.other, date(2030, 1, 2), date(2030, 1, 9), status="Cancelled")
+
+    def test_grid_is_run_length_encoded_in_two_queries(self):
+        with self.assertNumQueries(4):  # two for the ETag, two for the grid
+            response = self.client.get(self.url, {"start": "2030-01-01", "end": "2030-01-08"})
+        data = response.json()
+        self.assertEqual(data["nights"], 7)
+        self.assertEqual({room["number"]: room["runs"] for room in data["rooms"]}, {"101": "2.2C1P2.", "102": "1C6."})
+        self.assertEqual(availability.decode_runs("2.2C1P2."), list("..CCP.."))
+
+    def test_etag_revalidates_until_a_booking_changes(self):
+        params = {"start": "2030-01-01", "end": "2030-01-08"}
+        etag = self.client.get(self.url, params)["ETag"]
+        with self.assertNumQueries(2):  # rooms and nights versions, no grid
+            self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # As if booked by another process: no search cache token is replaced here.
+        with mock.patch.object(search_cache, "_replace_tokens"):
+            make_booking(self.other, date(2030, 1, 7), date(2030, 1, 8))
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["rooms"][1]["runs"], "1C5.1C")
+
+        etag = response["ETag"]
+        self.other.is_available = False
+        with mock.patch.object(search_cache, "_replace_tokens"):
+            self.other.save()
+        self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bad_windows_are_rejected(self):
+        for params in ({"start": "2030-02-30"}, {"start": "2030-01-05", "end": "2030-01-05"},
+                       {"start": "2030-01-01", "end": "2031-01-01"}, {"start": "soon"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+class RoomSearchApiTests(TestCase):
+    url = reverse("api_rooms")
+
+    def setUp(self):
+        search_cache.get_cache().clear()
+        self.rooms = [make_room(str(100 + n), price_per_night=Decimal(price)) for n, price in enumerate(("300", "100", "200", "100"))]
+        make_booking(self.rooms[0], date(2030, 1, 1), date(2030, 1, 3))
+
+    def test_cursor_walks_the_search_by_price(self):
+        params = {"checkin": "2030-01-01", "checkout": "2030-01-03", "adults": "2", "limit": "2"}
+        with self.assertNumQueries(3):  # two for the ETag; booked rooms are a subquery of the page
+            first = self.client.get(self.url, params).json()
+        self.assertEqual([room["number"] for room in first["rooms"]], ["101", "103"])
+        self.assertEqual(first["rooms"][0]["stay_total"], "236.00")  # 2 nights + 18% tax
+        self.assertEqual(first["nights"], 2)
+        self.assertIsNone(first["previous"])
+
+        second = self.client.get(self.url, {**params, "after": first["next"]}).json()
+        self.assertEqual([room["number"] for room in second["rooms"]], ["102"])
+        self.assertIsNone(second["next"])
+        back = self.client.get(self.url, {**params, "before": second["previous"]}).json()
+        self.assertEqual(back["rooms"], first["rooms"])
+
+        by_number = self.client.get(self.url, {"order": "room_number"}).json()
+        self.assertEqual([room["number"] for room in by_number["rooms"]], ["100", "101", "102", "103"])
+        self.assertNotIn("stay_total", by_number["rooms"][0])
+
+    def test_etag_revalidates_and_responses_are_gzipped(self):
+        params = {"checkin": "2030-01-01", "checkout": "2030-01-03"}
+        response = self.client.get(self.url, params, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))["rooms"]), 3)
+        etag = response["ETag"]
+        with self.assertNumQueries(2):  # rooms and nights versions, no search
+            self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # As if booked by another process: no search cache token is replaced here.
+        with mock.patch.object(search_cache, "_replace_tokens"):
+            make_booking(self.rooms[1], date(2030, 1, 2), date(2030, 1, 4))
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["rooms"]), 2)
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({"order": "rating"}, {"limit": "0"}, {"limit": "1000"}, {"checkin": "soon", "checkout": "later"}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    def test_tampered_cursor_is_ignored(self):
+        for key in ("after", "before"):
+            with self.subTest(key=key):
+                response = self.client.get(self.url, {key: encode_cursor(["abc", 1])})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()["rooms"]), 4)
+
+
+class RoomImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, name="suite.png", size=(1500, 1000)):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGBA", size, (200, 120, 40, 255)).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def test_upload_gets_resized_variants_in_every_format(self):
+        room = make_room(image=self.upload())
+        room.refresh_from_db()
+        variants = room.image_variants["variants"]
+        self.assertEqual(room.image_variants["source"], room.image.name)
+        self.assertEqual([(v["width"], v["height"]) for v in variants], [(320, 213), (640, 427), (1280, 853)])
+        for variant in variants:
+            self.assertTrue(room.image.storage.exists(variant["webp"]))
+            self.assertTrue(room.image.storage.exists(variant["jpeg"]))
+
+        html = self.client.get(reverse("home")).content.decode()
+        self.assertIn('<source type="image/webp" srcset="/media/rooms/variants/suite-320w.webp 320w', html)
+        self.assertIn('src="/media/rooms/variants/suite-640w.jpg"', html)
+        self.assertNotIn(f'src="{room.image.url}"', html)
+
+        # A new upload replaces the old files; small originals are not upscaled.
+        old = images.names(room.image_variants)
+        room.image = self.upload("small.png", size=(500, 300))
+        room.save()
+        self.assertEqual([v["width"] for v in room.image_variants["variants"]], [320, 500])
+        self.assertFalse(any(room.image.storage.exists(name) for name in old))
+
+    def test_backfill_builds_missing_variants(self):
+        room = make_room(image=self.upload())
+        Room.objects.filter(pk=room.pk).update(image_variants={})
+        room.refresh_from_db()
+        self.assertEqual(images.srcset(room, "webp"), "")
+        etag = self.client.get(reverse("api_rooms"))["ETag"]
+
+        out = StringIO()
+        call_command("build_room_images", workers=1, stdout=out)
+        self.assertIn("Built variants for 1 room image(s)", out.getvalue())
+        room.refresh_from_db()
+        self.assertTrue(images.is_current(room))
+
+        # The API's image URLs changed, so a revalidating client must get them.
+        response = self.client.get(reverse("api_rooms"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["rooms"][0]["image"], "/media/rooms/variants/suite-320w.webp")
+
+        self.client.force_login(User.objects.create_superuser(username="admin", password=None))
+        response = self.client.get(reverse("admin:hotel_listing_room_change", args=[room.pk]))
+        self.assertContains(response, 'src="/media/rooms/variants/suite-320w.webp"')
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(STATIC_ROOT=root, STORAGES={
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "hotel_listing.static_assets.CompressedManifestStaticFilesStorage"},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_hashed_assets_are_precompressed_and_immutable(self):
+        from django.templatetags.static import static
+
+        url = static("hotel_listing/admin_row_click.js")
+        self.assertRegex(url, r"/static/hotel_listing/admin_row_click\.[0-9a-f]{12}\.js$")
+        original = (Path(settings.STATIC_ROOT) / url[len("/static/"):]).read_bytes()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="br;q=0, gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), original)
+
+        plain = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(plain.streaming_content), original)
+
+        revalidated = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_unhashed_names_get_a_short_max_age(self):
+        response = self.client.get("/static/hotel_listing/admin_row_click.css", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Cache-Control"], f"public, max-age={settings.STATIC_UNHASHED_MAX_AGE}")
+        self.assertEqual(self.client.get("/static/hotel_listing/missing.css").status_code, 404)
+        self.assertEqual(static_assets.accepted_encodings("gzip;q=0.5, br;q=0 , *;q=0"), {"gzip"})
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+
+    def test_book_rejects_overlap_and_allows_back_to_back(self):
+        make_booking(self.room, date(2030, 1, 1), date(2030, 1, 4))
+        clash = Booking(room=self.room, start_date=date(2030, 1, 3), end_date=date(2030, 1, 5),
+                        num_adults=1, num_children=0, total_price=Decimal("1.00"))
+        with self.assertRaises(reservations.RoomUnavailable):
+            reservations.book(clash)
+        self.assertIsNone(clash.pk)
+
+        clash.start_date = date(2030, 1, 4)
+        reservations.book(clash)
+        self.assertIsNotNone(clash.pk)
+
+    def test_database_key_blocks_writes_that_skip_the_check(self):
+        make_booking(self.room, date(2030, 1, 1), date(2030, 1, 4))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_booking(self.room, date(2030, 1, 2), date(2030, 1, 3), status="Pending")
+
+    def test_admin_form_reports_overlap(self):
+        from .admin import BookingForm
+
+        guest = Guest.objects.create(first_name="Ann", last_name="Guest")
+        make_booking(self.room, date(2030, 1, 1), date(2030, 1, 4))
+        data = {"primary_guest": guest.id, "room": self.room.id, "start_date": "2030-01-02", "end_date": "2030-01-05",
+                "num_adults": 1, "num_children": 0, "num_rooms": 1, "total_price": "10.00", "booking_status": "Pending"}
+        form = BookingForm(data=data)
+        self.assertFalse(form.is_valid())
+        self.assertIn("already booked", str(form.errors))
+
+        data["booking_status"] = "Cancelled"
+        self.assertTrue(BookingForm(data=data).is_valid())
+
+
+@skipUnless(connection.vendor == "postgresql", "PostgreSQL exclusion constraint and GiST index")
+class PostgresBookingConstraintTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+
+    def booking(self, start, end, status="Confirmed"):
+        return Booking(room=self.room, start_date=start, end_date=end, num_adults=1, num_children=0,
+                       total_price=Decimal("1.00"), booking_status=status)
+
+    def test_exclusion_constraint_rejects_overlapping_active_stays(self):
+        # bulk_create skips the occupancy index, leaving the constraint alone to check.
+        Booking.objects.bulk_create([self.booking(date(2030, 1, 1), date(2030, 1, 4))])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.bulk_create([self.booking(date(2030, 1, 3), date(2030, 1, 5), status="Pending")])
+        Booking.objects.bulk_create([
+            self.booking(date(2030, 1, 4), date(2030, 1, 6)),
+            self.booking(date(2030, 1, 2), date(2030, 1, 3), status="Cancelled"),
+        ])
+
+    def test_search_uses_the_gist_index(self):
+        other = make_room("102")
+        make_booking(self.room, date(2030, 1, 1), date(2030, 1, 4))
+        make_booking(other, date(2030, 1, 4), date(2030, 1, 6))
+        booked = occupancy.booked_room_ids(date(2030, 1, 3), date(2030, 1, 4))
+        self.assertEqual(list(booked), [{"room_id": self.room.id}])
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn("bookings_stay_gist_idx", booked.explain())
+
+
+class OverlapMigrationTests(TransactionTestCase):
+    """0005 adds the (room, night) unique key over data older code could double-book."""
+
+    before, after = [("hotel_listing", "0004_hot_path_indexes")], [("hotel_listing", "0005_unique_room_night")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_later_overlapping_booking_is_cancelled_before_the_unique_key(self):
+        apps = self.migrate(self.before)
+        Room, Booking, RoomNight = (apps.get_model("hotel_listing", name) for name in ("Room", "Booking", "RoomNight"))
+        room = Room.objects.create(room_number="101", room_type="Double", capacity_adults=2, capacity_children=1,
+                                   price_per_night=Decimal("100.00"), bed_type="Double")
+        stays = [(date(2030, 1, 1), date(2030, 1, 4), "Confirmed"), (date(2030, 1, 3), date(2030, 1, 5), "Pending"),
+                 (date(2030, 1, 4), date(2030, 1, 6), "Pending")]
+        first, duplicate, next_stay = (
+            Booking.objects.create(room=room, start_date=start, end_date=end, num_adults=1, num_children=0,
+                                   total_price=Decimal("100.00"), booking_status=status)
+            for start, end, status in stays
+        )
+        for booking in (first, duplicate, next_stay):
+            RoomNight.objects.bulk_create(
+                RoomNight(room=room, booking=booking, night=booking.start_date + timedelta(days=n), booking_status=booking.booking_status)
+                for n in range((booking.end_date - booking.start_date).days)
+            )
+
+        with self.assertLogs("hotel_listing.migrations", "WARNING") as logs:
+            apps = self.migrate(self.after)
+        self.assertIn(f"Cancelled booking {duplicate.id}: it overlaps the earlier booking {first.id}", logs.output[0])
+        Booking, RoomNight = apps.get_model("hotel_listing", "Booking"), apps.get_model("hotel_listing", "RoomNight")
+        self.assertEqual(dict(Booking.objects.values_list("id", "booking_status")),
+                         {first.id: "Confirmed", duplicate.id: "Cancelled", next_stay.id: "Pending"})
+        self.assertFalse(RoomNight.objects.filter(booking_id=duplicate.id).exists())
+
+
+class ReservationStressTests(TransactionTestCase):
+    THREADS = 8
+
+    def attempt(self, room_id, start, end):
+        try:
+            for _ in range(50):
+                try:
+                    reservations.book(Booking(room_id=room_id, start_date=start, end_date=end, num_adults=1,
+                                              num_children=0, total_price=Decimal("1.00")))
+                    return "booked"
+                except reservations.RoomUnavailable:
+                    return "rejected"
+                except OperationalError:
+                    # SQLite allows one writer at a time; retry like a client would.
+                    time.sleep(0.005)
+            return "gave up"
+        finally:
+            connection.close()
+
+    def test_concurrent_bookings_never_overlap(self):
+        contested = make_room("201")
+        others = [make_room(f"3{n:02d}") for n in range(8)]
+        rng = random.Random(5)
+
+        jobs = []
+        for n in range(40):
+            start = date(2030, 1, 1) + timedelta(days=rng.randrange(6))
+            jobs.append((contested.id, start, start + timedelta(days=rng.randint(1, 4))))
+        for room in others:
+            for week in range(4):
+                start = date(2030, 1, 1) + timedelta(weeks=week)
+                jobs.append((room.id, start, start + timedelta(days=5)))
+        rng.shuffle(jobs)
+
+        barrier = threading.Barrier(self.THREADS)
+
+        def run(job):
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            return job, self.attempt(*job)
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            outcomes = list(pool.map(run, jobs))
+
+        self.assertEqual(reservations.overlapping_pairs(), [])
+        self.assertEqual(occupancy.check_consistency(), ([], []))
+        contested_booked = [job for job, result in outcomes if job[0] == contested.id and result == "booked"]
+        self.assertGreaterEqual(len(contested_booked), 1)
+        # Bookings for distinct rooms never block each other.
+        self.assertEqual(
+            [result for job, result in outcomes if job[0] != contested.id],
+            ["booked"] * (len(others) * 4),
+        )
+
+
+class ReceiptCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(RECEIPT_CACHE_DIR=Path(self.cache_dir))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        user = User.objects.create_user(username="guest", password=None)
+        guest = Guest.objects.create(user=user, first_name="Ann", last_name="Guest")
+        self.booking = make_booking(make_room(), date(2030, 1, 1), date(2030, 1, 3), guest=guest)
+        Payment.objects.create(booking=self.booking, amount=Decimal("100.00"), payment_method="Cash",
+                               payment_status="Completed", transaction_id="TX1")
+        self.client.force_login(user)
+        self.url = reverse("print_receipt", args=[self.booking.id])
+
+    def cached_files(self):
+        return sorted(p.name for p in Path(self.cache_dir).glob("*/*.pdf"))
+
+    def test_receipt_is_rendered_once_and_revalidated(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(first.streaming_content).startswith(b"%PDF"))
+        self.assertEqual(len(self.cached_files()), 1)
+
+        with mock.patch.object(receipts, "build_pdf") as build:
+            again = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        build.assert_not_called()
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_receipt_deleted_before_it_is_opened_is_rendered_again(self):
+        cached_pdf = receipts.cached_pdf
+
+        def first_then_invalidated(booking):
+            result = cached_pdf(booking)
+            if calls.call_count == 1:
+                receipts.invalidate(booking.id)  # a concurrent save, or prune_receipt_cache
+            return result
+
+        with mock.patch.object(receipts, "cached_pdf", side_effect=first_then_invalidated) as calls:
+            response = self.client.get(self.url)
+        self.assertEqual(calls.call_count, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+
+        first = self.client.get(self.url)
+        Payment.objects.create(booking=self.booking, amount=Decimal("5.00"), payment_method="Cash",
+                               payment_status="Completed", transaction_id="TX2")
+        self.assertEqual(self.cached_files(), [])
+
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+
+    def test_prints_on_different_days_are_identical(self):
+        first = b"".join(self.client.get(self.url).streaming_content)
+        receipts.invalidate(self.booking.id)
+        three_days_later = time.time() + 3 * 86400
+        with mock.patch("time.time", return_value=three_days_later), \
+                mock.patch.object(receipts, "Paragraph", wraps=receipts.Paragraph) as paragraph:
+            second = b"".join(self.client.get(self.url).streaming_content)
+        self.assertEqual(first, second)
+        paid_on = Payment.objects.get(transaction_id="TX1").payment_date.strftime("%Y-%m-%d")
+        texts = [call.args[0] for call in paragraph.call_args_list]
+        self.assertIn(f"Issued on: {paid_on}", texts)
+        self.assertFalse([text for text in texts if text.startswith("Receipt Printed")])
+
+    def test_evict_by_age_and_size(self):
+        self.client.get(self.url)
+        other = make_booking(self.booking.room, date(2030, 2, 1), date(2030, 2, 2), guest=self.booking.primary_guest)
+        Payment.objects.create(booking=other, amount=Decimal("100.00"), payment_method="Cash")
+        self.client.get(reverse("print_receipt", args=[other.id]))
+        old, new = sorted(Path(self.cache_dir).glob("*/*.pdf"), key=lambda p: p.parent.name)
+        os.utime(old, (time.time() - 3600, time.time() - 3600))
+
+        self.assertEqual(receipts.evict(max_bytes=10**9, max_age=60)[0], 1)
+        self.assertEqual(self.cached_files(), [new.name])
+        self.assertEqual(receipts.evict(max_bytes=0, max_age=60)[0], 1)
+        self.assertEqual(self.cached_files(), [])
+
+
+class ExportReceiptsTests(TestCase):
+    def setUp(self):
+        guest = Guest.objects.create(first_name="Ann", last_name="Guest")
+        room = make_room()
+        self.paid = []
+        for day in (1, 10, 20):
+            booking = make_booking(room, date(2030, 1, day), date(2030, 1, day + 2), guest=guest)
+            Payment.objects.create(booking=booking, amount=Decimal("100.00"), payment_method="Cash",
+                                   payment_status="Completed", transaction_id=f"TX{day}")
+            self.paid.append(booking)
+        make_booking(room, date(2030, 1, 5), date(2030, 1, 6), guest=guest)  # unpaid
+        make_booking(room, date(2030, 2, 1), date(2030, 2, 2), guest=guest)  # out of range
+        self.out = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.out, ignore_errors=True)
+
+    def test_exports_paid_bookings_to_zip(self):
+        archive = os.path.join(self.out, "receipts.zip")
+        call_command("export_receipts", "--from", "2030-01-01", "--to", "2030-01-31",
+                     "--workers", "1", "--zip", archive, stdout=StringIO())
+        with zipfile.ZipFile(archive) as zf:
+            self.assertEqual(
+                sorted(zf.namelist()),
+                sorted(f"receipt_booking_{b.id}.pdf" for b in self.paid),
+            )
+            self.assertTrue(zf.read(zf.namelist()[0]).startswith(b"%PDF"))
+
+    def test_exports_with_process_pool(self):
+        stdout = StringIO()
+        call_command("export_receipts", "--from", "2030-01-01", "--to", "2030-01-31",
+                     "--workers", "2", "--output-dir", self.out, stdout=stdout)
+        self.assertEqual(len(os.listdir(self.out)), 3)
+        self.assertIn("receipts/s", stdout.getvalue())
@@ -5,6 +5,8 @@ urlpatterns = [
     path('', views.home, name="home"),
     path("book/<int:room_id>/", views.book_room, name="book_room"),
     path("confirm/<int:room_id>/", views.confirm_booking, name="confirm_booking"),
+    path("booking/received/", views.booking_received, name="booking_received"),
+    path("activate/<str:token>/", views.activate_account, name="activate_account"),
 
     # Authentication
     path("login/", views.login_view, name="login"),
@@ -17,6 +19,9 @@ urlpatterns = [
     path('receipt/<int:booking_id>/', views.print_receipt, name='print_receipt'),
     
     path('profile/', views.profile_view, name='profile'),
+    path('availability/calendar/', views.availability_calendar, name='availability_calendar'),
+    path('api/v1/rooms/', views.api_rooms, name='api_rooms'),
+    path('metrics', views.metrics_view, name='metrics'),
      path('password_change/', views.password_change_view, name='password_change'),  
     
     
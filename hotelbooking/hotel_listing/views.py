@@ -1,36 +1,36 @@
 # Standard library
+import asyncio
 import datetime
-from datetime import datetime as dt  # Alias datetime class to avoid confusion
 from decimal import Decimal
 
 # Third-party
 import pdfkit
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Paragraph,
-    Spacer,
-    Table,
-    TableStyle,
-    HRFlowable,
-)
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
 
 # Django
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
-from django.db.models import Q, Sum, F
+from django.db import IntegrityError, transaction
+from django.db.models import Q, F
 from django.utils.dateparse import parse_date
+from django.contrib.auth import alogin, login, logout
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.cache import never_cache
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
 
 # Local apps
+from . import (
+    accounts, api, availability, logins, metrics, pricing, receipts, reservations, room_cards, room_search,
+    search_cache,
+)
 from .models import (
     Room,
     Booking,
@@ -40,54 +40,67 @@ from .models import (
     MealPreference,
     Payment,
 )
+from .forms import AccountActivationForm
+from .pagination import KeysetPaginator
 
+DASHBOARD_PAGE_SIZE = 20
 
-def home(request):
-    rooms = Room.objects.filter(is_available=True)
-
-    checkin = request.GET.get('checkin')
-    checkout = request.GET.get('checkout')
-    adults = request.GET.get('adults')
-    children = request.GET.get('children')
-    num_rooms = request.GET.get('rooms')
-    room_type = request.GET.get('room_type')
-    bed_type = request.GET.get('bed_type')
 
-    if checkin and checkout:
-        checkin_date = dt.strptime(checkin, '%Y-%m-%d').date() if checkin else None
-        checkout_date = dt.strptime(checkout, '%Y-%m-%d').date() if checkout else None
+async def alist(queryset):
+    return [obj async for obj in queryset]
 
-        if checkin_date and checkout_date:
-            booked_rooms = Booking.objects.filter(
-                Q(start_date__lt=checkout_date),
-                Q(end_date__gt=checkin_date),
-                booking_status="Confirmed"
-            ).values_list('room_id', flat=True)
 
-            rooms = rooms.exclude(id__in=booked_rooms)
+async def load_user(request):
+    """
+    Resolve ``request.user`` and its guest profile for an async view; returns the guest or ``None``.
 
-    if adults and adults.isdigit():
-        rooms = rooms.filter(capacity_adults__gte=int(adults))
-    if children and children.isdigit():
-        rooms = rooms.filter(capacity_children__gte=int(children))
-    if num_rooms and num_rooms.isdigit():
-        if hasattr(Room, "total_rooms"):
-            rooms = rooms.filter(total_rooms__gte=int(num_rooms))
+    Templates render synchronously and can't query from an async view, so
+    the profile the nav bar shows is fetched here.
+    """
+    request.user = await request.auser()
+    if not request.user.is_authenticated:
+        return None
+    guest = await Guest.objects.filter(user=request.user).afirst()
+    User.guest_profile.related.set_cached_value(request.user, guest)
+    return guest
 
-    if room_type:
-        rooms = rooms.filter(room_type__iexact=room_type)
-    if bed_type:
-        rooms = rooms.filter(bed_type__iexact=bed_type)
 
+async def home(request):
+    await load_user(request)
+    error = request.GET.get('error')
+    try:
+        criteria = room_search.parse(request.GET)
+    except room_search.InvalidSearch as e:
+        criteria, error = room_search.parse({}), str(e)
+
+    # Matching room ids come from the search cache when we can; the room
+    # rows themselves are then a primary-key lookup.
+    rooms, cache_key, cached = room_search.matching_rooms(criteria)
+    rooms = [room async for room in rooms]
+    if cache_key is not None and not cached:
+        search_cache.put(cache_key, [room.id for room in rooms])
+    # Cards come rendered from the card cache; only the stay total and the
+    # booking link's query string are filled in per request.
+    room_cards.attach(rooms)
+
+    stay = room_search.has_stay(criteria)
     context = {
         "rooms": rooms,
-        "error": request.GET.get('error')
+        "nights": pricing.nights_between(criteria["checkin"], criteria["checkout"]) if stay else None,
+        "stay_rooms": room_search.stay_rooms(criteria) if stay else None,
+        "book_query": urlencode({
+            key: request.GET[key] for key in ("checkin", "checkout", "adults", "children") if request.GET.get(key)
+        }),
+        "error": error
     }
     return render(request, "home.html", context)
 
-def book_room(request, room_id):
-    room = get_object_or_404(Room, id=room_id)
-    meals = Meal.objects.all()
+async def book_room(request, room_id):
+    await load_user(request)
+    # Independent reads, awaited together.
+    room, meals = await asyncio.gather(Room.objects.filter(id=room_id).afirst(), alist(Meal.objects.all()))
+    if room is None:
+        raise Http404("No Room matches the given query.")
 
     checkin = request.GET.get("checkin")
     checkout = request.GET.get("checkout")
@@ -150,165 +163,107 @@ def confirm_booking(request, room_id):
         return redirect(f"{reverse('home')}?error=Invalid+check-in+or+check-out+date")
 
     if request.method == "POST":
-        if adults > room.capacity_adults * rooms or children > room.capacity_children * rooms:
+        def booking_error(error):
             return render(request, "confirm_booking.html", {
                 "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
                 "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                "error": "Booking exceeds room capacity!"
+                "error": error
             })
 
+        if adults > room.capacity_adults * rooms or children > room.capacity_children * rooms:
+            return booking_error("Booking exceeds room capacity!")
+
+        primary_guest = None
         if request.user.is_authenticated:
             try:
                 primary_guest = request.user.guest_profile
             except Guest.DoesNotExist:
-                return render(request, "confirm_booking.html", {
-                    "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                    "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                    "error": "No guest profile found for this user."
-                })
+                return booking_error("No guest profile found for this user.")
         else:
-            password = request.POST.get("password")
-            confirm_password = request.POST.get("confirm_password")
-            if password != confirm_password:
-                return render(request, "confirm_booking.html", {
-                    "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                    "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                    "error": "Passwords do not match."
-                })
-            if not password or len(password) < 8:
-                return render(request, "confirm_booking.html", {
-                    "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                    "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                    "error": "Password must be at least 8 characters long."
-                })
-
-            username = request.POST.get("username")
-            email = request.POST.get("email")
-            try:
-                user = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password=password,
-                    first_name=request.POST["first_name"],
-                    last_name=request.POST["last_name"]
-                )
-                primary_guest = Guest.objects.create(
-                    user=user,
-                    first_name=request.POST["first_name"],
-                    last_name=request.POST["last_name"],
-                    email=email,
-                    phone=request.POST.get("phone", "")
-                )
-            except Exception as e:
-                return render(request, "confirm_booking.html", {
-                    "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                    "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                    "error": f"Error creating primary guest: {str(e)}"
-                })
-
-        nights = (checkout_date - checkin_date).days
-        room_total = room.price_per_night * nights * rooms
-        meal_total = Decimal("0.00")
-        for meal_id in request.POST.getlist("meals"):
-            try:
-                meal = Meal.objects.get(id=meal_id)
-                meal_total += meal.price * nights * rooms
-            except Meal.DoesNotExist:
-                continue
-        total_price = room_total + meal_total
-        vat_amount = total_price * Decimal("0.18")
-        grand_total = total_price + vat_amount
-
-        try:
-            booking = Booking.objects.create(
-                primary_guest=primary_guest,
-                room=room,
-                start_date=checkin_date,
-                end_date=checkout_date,
-                num_adults=adults,
-                num_children=children,
-                total_price=grand_total,
-                booking_status="Pending"
-            )
-        except Exception as e:
-            return render(request, "confirm_booking.html", {
-                "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                "error": f"Error creating booking: {str(e)}"
-            })
-
+            # Guest checkout: only a Guest row is written here. The account,
+            # and its password hash, come later through accounts.py.
+            primary_fields = {field: request.POST.get(field, "").strip() for field in ("first_name", "last_name", "email", "phone")}
+            if not (primary_fields["first_name"] and primary_fields["last_name"] and primary_fields["email"]):
+                return booking_error("Please provide your first name, last name and email.")
+
+        # Collect the whole party before writing anything, so an incomplete
+        # form never leaves a half-built booking behind.
         is_primary_guest_in_booking = request.POST.get("is_primary_guest_in_booking") == "on"
-        if is_primary_guest_in_booking:
-            try:
-                BookingGuest.objects.create(booking=booking, guest=primary_guest, is_child=False)
-            except Exception as e:
-                return render(request, "confirm_booking.html", {
-                    "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                    "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                    "error": f"Error linking primary guest to booking: {str(e)}"
-                })
-
         required_adults = adults - 1 if is_primary_guest_in_booking else adults
-        added_adults = 0
+        adult_guests = []
         for i in range(1, required_adults + 1):
             first = request.POST.get(f"adult_{i}_first")
             last = request.POST.get(f"adult_{i}_last")
             email = request.POST.get(f"adult_{i}_email")
             phone = request.POST.get(f"adult_{i}_phone", "")
             if first and last and email:
-                try:
-                    guest = Guest.objects.create(
-                        first_name=first,
-                        last_name=last,
-                        email=email,
-                        phone=phone
-                    )
-                    BookingGuest.objects.create(booking=booking, guest=guest, is_child=False)
-                    added_adults += 1
-                except Exception as e:
-                    return render(request, "confirm_booking.html", {
-                        "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                        "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                        "error": f"Error adding adult guest {first} {last}: {str(e)}"
-                    })
-
-        added_children = 0
+                adult_guests.append(Guest(first_name=first, last_name=last, email=email, phone=phone))
+
+        child_guests = []
         for i in range(1, children + 1):
             first = request.POST.get(f"child_{i}_first")
             last = request.POST.get(f"child_{i}_last")
             email = request.POST.get(f"child_{i}_email", "")
             phone = request.POST.get(f"child_{i}_phone", "")
             if first and last:
-                try:
-                    guest = Guest.objects.create(
-                        first_name=first,
-                        last_name=last,
-                        email=email or f"child{i}_{booking.id}@noemail.com",
-                        phone=phone
+                child_guests.append(Guest(first_name=first, last_name=last, email=email, phone=phone))
+
+        if len(adult_guests) < required_adults or len(child_guests) < children:
+            return booking_error(
+                f"Please provide all required guests. Needed: {required_adults} adult(s), {children} child(ren)."
+            )
+
+        meal_ids = [meal_id for meal_id in request.POST.getlist("meals") if meal_id.isdigit()]
+        chosen_meals = list(Meal.objects.filter(id__in=meal_ids))
+
+        price = pricing.quote(
+            room.price_per_night, checkin_date, checkout_date, [meal.price for meal in chosen_meals], rooms
+        )
+
+        # One unit of work: any failure rolls back the guests and booking together.
+        step = "creating primary guest"
+        try:
+            with transaction.atomic():
+                if primary_guest is None:
+                    primary_guest = Guest.objects.create(
+                        **primary_fields,
+                        account_invite=accounts.PENDING if request.POST.get("create_account") == "on" else "",
                     )
-                    BookingGuest.objects.create(booking=booking, guest=guest, is_child=True)
-                    added_children += 1
-                except Exception as e:
-                    return render(request, "confirm_booking.html", {
-                        "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                        "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                        "error": f"Error adding child guest {first} {last}: {str(e)}"
-                    })
-
-        if added_adults < required_adults or added_children < children:
-            return render(request, "confirm_booking.html", {
-                "room": room, "meals": meals, "checkin": checkin, "checkout": checkout,
-                "adults": adults, "children": children, "rooms": rooms, "selected_meals": selected_meals,
-                "error": f"Please provide all required guests. Needed: {required_adults} adult(s), {children} child(ren)."
-            })
 
-        for meal_id in request.POST.getlist("meals"):
-            try:
-                meal = Meal.objects.get(id=meal_id)
-                MealPreference.objects.create(booking=booking, meal=meal, selected=True)
-            except Meal.DoesNotExist:
-                continue
+                step = "creating booking"
+                booking = reservations.book(Booking(
+                    primary_guest=primary_guest,
+                    room=room,
+                    start_date=checkin_date,
+                    end_date=checkout_date,
+                    num_adults=adults,
+                    num_children=children,
+                    num_rooms=rooms,
+                    total_price=price.total,
+                    booking_status="Pending"
+                ))
+
+                step = "adding guests"
+                for i, guest in enumerate(child_guests, start=1):
+                    guest.email = guest.email or f"child{i}_{booking.id}@noemail.com"
+                Guest.objects.bulk_create(adult_guests + child_guests)
+                booking_guests = [BookingGuest(booking=booking, guest=primary_guest, is_child=False)] if is_primary_guest_in_booking else []
+                booking_guests += [BookingGuest(booking=booking, guest=guest, is_child=False) for guest in adult_guests]
+                booking_guests += [BookingGuest(booking=booking, guest=guest, is_child=True) for guest in child_guests]
+                BookingGuest.objects.bulk_create(booking_guests)
+
+                step = "saving meal preferences"
+                MealPreference.objects.bulk_create(
+                    [MealPreference(booking=booking, meal=meal, selected=True) for meal in chosen_meals]
+                )
+        except reservations.RoomUnavailable:
+            return booking_error("Sorry, this room has just been booked for the selected dates.")
+        except Exception as e:
+            return booking_error(f"Error {step}: {str(e)}")
 
+        if not request.user.is_authenticated:
+            request.session["guest_booking_id"] = booking.id
+            return redirect("booking_received")
         return redirect("dashboard")
 
     context = {
@@ -325,7 +280,40 @@ def confirm_booking(request, room_id):
 
 
 
-def login_view(request):
+def booking_received(request):
+    """Where guest checkout lands: the booking just made in this session."""
+    booking_id = request.session.get("guest_booking_id")
+    booking = Booking.objects.select_related("room", "primary_guest").filter(id=booking_id).first() if booking_id else None
+    if booking is None:
+        return redirect("home")
+    return render(request, "booking_received.html", {"booking": booking})
+
+
+def activate_account(request, token):
+    """Turn a guest-checkout booking into an account from the emailed link."""
+    guest = accounts.guest_for_token(token)
+    if guest is None:
+        return render(request, "activate_account.html", {"invalid": True}, status=400)
+
+    form = AccountActivationForm(request.POST or None)
+    if request.method == "POST" and form.is_valid():
+        try:
+            user = accounts.activate(guest, form)
+        except IntegrityError:
+            form.add_error("username", "A user with that username already exists.")
+        else:
+            if user is None:
+                return render(request, "activate_account.html", {"invalid": True}, status=400)
+            login(request, user, backend="django.contrib.auth.backends.ModelBackend")
+            messages.success(request, "Your account is ready.")
+            return redirect("dashboard")
+    return render(request, "activate_account.html", {"form": form, "guest": guest})
+
+
+async def login_view(request):
+    # Resolve the user up front: the lazy request.user would query the
+    # database synchronously when the template touches it.
+    request.user = await request.auser()
     if request.user.is_authenticated:
         return redirect("home")
 
@@ -333,9 +321,15 @@ def login_view(request):
         username = request.POST.get("username")
         password = request.POST.get("password")
 
-        user = authenticate(request, username=username, password=password)
+        try:
+            user = await logins.authenticate(request, username, password)
+        except logins.Busy:
+            messages.error(request, "Too many people are signing in right now. Please try again in a moment.")
+            response = render(request, "login.html", status=429)
+            response["Retry-After"] = str(settings.LOGIN_RETRY_AFTER)
+            return response
         if user is not None:
-            login(request, user)
+            await alogin(request, user)
             return redirect("dashboard")
         else:
             messages.error(request, "Invalid username or password.")
@@ -344,48 +338,33 @@ def login_view(request):
     return render(request, "login.html")
 
 @login_required
-def dashboard(request):
-    try:
-        guest = request.user.guest_profile
-    except Guest.DoesNotExist:
+async def dashboard(request):
+    guest = await load_user(request)
+    if guest is None:
         messages.error(request, "No guest profile found for this user.")
         return redirect("home")
 
-    bookings = guest.bookings.all()
-    for booking in bookings:
-        total_paid = booking.payments.aggregate(total=Sum("amount"))["total"] or 0
-        booking.total_paid = total_paid
-        booking.balance = booking.total_price - total_paid
-        if total_paid >= booking.total_price:
-            booking.payment_status = "Paid"
-        elif total_paid > 0:
-            booking.payment_status = "Partial"
-        else:
-            booking.payment_status = "Unpaid"
+    bookings = guest.bookings.select_related("room", "primary_guest")
+    paginator = KeysetPaginator(bookings, ordering=("-created_at", "-id"), per_page=DASHBOARD_PAGE_SIZE)
+    page = await paginator.apage(after=request.GET.get("after"), before=request.GET.get("before"))
 
-    return render(request, "dashboard.html", {"guest": guest, "bookings": bookings})
+    return render(request, "dashboard.html", {"guest": guest, "bookings": page})
 
 
 @login_required
-def booking_details(request, booking_id):
-    try:
-        guest = request.user.guest_profile
-    except Guest.DoesNotExist:
+async def booking_details(request, booking_id):
+    guest = await load_user(request)
+    if guest is None:
         messages.error(request, "No guest profile found for this user.")
         return redirect("dashboard")
 
-    booking = get_object_or_404(Booking, id=booking_id, primary_guest=guest)
-    
-    # Calculate payment status
-    total_paid = booking.payments.aggregate(total=Sum("amount"))["total"] or 0
-    booking.total_paid = total_paid
-    booking.balance = booking.total_price - total_paid
-    if total_paid >= booking.total_price:
-        booking.payment_status = "Paid"
-    elif total_paid > 0:
-        booking.payment_status = "Partial"
-    else:
-        booking.payment_status = "Unpaid"
+    booking = await (
+        Booking.objects.select_related("room", "primary_guest")
+        .prefetch_related("booking_guests__guest", "meal_preferences__meal")
+        .filter(id=booking_id, primary_guest=guest).afirst()
+    )
+    if booking is None:
+        raise Http404("No Booking matches the given query.")
 
     return render(request, "booking_details.html", {"booking": booking})
 
@@ -398,157 +377,77 @@ def print_receipt(request, booking_id):
         messages.error(request, "No guest profile found for this user.")
         return redirect("dashboard")
 
-    booking = get_object_or_404(Booking, id=booking_id, primary_guest=guest)
-    
-    # Calculate payment status
-    total_paid = booking.payments.aggregate(total=Sum("amount"))["total"] or 0
-    booking.total_paid = total_paid
-    booking.balance = booking.total_price - total_paid
-    if total_paid >= booking.total_price:
-        booking.payment_status = "Paid"
-    elif total_paid > 0:
-        booking.payment_status = "Partial"
-    else:
-        booking.payment_status = "Unpaid"
+    booking = get_object_or_404(receipts.receipt_bookings(), id=booking_id, primary_guest=guest)
 
-    if booking.payment_status != "Paid":
+    if booking.payment_state != "Paid":
         messages.error(request, "Receipt can only be generated for fully paid bookings.")
         return redirect("booking_details", booking_id=booking_id)
 
-    nights = (booking.end_date - booking.start_date).days
-    room_total = booking.room.price_per_night * nights
-    meal_total = sum(pref.meal.price * nights for pref in booking.meal_preferences.filter(selected=True))
-    subtotal = room_total + meal_total
-    vat_amount = subtotal * Decimal("0.18")
-    payments = booking.payments.filter(payment_status="Completed")
-
-    # Create PDF response
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="receipt_booking_{booking.id}.pdf"'
-
-    # Create PDF document
-    doc = SimpleDocTemplate(response, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
-    elements = []
-
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(name='Title', fontSize=18, fontName='Helvetica-Bold', textColor=colors.HexColor('#2a6f97'), alignment=1, spaceAfter=10)
-    subtitle_style = ParagraphStyle(name='Subtitle', fontSize=12, fontName='Helvetica', alignment=1, spaceAfter=10)
-    section_style = ParagraphStyle(name='Section', fontSize=14, fontName='Helvetica-Bold', textColor=colors.HexColor('#2a6f97'), spaceAfter=5)
-    normal_style = ParagraphStyle(name='Normal', fontSize=10, fontName='Helvetica', spaceAfter=6)
-    footer_style = ParagraphStyle(name='Footer', fontSize=8, fontName='Helvetica', textColor=colors.HexColor('#666666'), alignment=1, spaceAfter=6)
-    dash_style = ParagraphStyle(name='Dash', fontSize=10, fontName='Helvetica', spaceAfter=10, spaceBefore=10)
-
-    # Header
-    elements.append(Paragraph("Hotel Booking Receipt", title_style))
-    elements.append(HRFlowable(width="100%", thickness=2, color=colors.HexColor('#2a6f97'), spaceAfter=10))
-    elements.append(Paragraph(f"Receipt for Booking ID: {booking.id}", subtitle_style))
-    elements.append(Paragraph(f"Issued on: {datetime.date.today()}", subtitle_style))
-    elements.append(Spacer(1, 0.5*cm))
-
-    # Dashed line separator
-    elements.append(Paragraph("------------", dash_style))
-
-    # Guest Information
-    elements.append(Paragraph("Guest Information", section_style))
-    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
-    elements.append(Paragraph(f"Primary Guest: {booking.primary_guest.first_name} {booking.primary_guest.last_name}", normal_style))
-    elements.append(Paragraph(f"Email: {booking.primary_guest.email or 'N/A'}", normal_style))
-    elements.append(Paragraph(f"Phone: {booking.primary_guest.phone or 'N/A'}", normal_style))
-    elements.append(Spacer(1, 0.5*cm))
-    elements.append(Paragraph("------------", dash_style))
-
-    # Booking Details
-    elements.append(Paragraph("Booking Details", section_style))
-    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
-    elements.append(Paragraph(f"Room Number: {booking.room.room_number} ({booking.room.room_type})", normal_style))
-    elements.append(Paragraph(f"Check-in Date: {booking.start_date}", normal_style))
-    elements.append(Paragraph(f"Check-out Date: {booking.end_date}", normal_style))
-    elements.append(Paragraph(f"Nights: {nights}", normal_style))
-    elements.append(Paragraph(f"Adults: {booking.num_adults}", normal_style))
-    elements.append(Paragraph(f"Children: {booking.num_children}", normal_style))
-    elements.append(Spacer(1, 0.5*cm))
-    elements.append(Paragraph("------------", dash_style))
-
-    # Cost Breakdown
-    elements.append(Paragraph("Cost Breakdown", section_style))
-    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
-    cost_data = [
-        ['Description', 'Amount (KSh)'],
-        [f"Room Cost ({nights} nights x {booking.room.price_per_night}/night)", f"{room_total:.2f}"],
-    ]
-    for pref in booking.meal_preferences.filter(selected=True):
-        cost_data.append([f"{pref.meal.name} ({nights} nights x {pref.meal.price}/night)", f"{pref.meal.price * nights:.2f}"])
-    cost_data.extend([
-        ['Subtotal', f"{subtotal:.2f}"],
-        ['VAT (18%)', f"{vat_amount:.2f}"],
-        ['Grand Total', f"{booking.total_price:.2f}"],
-    ])
-    cost_table = Table(cost_data, colWidths=[12*cm, 5*cm])
-    cost_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a4d6e')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
-    ]))
-    elements.append(cost_table)
-    elements.append(Spacer(1, 0.5*cm))
-    elements.append(Paragraph("------------", dash_style))
-
-    # Payment Details
-    elements.append(Paragraph("Payment Details", section_style))
-    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
-    payment_data = [
-        ['Payment Method', 'Amount (KSh)', 'Transaction ID', 'Date'],
-    ]
-    for payment in payments:
-        payment_data.append([
-            payment.payment_method,
-            f"{payment.amount:.2f}",
-            payment.transaction_id or 'N/A',
-            payment.payment_date.strftime('%Y-%m-%d %H:%M:%S'),
-        ])
-    payment_table = Table(payment_data, colWidths=[5*cm, 4*cm, 4*cm, 4*cm])
-    payment_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a4d6e')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cccccc')),
-    ]))
-    elements.append(payment_table)
-    elements.append(Spacer(1, 0.5*cm))
-    elements.append(Paragraph("------------", dash_style))
-
-    # Additional Guests
-    elements.append(Paragraph("Additional Guests", section_style))
-    elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#cccccc'), spaceAfter=5))
-    if booking.booking_guests.exists():
-        for booking_guest in booking.booking_guests.all():
-            elements.append(Paragraph(
-                f"{booking_guest.guest.first_name} {booking_guest.guest.last_name} "
-                f"({'Child' if booking_guest.is_child else 'Adult'})",
-                normal_style
-            ))
+    pdf, version, stat = receipts.open_pdf(booking)
+    etag = f'"{version}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(pdf, content_type="application/pdf", filename=f"receipt_booking_{booking.id}.pdf")
+        response["Last-Modified"] = http_date(last_modified)
     else:
-        elements.append(Paragraph("No additional guests.", normal_style))
-    elements.append(Spacer(1, 0.5*cm))
-    elements.append(Paragraph("------------", dash_style))
-
-    # Footer
-    elements.append(Paragraph("Thank you for choosing our hotel!", footer_style))
-    elements.append(Paragraph("Contact us at: support@hotel.com | +254 700 123 456", footer_style))
-    elements.append(Paragraph(f"Order Created: {booking.created_at.strftime('%Y-%m-%d %H:%M:%S')}", footer_style))
-    elements.append(Paragraph(f"Receipt Printed: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", footer_style))
-
-    # Build PDF
-    doc.build(elements)
+        pdf.close()
+    response["ETag"] = etag
+    # Private to the guest; browsers keep it but revalidate on every view.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_GET
+def availability_calendar(request):
+    """Run-length encoded occupancy of every room for ?start=&end= (default: the next 31 nights)."""
+    try:
+        start, end = availability.parse_window(request.GET, datetime.date.today())
+    except availability.InvalidWindow as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    etag = availability.etag(start, end)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(availability.calendar(start, end))
+    response["ETag"] = etag
+    # Pollers keep the last grid and revalidate it every time.
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_GET
+@gzip_page
+async def api_rooms(request):
+    """One keyset page of the home page's search, as compact JSON; see api.py."""
+    try:
+        criteria = room_search.parse(request.GET)
+        ordering = api.ordering(request.GET)
+        limit = api.page_size(request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    etag = await api.aetag(request.GET, criteria)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        rooms, _, _ = room_search.matching_rooms(criteria)
+        page = await KeysetPaginator(rooms, ordering, per_page=limit).apage(
+            after=request.GET.get("after"), before=request.GET.get("before"),
+        )
+        response = JsonResponse(api.page_json(page, criteria), json_dumps_params={"separators": (",", ":")})
+    response["ETag"] = etag
+    patch_cache_control(response, no_cache=True)
     return response
+
+
+@staff_member_required
+@never_cache
+def metrics_view(request):
+    """Request metrics of this worker process, in the Prometheus text format."""
+    return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 def logout_view(request):
     logout(request)
     return redirect("login")
@@ -568,13 +467,15 @@ def add_payment(request, booking_id):
             transaction_id = transaction_code if transaction_code else None
             payment_status = "Completed" if transaction_id else "Pending"
 
-            Payment.objects.create(
-                booking=booking,
-                amount=amount,
-                payment_method=method,
-                transaction_id=transaction_id,
-                payment_status=payment_status
-            )
+            # The booking's amount_paid and payment_state commit with the payment.
+            with transaction.atomic():
+                Payment.objects.create(
+                    booking=booking,
+                    amount=amount,
+                    payment_method=method,
+                    transaction_id=transaction_id,
+                    payment_status=payment_status
+                )
             messages.success(request, "Payment added successfully.")
             return redirect("dashboard")
         except Exception as e:
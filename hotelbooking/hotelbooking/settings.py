@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Static files are answered before anything else runs (and are left out
+    # of the request metrics).
+    'hotel_listing.static_assets.PrecompressedStaticMiddleware',
+    # Outermost for everything else, so its timings and query counts cover the whole stack.
+    'hotel_listing.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,7 +66,8 @@ ROOT_URLCONF = 'hotelbooking.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for hotel_listing.metrics.
+        'BACKEND': 'hotel_listing.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,13 +86,69 @@ WSGI_APPLICATION = 'hotelbooking.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite production profile. WAL lets readers run alongside the single
+# writer; busy_timeout makes writers queue for the lock instead of failing
+# with "database is locked"; IMMEDIATE transactions take the write lock up
+# front, because SQLite refuses to upgrade a read transaction without
+# waiting. synchronous=NORMAL is durable in WAL mode except on power loss.
+# Under WSGI, connections are kept across requests so the pragmas run once
+# per worker thread. Under ASGI they aren't: sync code there runs on
+# executor threads that come and go, and a persistent connection outlives the
+# request on whichever thread opened it, so asgi.py sets DJANGO_CONN_MAX_AGE
+# to 0 (a connection per request; the pragmas are cheap). The PostgreSQL
+# profile below always uses 0, as its pool requires.
+# Compare with the stock settings using `manage.py bench_sqlite_concurrency`.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA busy_timeout=20000',  # ms
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',  # 256 MiB
+    'PRAGMA cache_size=-65536',  # KiB, i.e. 64 MiB per connection
+    'PRAGMA temp_store=MEMORY',
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+        },
     }
 }
 
+# PostgreSQL: set POSTGRES_DB (plus POSTGRES_USER, POSTGRES_PASSWORD,
+# POSTGRES_HOST, POSTGRES_PORT as needed) to use it instead of SQLite; needs
+# `pip install "psycopg[binary,pool]"`. Migration 0010 then adds the GiST
+# exclusion constraint that makes overlapping active bookings impossible.
+# Connections come from psycopg's pool, sized per worker process (Django
+# requires CONN_MAX_AGE = 0 with it). The test suite runs against it too:
+#   docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=hotel postgres:16
+#   POSTGRES_DB=hotelbooking POSTGRES_USER=postgres POSTGRES_PASSWORD=hotel \
+#       POSTGRES_HOST=localhost python manage.py test
+if os.environ.get('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', ''),
+            'PORT': os.environ.get('POSTGRES_PORT', ''),
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 10)),
+                    'timeout': 10,  # seconds to wait for a free connection
+                },
+            },
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -123,10 +186,119 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# With DEBUG off, collectstatic writes content-hashed names plus .gz/.br
+# copies (hotel_listing/static_assets.py; .br needs the optional `brotli`
+# package) and PrecompressedStaticMiddleware serves them with immutable
+# caching. Hashed names need a collected manifest, so development keeps the
+# plain storage.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'hotel_listing.static_assets.CompressedManifestStaticFilesStorage',
+    },
+}
+STATIC_UNHASHED_MAX_AGE = 60  # seconds, for static files requested by their unhashed name
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered receipt PDFs (hotel_listing/receipts.py). Kept outside MEDIA_ROOT
+# because receipts are private; prune with `manage.py prune_receipt_cache`.
+RECEIPT_CACHE_DIR = BASE_DIR / 'receipt_cache'
+RECEIPT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RECEIPT_CACHE_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+
+# Caches. The 'search' alias backs the home search result cache
+# (hotel_listing/search_cache.py) and takes any Django backend: locmem per
+# process, FileBasedCache to share it between workers on one host, or
+# RedisCache against a local Redis-compatible server, e.g.
+#   {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}
+# Anything beyond a single process needs a shared backend: invalidations from
+# other workers and from management commands (import_bookings,
+# rebuild_occupancy) only reach processes that share the cache, and
+# `manage.py check --deploy` reports a process-local one (hotel_listing.E001).
+# Check hit rates with `manage.py search_cache_stats` (shared backends) or
+# hotelbooking_search_cache_lookups_total on /metrics when tuning the TTL.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cards',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+# Sessions are read from the 'sessions' cache, so an ordinary request
+# costs no session query; the database only sees a write when a session
+# changes (signing in or out, a new booking's id), and keeps sessions
+# across restarts and cache evictions. Purge expired rows with
+# `manage.py clearsessions`. The cache copy must still be shared, or a
+# worker keeps serving a session another one has ended: LocMemCache is
+# fine for a single process only, and `manage.py check --deploy` reports
+# it (hotel_listing.E001).
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+SEARCH_CACHE_ALIAS = 'search'
+SEARCH_CACHE_TTL = 300  # seconds
+SEARCH_CACHE_MAX_NIGHTS = 31  # longer stays are not cached
+
+# Rendered home result cards (hotel_listing/room_cards.py), one per room.
+# Their version tokens live in the search cache.
+ROOM_CARD_CACHE_ALIAS = 'cards'
+ROOM_CARD_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# Availability calendar (hotel_listing/availability.py): widest window per request.
+AVAILABILITY_MAX_NIGHTS = 62
+
+# Mobile search API (hotel_listing/api.py): rooms per page, by default and
+# at most, and the image width a room card needs.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_IMAGE_WIDTH = 320
+
+# Request metrics (hotel_listing/metrics.py), served to staff at /metrics.
+# Requests slower than this are logged with their SQL to the
+# 'hotel_listing.slow_requests' logger.
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_REQUEST_MAX_QUERIES = 200  # SQL statements kept per request for that log
+
+# Large-table admin changelists (hotel_listing/changelists.py) never count
+# more than this many rows; bigger tables show the database's estimate.
+ADMIN_COUNT_CAP = 10000
+
+# Login password checks (hotel_listing/logins.py) run on this many threads,
+# at LOGIN_HASH_NICE scheduling priority on Linux, with at most
+# LOGIN_HASH_QUEUE checks running or waiting (0: none waiting, one per
+# thread). Attempts beyond that get a 429 asking the browser to retry after
+# LOGIN_RETRY_AFTER seconds.
+LOGIN_HASH_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+LOGIN_HASH_QUEUE = 2 * LOGIN_HASH_WORKERS
+LOGIN_HASH_NICE = 5
+LOGIN_RETRY_AFTER = 2  # seconds
+
+# Guest checkout (hotel_listing/accounts.py). Bookers without an account get
+# an emailed link to create one, sent by `manage.py send_account_invites`
+# (run it with --loop as a worker). SITE_URL is the link's scheme and host.
+SITE_URL = 'http://127.0.0.1:8000'
+ACCOUNT_INVITE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'reservations@hotel.local'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 